@@ -14,12 +14,17 @@ rendering atomic structures using blender.""",
 
 from time import time
 tstart0 = time()
+# BATOMS_PROFILE_STARTUP=1, log the import time of every module
+from .install import profile_startup
+if profile_startup.is_enabled():
+    profile_startup.start()
 import bpy
-# install pip dependencies
+# install pip dependencies, skipped if the stamp of the dependencies is valid
 from .install import pip_dependencies
 pip_dependencies.install()
 
 from batoms.batoms import Batoms
+from batoms.base.object import register_handler, unregister_handler
 
 
 
@@ -40,46 +45,55 @@ logger.set_logger(bl_info["version"])
 
 
 def register():
+    from batoms.utils.butils import is_headless
     # dependencies
     pip_dependencies.register_class()
     preferences.register_class()
-    # class
+    # class, only data types and operators in headless mode
     internal_data.register_class()
     # class
     ops.register_class()
     gui.register_class()
-    # manual
-    ops.register_manual_map()
-    # menu
-    ops.register_menu()
-    gui.register_menu()
-    # keymap
-    gui.register_keymap()
-    # hook
-    console.register_hook()
+    if not is_headless():
+        # manual
+        ops.register_manual_map()
+        # menu
+        ops.register_menu()
+        gui.register_menu()
+        # keymap
+        gui.register_keymap()
+        # hook
+        console.register_hook()
+    # handler
+    register_handler()
     #
     plugins.enable_plugin()
     logger.root_logger.info("Batoms init time: {:.2f}".format(time() - tstart0))
+    profile_startup.stop()
     logger.update_logging_level()
 
 
 
 def unregister():
+    from batoms.utils.butils import is_headless
     # dependencies
     pip_dependencies.unregister_class()
     # class
     internal_data.unregister_class()
     ops.unregister_class()
     gui.unregister_class()
-    # manual
-    ops.unregister_manual_map()
-    # menu
-    ops.unregister_menu()
-    gui.unregister_menu()
-    # keymap
-    gui.unregister_keymap()
-    # hook
-    console.unregister_hook()
+    if not is_headless():
+        # manual
+        ops.unregister_manual_map()
+        # menu
+        ops.unregister_menu()
+        gui.unregister_menu()
+        # keymap
+        gui.unregister_keymap()
+        # hook
+        console.unregister_hook()
+    # handler
+    unregister_handler()
     plugins.disable_plugin()
     preferences.unregister_class()
 
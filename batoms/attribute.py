@@ -10,6 +10,77 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def get_packed_type(data_type, natt):
+    """Mesh attribute type which can save the whole array of each element.
+
+    Args:
+        data_type (str): data type of the element, e.g. FLOAT
+        natt (int): size of the array
+
+    Returns:
+        tuple: (type of the mesh attribute, key for foreach_get/set),
+            None if the array can not be packed.
+    """
+    packed_types = {
+        ('FLOAT', 2): ('FLOAT2', 'vector'),
+        ('FLOAT', 3): ('FLOAT_VECTOR', 'vector'),
+        ('FLOAT', 4): ('FLOAT_COLOR', 'color'),
+    }
+    if bpy.app.version >= (3, 6, 0):
+        packed_types[('INT', 2)] = ('INT32_2D', 'value')
+    if bpy.app.version >= (4, 2, 0):
+        packed_types[('FLOAT', 16)] = ('FLOAT4X4', 'value')
+    return packed_types.get((data_type, natt))
+
+
+def encode_categorical(att, array, update=True):
+    """Encode strings to the INT codes of the categories. Code 0 is
+    reserved for '', so that new vertices, e.g. added by add_atoms or
+    extend, are decoded to ''.
+
+    Args:
+        att (Battribute): attribute in the collection
+        array (np.array): strings
+        update (bool): rebuild the categories from the array,
+            otherwise new strings are added to the end of the categories.
+
+    Returns:
+        np.array: codes
+    """
+    import json
+    array = np.asarray(array).astype(str)
+    uniques, codes = np.unique(array, return_inverse=True)
+    if update:
+        categories = ['']
+    else:
+        categories = json.loads(att.categories) or ['']
+    lookup = {s: i for i, s in enumerate(categories)}
+    for s in uniques.tolist():
+        if s not in lookup:
+            lookup[s] = len(categories)
+            categories.append(s)
+    codes = np.array([lookup[s] for s in uniques.tolist()],
+                     dtype=int)[codes]
+    att.categories = json.dumps(categories)
+    return codes.reshape(array.shape)
+
+
+def decode_categorical(att, codes):
+    """Decode the INT codes to strings.
+
+    Args:
+        att (Battribute): attribute in the collection
+        codes (np.array): codes
+
+    Returns:
+        np.array: strings
+    """
+    import json
+    categories = json.loads(att.categories)
+    n = max([20] + [len(s) for s in categories])
+    categories = np.array(categories or [''], dtype="U{}".format(n))
+    return categories[np.asarray(codes, dtype=int)]
+
 
 class Attributes(Setting):
     """Attribute information for bpy.data.object.
@@ -65,11 +136,27 @@ class Attributes(Setting):
             att = self[data["name"]]
             mesh = self.parent.obj.data
             # is single value, no delimiter needed
-            if data['dimension'] == 0:
+            if data['dimension'] == 0 and att.data_type == 'STRING':
+                # string is saved as INT code of the categories
+                att.categorical = True
+                mesh.attributes.new(name=data["name"],
+                        type='INT', domain=att.domain)
+                logger.debug("add categorical attribute: {} {}"
+                    .format(att.name, att.domain))
+            elif data['dimension'] == 0:
                 mesh.attributes.new(name=data["name"],
                         type=att.data_type, domain=att.domain)
                 logger.debug("add attribute: {} {} {}"
                     .format(att.name, att.data_type, att.domain))
+            elif get_packed_type(att.data_type, att.natt) is not None:
+                # is array, and can be saved in one attribute,
+                # e.g. FLOAT_VECTOR
+                packed_type = get_packed_type(att.data_type, att.natt)[0]
+                att.packed = True
+                mesh.attributes.new(name=data["name"],
+                        type=packed_type, domain=att.domain)
+                logger.debug("add packed attribute: {} {} {}"
+                    .format(att.name, packed_type, att.domain))
             else:
                 # is array, scatter to new attribute,
                 # with name = "{}{}{}".format(name, delimiter, index)
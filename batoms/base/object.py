@@ -1,4 +1,7 @@
 import bpy
+from bpy.app.handlers import persistent
+import os
+from collections import OrderedDict
 import numpy as np
 from batoms.utils.butils import (get_nodes_by_name, object_mode, set_look_at,
                                  update_object)
@@ -16,6 +19,366 @@ default_object_attributes = [
 default_object_datas = {
 }
 
+# Cache of the data read from the mesh, e.g. attributes and positions,
+# {obj_name: {'stamp': stamp, 'data': {key: array}}}.
+# Saved per object name, because the ObjectGN object is re-created every
+# time, e.g. Batoms(label).
+attribute_caches = {}
+
+
+def cache_stamp(obj):
+    """The cache is outdated when the mode or the size of the mesh changed.
+    """
+    me = obj.data
+    nframe = 0 if me.shape_keys is None else len(me.shape_keys.key_blocks)
+    return (obj.mode, me.name, obj.session_uid, me.session_uid,
+            len(me.vertices), len(me.edges), len(me.polygons),
+            len(me.attributes), nframe)
+
+
+def cache_get(obj, key, index=None):
+    """Get a copy of the cached data, None if not cached. If index is given,
+    only the element at index is copied.
+    """
+    if obj.mode != 'OBJECT':
+        return None
+    cache = attribute_caches.get(obj.name)
+    if cache is None or cache['stamp'] != cache_stamp(obj):
+        return None
+    data = cache['data'].get(key)
+    if data is None:
+        return None
+    if index is not None:
+        return data[[index]]
+    return data.copy()
+
+
+def cache_set(obj, key, data):
+    """Save a copy of the data read from the mesh. Only in object mode,
+    in edit mode the data is in the edit mesh.
+    """
+    if obj.mode != 'OBJECT':
+        return
+    stamp = cache_stamp(obj)
+    cache = attribute_caches.get(obj.name)
+    if cache is None or cache['stamp'] != stamp:
+        cache = {'stamp': stamp, 'data': {}}
+        attribute_caches[obj.name] = cache
+    cache['data'][key] = data.copy()
+
+
+def cache_update(obj, key, indices, data):
+    """Update the cached data in place, after a sparse write.
+    """
+    cache = attribute_caches.get(obj.name)
+    if cache is None or key not in cache['data']:
+        return
+    if cache['stamp'] != cache_stamp(obj):
+        cache_clear(obj.name)
+        return
+    cache['data'][key][indices] = data
+
+
+def cache_clear(name=None, key=None):
+    """Clear the cache of an object, or all objects if name is None.
+    """
+    if name is None:
+        attribute_caches.clear()
+    elif key is None:
+        attribute_caches.pop(name, None)
+    elif name in attribute_caches:
+        attribute_caches[name]['data'].pop(key, None)
+
+
+# Cost (s) per element of the sparse and the full write of an attribute,
+# see ObjectGN.set_attribute_with_indices
+write_costs = {'sparse': 1e-6, 'full': 2e-8}
+# Elements and time of the writes not yet used to tune the cost
+write_samples = {'sparse': [0, 0.0], 'full': [0, 0.0]}
+
+
+def tune_write_cost(method, n, t, batch=1000):
+    """Update the cost per element by the time of the writes.
+
+    A small write is too short to be measured alone, so the writes are
+    summed until they have batch elements, then the cost is updated by the
+    time per element of the batch.
+    """
+    sample = write_samples[method]
+    sample[0] += n
+    sample[1] += t
+    if sample[0] < batch:
+        return
+    write_costs[method] = 0.5*write_costs[method] + 0.5*sample[1]/sample[0]
+    sample[:] = [0, 0.0]
+
+
+def use_sparse_write(k, n):
+    """Whether writing k of n elements one by one is faster than writing
+    all of them."""
+    return k*write_costs['sparse'] < n*write_costs['full']
+
+
+@persistent
+def depsgraph_update_cache(scene, depsgraph):
+    """Clear the cache of the objects whose geometry is changed,
+    e.g. by the operators in the UI.
+    """
+    if len(attribute_caches) == 0:
+        return
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        id = update.id.original
+        if isinstance(id, bpy.types.Object):
+            cache_clear(id.name)
+        elif isinstance(id, bpy.types.Mesh):
+            for name in list(attribute_caches):
+                if attribute_caches[name]['stamp'][1] == id.name:
+                    cache_clear(name)
+
+
+@persistent
+def cache_clear_load(filepath):
+    """Objects with the same name in a new file are different."""
+    cache_clear()
+
+
+class FrameStore():
+    """Frames of an object saved in a numpy file, instead of one shape key
+    per frame. The file is memory-mapped, only the frames used are read,
+    and the recently used frames are kept in a LRU cache.
+    """
+
+    def __init__(self, filepath, maxsize=16):
+        self.filepath = filepath
+        self.maxsize = maxsize
+        self.frames = np.load(filepath, mmap_mode='r')
+        self.lru = OrderedDict()
+        # index of the frame in the mesh
+        self.current = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        frame = self.lru.get(index)
+        if frame is None:
+            frame = np.array(self.frames[index])
+            self.lru[index] = frame
+            if len(self.lru) > self.maxsize:
+                self.lru.popitem(last=False)
+        else:
+            self.lru.move_to_end(index)
+        return frame
+
+    def get_frames(self, start=None, stop=None, step=None):
+        """Only read the frames in the slice."""
+        return np.array(self.frames[start:stop:step], dtype=np.float64)
+
+    def close(self):
+        self.lru.clear()
+        self.frames = None
+
+
+# {obj_name: FrameStore}
+frame_stores = {}
+
+
+def frames_filepath(name):
+    """Numpy file of the frames, next to the .blend file, or in the
+    temporary directory if the .blend file is not saved.
+    """
+    from batoms.utils.butils import get_sidecar_filepath
+    return get_sidecar_filepath('%s_frames.npy' % name)
+
+
+def get_frame_store(obj):
+    """The FrameStore of the object, None if the frames are shape keys.
+    """
+    filepath = obj.batoms.frames_file
+    if filepath == '':
+        return None
+    filepath = bpy.path.abspath(filepath)
+    store = frame_stores.get(obj.name)
+    if store is None or store.filepath != filepath:
+        if not os.path.exists(filepath):
+            logger.warning('File of the frames not found: %s' % filepath)
+            return None
+        store = FrameStore(filepath)
+        frame_stores[obj.name] = store
+    return store
+
+
+def save_frame_store(obj, frames, frame_start=0):
+    """Save the frames to a numpy file, and use it for the object."""
+    clear_frame_store(obj)
+    filepath = frames_filepath(obj.name)
+    # the frames are float32 in the mesh
+    np.save(bpy.path.abspath(filepath),
+            np.asarray(frames, dtype=np.float32))
+    obj.batoms.frames_file = filepath
+    obj.batoms.frame_start = frame_start
+    return get_frame_store(obj)
+
+
+def clear_frame_store(obj):
+    """Use the shape keys again, the file is not removed."""
+    store = frame_stores.pop(obj.name, None)
+    if store is not None:
+        store.close()
+    obj.batoms.frames_file = ''
+
+
+def resize_frame_store(obj, keep, chunk=100):
+    """Rewrite the frames after vertices are added or deleted, as the
+    shape keys do.
+
+    keep: array
+        indices of the old vertices, they are the first vertices of the
+        new mesh. The new vertices after them keep their positions in
+        all frames.
+    """
+    store = get_frame_store(obj)
+    if store is None:
+        return
+    n = len(obj.data.vertices)
+    positions = np.empty(n*3, dtype=np.float32)
+    obj.data.vertices.foreach_get('co', positions)
+    positions = positions.reshape(-1, 3)
+    keep = np.asarray(keep, dtype=int)
+    nkeep = len(keep)
+    filepath = store.filepath
+    frames = store.frames
+    nframe = len(frames)
+    tmp = filepath[:-4] + '_tmp.npy'
+    # chunk by chunk, the trajectory may not fit in memory
+    data = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32,
+                                     shape=(nframe, n, 3))
+    for i in range(0, nframe, chunk):
+        data[i:i + chunk, :nkeep] = frames[i:i + chunk][:, keep]
+        data[i:i + chunk, nkeep:] = positions[nkeep:]
+    data.flush()
+    del data, frames
+    frame_stores.pop(obj.name).close()
+    os.replace(tmp, filepath)
+    get_frame_store(obj)
+
+
+@persistent
+def frame_change_frames(scene, *args):
+    """Write the positions of the current frame into the basis shape key
+    of the objects using a FrameStore.
+    """
+    for name in list(frame_stores):
+        obj = bpy.data.objects.get(name)
+        if obj is None or obj.batoms.frames_file == '':
+            frame_stores.pop(name).close()
+            continue
+        store = frame_stores[name]
+        if obj.mode != 'OBJECT' or obj.data.shape_keys is None:
+            continue
+        index = min(max(scene.frame_current - obj.batoms.frame_start, 0),
+                    len(store) - 1)
+        if store.current == index:
+            continue
+        frame = store[index]
+        sk = obj.data.shape_keys.key_blocks[0]
+        if len(frame) != len(sk.data):
+            continue
+        sk.data.foreach_set('co', frame.reshape(-1))
+        obj.data.update()
+        cache_clear(name)
+        store.current = index
+
+
+@persistent
+def frame_store_load(filepath):
+    """Open the frames of the objects in the new file."""
+    for store in frame_stores.values():
+        store.close()
+    frame_stores.clear()
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH' and obj.batoms.frames_file != '':
+            get_frame_store(obj)
+
+
+@persistent
+def frame_store_save(filepath):
+    """Put the numpy files of the frames beside the .blend file before it
+    is saved, they are opened again by frame_store_load after saving.
+    """
+    from batoms.utils.butils import save_sidecar_file
+    for obj in bpy.data.objects:
+        if obj.type != 'MESH' or obj.batoms.frames_file == '':
+            continue
+        store = frame_stores.pop(obj.name, None)
+        if store is not None:
+            store.close()
+        obj.batoms.frames_file = save_sidecar_file(
+            obj.batoms.frames_file, '%s_frames.npy' % obj.name, filepath)
+
+
+def register_handler():
+    from batoms.bond.bond import neighbor_caches_load
+    from batoms.polyhedra.polyhedra import frame_change_instances, \
+        instance_store_load, instance_store_save
+    from batoms.volumetric_data import volume_files_save
+    if frame_change_instances not in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.append(frame_change_instances)
+    for handlers in [bpy.app.handlers.load_post, bpy.app.handlers.save_post]:
+        if instance_store_load not in handlers:
+            handlers.append(instance_store_load)
+    if instance_store_save not in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.append(instance_store_save)
+    if neighbor_caches_load not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(neighbor_caches_load)
+    if depsgraph_update_cache not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(depsgraph_update_cache)
+    if cache_clear_load not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(cache_clear_load)
+    if frame_change_frames not in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.append(frame_change_frames)
+    if frame_store_load not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(frame_store_load)
+    if frame_store_save not in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.append(frame_store_save)
+    if frame_store_load not in bpy.app.handlers.save_post:
+        bpy.app.handlers.save_post.append(frame_store_load)
+    if volume_files_save not in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.append(volume_files_save)
+
+
+def unregister_handler():
+    from batoms.bond.bond import neighbor_caches_load
+    from batoms.polyhedra.polyhedra import frame_change_instances, \
+        instance_store_load, instance_store_save
+    from batoms.volumetric_data import volume_files_save
+    if frame_change_instances in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(frame_change_instances)
+    for handlers in [bpy.app.handlers.load_post, bpy.app.handlers.save_post]:
+        if instance_store_load in handlers:
+            handlers.remove(instance_store_load)
+    if instance_store_save in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(instance_store_save)
+    if neighbor_caches_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(neighbor_caches_load)
+    if depsgraph_update_cache in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(depsgraph_update_cache)
+    if cache_clear_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(cache_clear_load)
+    if frame_change_frames in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(frame_change_frames)
+    if frame_store_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(frame_store_load)
+    if frame_store_save in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(frame_store_save)
+    if frame_store_load in bpy.app.handlers.save_post:
+        bpy.app.handlers.save_post.remove(frame_store_load)
+    if volume_files_save in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(volume_files_save)
+
+
 
 class BaseObject():
 
@@ -184,13 +547,17 @@ class BaseObject():
         bpy.ops.object.mode_set(mode='EDIT')
         bpy.ops.object.mode_set(mode='OBJECT')
         bpy.ops.object.mode_set(mode=mode)
+        cache_clear(obj.name)
 
     def add_verts(self, count, obj=None):
         import bmesh
         object_mode()
         if obj is None:
             obj = self.obj
+        n = len(obj.data.vertices)
         obj.data.vertices.add(count)
+        cache_clear(obj.name)
+        resize_frame_store(obj, np.arange(n))
         self.update_mesh(obj)
 
     def add_vertices_bmesh(self, count, obj=None):
@@ -199,6 +566,7 @@ class BaseObject():
         object_mode()
         if obj is None:
             obj = self.obj
+        n = len(obj.data.vertices)
         bm = bmesh.new()
         bm.from_mesh(obj.data)
         bm.verts.ensure_lookup_table()
@@ -207,6 +575,8 @@ class BaseObject():
             bm.verts.new(vert)
         bm.to_mesh(obj.data)
         bm.clear()
+        cache_clear(obj.name)
+        resize_frame_store(obj, np.arange(n))
 
     def delete_vertices_bmesh(self, index=[], obj=None,):
         """
@@ -216,6 +586,7 @@ class BaseObject():
         object_mode()
         if obj is None:
             obj = self.obj
+        keep = np.delete(np.arange(len(obj.data.vertices)), index)
         bm = bmesh.new()
         bm.from_mesh(obj.data)
         bm.verts.ensure_lookup_table()
@@ -223,6 +594,8 @@ class BaseObject():
         bmesh.ops.delete(bm, geom=verts_select, context='VERTS')
         bm.to_mesh(obj.data)
         bm.clear()
+        cache_clear(obj.name)
+        resize_frame_store(obj, keep)
     
     @property
     def shape_keys(self):
@@ -250,6 +623,7 @@ class ObjectGN(BaseObject):
         BaseObject.__init__(self, obj_name=obj_name)
 
     def build_object(self, arrays, attributes={}):
+        cache_clear(self.obj_name)
         self.set_attributes(attributes)
         self.build_geometry_node()
         self.set_frames(self._frames, only_basis=False)
@@ -350,6 +724,11 @@ class ObjectGN(BaseObject):
         """
         pass
 
+    def cache_clear(self):
+        """Clear the cached attributes and positions of the object.
+        """
+        cache_clear(self.obj_name)
+
     @property
     def location(self):
         return self.get_location()
@@ -426,12 +805,20 @@ class ObjectGN(BaseObject):
         from batoms.utils.butils import get_att_length
         # get the mesh
         obj = self.obj
+        attribute = cache_get(obj, ('attribute', key), index)
+        if attribute is not None:
+            return attribute
         att = self._attributes[key]
         if att.dimension == 0:
             if obj.mode == 'EDIT' and att.data_type in ['STRING', 'INT', 'FLOAT']:
                 attribute = self.get_mesh_attribute_bmesh(obj, att.name, index)
             else:
                 attribute = self.get_mesh_attribute(obj, att.name, index)
+            if att.categorical:
+                from batoms.attribute import decode_categorical
+                attribute = decode_categorical(att, attribute)
+        elif att.packed:
+            attribute = self.get_mesh_attribute_packed(obj, att, index)
         else:
             natt = att.natt
             name = "{}{}{}".format(att.name, att.delimiter, 0)
@@ -441,15 +828,20 @@ class ObjectGN(BaseObject):
             else:
                 mesh_att = obj.data.attributes.get(name)
                 n = get_att_length(obj.data, mesh_att)
-            attribute = np.zeros(natt*n, dtype=type_blender_to_py(att.data_type))
+            attribute = np.empty(natt*n, dtype=type_blender_to_py(att.data_type))
             for i in range(natt):
                 name = "{}{}{}".format(att.name, att.delimiter, i)
                 if obj.mode == 'EDIT' and att.data_type in ['STRING', 'INT', 'FLOAT']:
                     attribute[i*n:(i+1)*n] = self.get_mesh_attribute_bmesh(obj, name, index)
-                else:
+                elif index is not None:
                     attribute[i*n:(i+1)*n] = self.get_mesh_attribute(obj, name, index)
+                else:
+                    # read into the buffer directly
+                    self.get_mesh_attribute(obj, name, out=attribute[i*n:(i+1)*n])
             # reshape to (n, shape)
             attribute = attribute.reshape((n, ) + att.shape)
+        if index is None:
+            cache_set(obj, ('attribute', key), attribute)
         return attribute
 
     
@@ -509,7 +901,7 @@ class ObjectGN(BaseObject):
         
         return attribute
         
-    def get_mesh_attribute(self, obj, key, index = None):
+    def get_mesh_attribute(self, obj, key, index = None, out = None):
         """Get the attribute of mesh by name usinb bmesh method.
         
         When use this function:
@@ -519,6 +911,8 @@ class ObjectGN(BaseObject):
         Args:
             key (string): name of the attribute
             index (bool, int): index of the data, used to get singe attribute value
+            out (np.array): preallocated buffer, the data is read into it
+                without a new array.
 
         Raises:
             KeyError: _description_
@@ -542,6 +936,9 @@ class ObjectGN(BaseObject):
             # get attribute length based on domain
             n = get_att_length(obj.data, att)
             # init
+            if out is not None and dtype in ["INT", "FLOAT", "BOOLEAN"]:
+                att.data.foreach_get("value", out)
+                return out
             attribute = np.zeros(n, dtype=type_blender_to_py(dtype, str = "U20"))
             if dtype == 'STRING':
                 for i in range(n):
@@ -553,6 +950,58 @@ class ObjectGN(BaseObject):
             attribute = np.array(attribute)
         return attribute
 
+    def get_mesh_attribute_packed(self, obj, att, index = None):
+        """Get the array attribute saved in one mesh attribute,
+        e.g. FLOAT_VECTOR, with a single foreach_get.
+
+        Args:
+            obj (bpy.type.object): obj
+            att (Battribute): attribute in the collection
+            index (int): index of the data, used to get singe attribute value
+
+        Returns:
+            array: (n, shape)
+        """
+        from batoms.attribute import get_packed_type
+        from batoms.utils.butils import get_att_length
+        from batoms.utils import type_blender_to_py
+        # the mesh data is not updated in edit mode
+        if obj.mode == 'EDIT':
+            obj.update_from_editmode()
+        mesh_att = obj.data.attributes.get(att.name)
+        if mesh_att is None:
+            raise KeyError('{} is not exist.'.format(att.name))
+        key = get_packed_type(att.data_type, att.natt)[1]
+        if index is not None:
+            attribute = np.array(getattr(mesh_att.data[index], key))
+            return attribute.reshape((1, ) + att.shape)
+        n = get_att_length(obj.data, mesh_att)
+        attribute = np.empty(n*att.natt, dtype=type_blender_to_py(att.data_type))
+        mesh_att.data.foreach_get(key, attribute)
+        return attribute.reshape((n, ) + att.shape)
+
+    def merge_categories(self, other):
+        """Encode the categorical attributes of other by the categories of
+        this object. Must be called before the meshes are joined, otherwise
+        the codes of other are decoded by the wrong categories.
+
+        Args:
+            other (ObjectGN): object to be joined into this object
+        """
+        from batoms.attribute import encode_categorical
+        for att in other._attributes:
+            if not att.categorical:
+                continue
+            att_self = self._attributes.find(att.name)
+            if att_self is None or not att_self.categorical:
+                continue
+            array = other.get_attribute(att.name)
+            # new categories are added to the end of this object
+            codes = encode_categorical(att_self, array, update=False)
+            other.set_mesh_attribute(other.obj, att.name, codes)
+            att.categories = att_self.categories
+        cache_clear(other.obj.name)
+
     def set_attributes(self, attributes):
         """Set attributes
         
@@ -592,7 +1041,9 @@ class ObjectGN(BaseObject):
 
         Special case:
         1) String, can not use foreach_set. Must use bmesh with encode, 
-            otherwise, can not read use bmesh.
+            otherwise, can not read use bmesh. New string attributes are
+            categorical, saved as INT code of the categories, so that
+            foreach_set can be used.
         2) Boolean, does not supported by bmesh. Must use Object mode.
            We set all Boolean properties to INT.
 
@@ -604,6 +1055,7 @@ class ObjectGN(BaseObject):
         tstart = time()
         obj = self.obj
         me = obj.data
+        cache_clear(obj.name, ('attribute', key))
         att_coll = self._attributes[key]
         shape = att_coll.shape
         dimension = att_coll.dimension
@@ -617,10 +1069,18 @@ class ObjectGN(BaseObject):
         # single value data
         if dimension == 0:
             att = me.attributes.get(key)
+            if att_coll.categorical:
+                # string is saved as INT code
+                from batoms.attribute import encode_categorical
+                array = encode_categorical(att_coll, array,
+                                           update=index is None)
             if att.data_type == 'STRING' or (obj.mode == 'EDIT' and att.data_type in ['INT', 'FLOAT']):
                 self.set_mesh_attribute_bmesh(obj, key, array, index)
             else:
                 self.set_mesh_attribute(obj, key, array, index)
+        # array data saved in one attribute
+        elif att_coll.packed:
+            self.set_mesh_attribute_packed(obj, att_coll, array, index)
         # array data
         else:
             # M is the number of sub-array, for 2x2 array, M is 4
@@ -704,10 +1164,100 @@ class ObjectGN(BaseObject):
                 att.data.foreach_set("value", value)
     
 
+    def set_mesh_attribute_packed(self, obj, att, value, index = None):
+        """Set the array attribute saved in one mesh attribute,
+        e.g. FLOAT_VECTOR, with a single foreach_set.
+
+        Args:
+            obj (bpy.type.object): obj
+            att (Battribute): attribute in the collection
+            value (np.array): value of the attribute
+        """
+        from batoms.attribute import get_packed_type
+        from batoms.utils import type_blender_to_py
+        # the mesh data is overwritten by the edit mesh when leaving
+        # edit mode, so set the data in object mode.
+        edit = obj.mode == 'EDIT'
+        if edit:
+            bpy.context.view_layer.objects.active = obj
+            bpy.ops.object.mode_set(mode='OBJECT')
+        mesh_att = obj.data.attributes.get(att.name)
+        key = get_packed_type(att.data_type, att.natt)[1]
+        value = np.ascontiguousarray(value,
+                    dtype=type_blender_to_py(att.data_type)).reshape(-1)
+        if index is not None:
+            setattr(mesh_att.data[index], key, value[:att.natt])
+        else:
+            mesh_att.data.foreach_set(key, value)
+        if edit:
+            bpy.ops.object.mode_set(mode='EDIT')
+
     def set_attribute_with_indices(self, name, indices, data):
-        data0 = self.get_attribute(name)
-        data0[indices] = data
-        self.set_attributes({name: data0})
+        """Set attribute with indices
+
+        Two ways:
+        1) sparse, only write the elements of the indices, one by one.
+        2) full, read the whole attribute, patch it, and write it back
+           with foreach_set.
+
+        The sparse write is used when it is estimated to be faster, the
+        cost per element of both ways are tuned by the time of the writes.
+
+        Args:
+            name (str): name of the attribute
+            indices (array): indices, or a bool mask
+            data (array): value of the attribute
+        """
+        tstart = time()
+        obj = self.obj
+        att = self._attributes.find(name)
+        sparse = att is not None and obj.mode == 'OBJECT' and \
+            (att.dimension == 0 or att.packed)
+        if sparse:
+            n = len(self)
+            indices = np.arange(n)[indices].reshape(-1)
+            k = len(indices)
+            sparse = use_sparse_write(k, n)
+        if not sparse:
+            data0 = self.get_attribute(name)
+            data0[indices] = data
+            self.set_attributes({name: data0})
+            tune_write_cost('full', len(data0), time() - tstart)
+            return
+        if k == 0:
+            return
+        data = np.broadcast_to(np.asarray(data), (k, ) + tuple(att.shape))
+        self.set_mesh_attribute_sparse(obj, att, indices, data)
+        tune_write_cost('sparse', k, time() - tstart)
+
+    def set_mesh_attribute_sparse(self, obj, att, indices, data):
+        """Only write the elements of the indices.
+
+        Args:
+            obj (bpy.type.object): obj
+            att (Battribute): attribute in the collection
+            indices (array): indices
+            data (array): (len(indices), shape)
+        """
+        from batoms.attribute import get_packed_type, encode_categorical
+        from batoms.utils import type_blender_to_py
+        me = obj.data
+        mesh_att = me.attributes.get(att.name)
+        values = data
+        if att.categorical:
+            data = encode_categorical(att, data, update=False)
+        key = 'value'
+        if att.packed:
+            key = get_packed_type(att.data_type, att.natt)[1]
+            data = data.reshape(len(indices), -1)
+        elif mesh_att.data_type != 'STRING':
+            data = data.astype(type_blender_to_py(mesh_att.data_type))
+        data = data.tolist()
+        items = mesh_att.data
+        for i, value in zip(indices.tolist(), data):
+            setattr(items[i], key, value)
+        me.update()
+        cache_update(obj, ('attribute', att.name), indices, values)
 
     def get_attribute_with_indices(self, name, indices):
         """Get attribute with indices, with len(indices) > 1
@@ -734,10 +1284,14 @@ class ObjectGN(BaseObject):
         """
         using foreach_get and foreach_set to improve performance.
         """
+        local_positions = cache_get(self.obj, ('co', ))
+        if local_positions is not None:
+            return local_positions
         n = len(self)
         local_positions = np.empty(n*3, dtype=np.float64)
         self.obj.data.vertices.foreach_get('co', local_positions)
         local_positions = local_positions.reshape((n, 3))
+        cache_set(self.obj, ('co', ), local_positions)
         return local_positions
 
     @local_positions.setter
@@ -759,6 +1313,7 @@ class ObjectGN(BaseObject):
         if natom == 0:
             return
         local_positions = local_positions.reshape((natom*3, 1))
+        cache_clear(self.obj.name)
         self.shape_keys.key_blocks[0].data.foreach_set(
             'co', local_positions)
         self.obj.data.update()
@@ -802,6 +1357,7 @@ class ObjectGN(BaseObject):
                                  reversed=True)
         # rashpe to (natoms*3, 1) and use forseach_set
         positions = positions.reshape((natom*3, 1))
+        cache_clear(self.obj.name)
         # I don't know why 'Basis' shape keys is not updated when editing mesh,
         # so we edit the 'Basis' shape keys directly.
         # self.obj.data.vertices.foreach_set('co', positions)
@@ -815,6 +1371,9 @@ class ObjectGN(BaseObject):
         return self.get_nframe()
 
     def get_nframe(self):
+        store = get_frame_store(self.obj)
+        if store is not None:
+            return len(store)
         if self.obj.data.shape_keys is None:
             return 0
         nframe = len(self.obj.data.shape_keys.key_blocks)
@@ -828,25 +1387,32 @@ class ObjectGN(BaseObject):
     def frames(self, frames):
         self.set_frames(frames)
 
-    def get_obj_frames(self, obj, local=True):
+    def get_obj_frames(self, obj, local=True, start=None, stop=None,
+                       step=None):
         """
-        read shape key
+        read shape key, or the numpy file of the frames
+
+        start, stop, step: int
+            slice of the frames, only these frames are read.
         """
         from batoms.utils import local2global
-        n = len(self)
-        nframe = self.nframe
-        frames = np.empty((nframe, n, 3), dtype=np.float64)
-        for i in range(nframe):
-            positions = np.empty(n*3, dtype=np.float64)
-            sk = obj.data.shape_keys.key_blocks[i]
-            sk.data.foreach_get('co', positions)
-            local_positions = positions.reshape((n, 3))
-            if local:
-                frames[i] = local_positions
-            else:
-                global_positions = local2global(local_positions,
-                                                np.array(self.obj.matrix_world))
-                frames[i] = global_positions
+        store = get_frame_store(obj)
+        if store is not None:
+            frames = store.get_frames(start, stop, step)
+        else:
+            # the frames are not cached, a trajectory can be large
+            n = len(self)
+            nframe = self.nframe
+            indices = range(nframe)[start:stop:step]
+            frames = np.empty((len(indices), n, 3), dtype=np.float64)
+            for j, i in enumerate(indices):
+                sk = obj.data.shape_keys.key_blocks[i]
+                # read into the frame directly
+                sk.data.foreach_get('co', frames[j].reshape(-1))
+        if not local:
+            for i in range(len(frames)):
+                frames[i] = local2global(frames[i],
+                                         np.array(self.obj.matrix_world))
         return frames
 
     def set_frames_positions(self, frames=None, frame_start=0,
@@ -864,7 +1430,6 @@ class ObjectGN(BaseObject):
 
         use shape_keys (faster)
         """
-        from batoms.utils.butils import add_keyframe_to_shape_key
         if frames is None:
             frames = self._frames
         centers = frames
@@ -883,6 +1448,7 @@ class ObjectGN(BaseObject):
             sk = obj.shape_key_add(name=base_name)
         else:
             sk = obj.data.shape_keys.key_blocks.get(base_name)
+        cache_clear(obj.name)
         # set basis key
         nvert = len(obj.data.shape_keys.key_blocks[0].data)
         positions = frames[0]
@@ -892,12 +1458,59 @@ class ObjectGN(BaseObject):
         if only_basis:
             self.update_mesh(obj)
             return
-        for i in range(1, nframe):
+        if self.frame_backend == 'MEMMAP':
+            self.set_obj_frames_file(obj, frames, frame_start)
+            self.update_mesh(obj)
+            return
+        if obj.batoms.frames_file != '':
+            clear_frame_store(obj)
+        self.add_obj_frames(obj, frames[1:], 1, frame_start)
+        self.update_mesh(obj)
+
+    @property
+    def frame_backend(self):
+        """'SHAPE_KEY', one shape key per frame, or 'MEMMAP', the frames
+        are in a numpy file, only the current frame is in the mesh."""
+        return 'SHAPE_KEY'
+
+    def set_obj_frames_file(self, obj, frames, frame_start=0):
+        """
+        Save the frames to a numpy file, and remove the shape keys of the
+        frames. The current frame is written into the basis shape key by
+        the frame change handler.
+        """
+        key_blocks = obj.data.shape_keys.key_blocks
+        for sk in list(key_blocks)[1:]:
+            obj.shape_key_remove(sk)
+        obj.data.shape_keys.animation_data_clear()
+        save_frame_store(obj, frames, frame_start)
+
+    def add_obj_frames(self, obj, frames, index, frame_start=0, last=True):
+        """
+        Write the frames to the shape keys from index, the basis key
+        must exist. Used to write a trajectory chunk by chunk.
+
+        frames: array
+            (n, nvert, 3), local positions
+        index: int
+            index of the shape key of the first frame
+        last: bool
+            the last frame is the end of the trajectory, its key is
+            kept after the frame.
+        """
+        from batoms.utils.butils import add_keyframe_to_shape_key
+        nframe = len(frames)
+        if nframe == 0:
+            return
+        cache_clear(obj.name)
+        nvert = len(obj.data.shape_keys.key_blocks[0].data)
+        for j in range(nframe):
+            i = index + j
             name = str(i)
             if name not in obj.data.shape_keys.key_blocks:
                 sk = obj.shape_key_add(name=name)
                 # Add Keyframes, the last one is different
-                if i != nframe - 1:
+                if not last or j != nframe - 1:
                     add_keyframe_to_shape_key(sk, 'value',
                                               [0, 1, 0],
                                               [frame_start + i - 1,
@@ -911,10 +1524,9 @@ class ObjectGN(BaseObject):
             else:
                 sk = obj.data.shape_keys.key_blocks.get(name)
             # Use the local position here
-            positions = frames[i]
+            positions = frames[j]
             vertices = positions.reshape((nvert*3, 1))
             sk.data.foreach_set('co', vertices)
-        self.update_mesh(obj)
 
     def delete_obj(self, name):
         if name in bpy.data.objects:
@@ -1029,6 +1641,7 @@ class childObjectGN():
                                 np.array(self.obj.matrix_world),
                                 reversed=True)
         # rashpe to (natoms*3, 1) and use forseach_set
+        cache_clear(self.obj.name)
         self.vertice.co = position[0]
         self.obj.data.update()
         update_object(self.obj)
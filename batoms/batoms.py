@@ -11,9 +11,10 @@ from batoms.attribute import Attributes
 from batoms.cell import Bcell
 from batoms.bselect import Selects
 from batoms.base.collection import BaseCollection
-from batoms.base.object import ObjectGN
+from batoms.base.object import ObjectGN, clear_frame_store, \
+    resize_frame_store
 from batoms.ribbon.ribbon import Ribbon
-from batoms.utils.butils import object_mode, show_index, \
+from batoms.utils.butils import object_mode, show_index, is_headless, \
     get_nodes_by_name
 from batoms.utils import string2Number, read_from_others, deprecated
 from batoms.plugins import plugin_info
@@ -186,8 +187,9 @@ class Batoms(BaseCollection, ObjectGN):
             self.show_unit_cell = show_unit_cell
             
         self.ribbon = Ribbon(self.label, batoms=self, datas=info, update=True)
-        show_index()
-        self.hideOneLevel()
+        if not is_headless():
+            show_index()
+            self.hideOneLevel()
 
     def set_collection(self, label, color_style='0',
                         radius_style='0'):
@@ -366,6 +368,149 @@ class Batoms(BaseCollection, ObjectGN):
                                 InstanceOnPoint.inputs['Instance'])
         gn.node_group.links.new(InstanceOnPoint.outputs['Instances'],
                                 JoinGeometry.inputs['Geometry'])
+        sp = self.coll.batoms.settings_species.get(spname)
+        if sp is not None and sp.shape == 'POINT_CLOUD' and \
+                bpy.app.version_string >= '3.1.0':
+            self.add_point_cloud_node(spname, instancer)
+            return
+        self.remove_point_cloud_node(spname)
+        # level of detail
+        lod_coll = bpy.data.collections.get('%s_%s_lod' % (self.label,
+                                                            spname))
+        if 'Pick Instance' not in InstanceOnPoint.inputs:
+            return
+        InstanceOnPoint.inputs['Pick Instance'].default_value = \
+            lod_coll is not None
+        if lod_coll is None:
+            return
+        CollectionInfo = get_nodes_by_name(gn.node_group.nodes,
+                                           'CollectionInfo_%s_%s' % (
+                                               self.label, spname),
+                                           'GeometryNodeCollectionInfo')
+        CollectionInfo.inputs['Collection'].default_value = lod_coll
+        CollectionInfo.inputs['Separate Children'].default_value = True
+        CollectionInfo.inputs['Reset Children'].default_value = True
+        LodIndex = gn.node_group.nodes.get('%s_LodIndex_%s' % (
+            self.label, len(lod_coll.objects) - 2))
+        gn.node_group.links.new(CollectionInfo.outputs[0],
+                                InstanceOnPoint.inputs['Instance'])
+        if LodIndex is not None:
+            gn.node_group.links.new(LodIndex.outputs[0],
+                                    InstanceOnPoint.inputs['Instance Index'])
+
+    def add_point_cloud_node(self, spname, instancer):
+        """Draw the atoms of the species as points instead of instances.
+
+        The radius of the points is the radius of the instancer times the
+        scale of the atoms. Cycles renders the points as spheres.
+
+        Args:
+            spname (str):
+                Name of the species
+            instancer (bpy.data.object):
+                Instancer of the species, for the radius and material
+        """
+        gn = self.gnodes
+        nodes = gn.node_group.nodes
+        links = gn.node_group.links
+        GroupInput = nodes[0]
+        JoinGeometry = nodes['%s_JoinGeometry' % self.label]
+        SetPosition = nodes['%s_SetPosition' % self.label]
+        InstanceOnPoint = nodes['InstanceOnPoint_%s_%s' % (self.label, spname)]
+        BoolShow = nodes['BooleanMath_%s_%s_1' % (self.label, spname)]
+        MeshToPoints = get_nodes_by_name(nodes, 'MeshToPoints_%s_%s' % (
+            self.label, spname), 'GeometryNodeMeshToPoints')
+        Radius = get_nodes_by_name(nodes, 'RadiusPoint_%s_%s' % (
+            self.label, spname), 'ShaderNodeMath')
+        Radius.operation = 'MULTIPLY'
+        Radius.inputs[1].default_value = instancer.batoms.atom.radius
+        SetMaterial = get_nodes_by_name(nodes, 'SetMaterial_%s_%s' % (
+            self.label, spname), 'GeometryNodeSetMaterial')
+        if len(instancer.data.materials) > 0:
+            SetMaterial.inputs['Material'].default_value = \
+                instancer.data.materials[0]
+        links.new(SetPosition.outputs['Geometry'],
+                  MeshToPoints.inputs['Mesh'])
+        links.new(BoolShow.outputs['Boolean'], MeshToPoints.inputs['Selection'])
+        links.new(GroupInput.outputs[4], Radius.inputs[0])
+        links.new(Radius.outputs[0], MeshToPoints.inputs['Radius'])
+        links.new(MeshToPoints.outputs['Points'], SetMaterial.inputs['Geometry'])
+        links.new(SetMaterial.outputs['Geometry'], JoinGeometry.inputs['Geometry'])
+        # the instances of this species are not used
+        for link in InstanceOnPoint.outputs['Instances'].links:
+            links.remove(link)
+
+    def remove_point_cloud_node(self, spname):
+        """Remove the points of the species from the output.
+        """
+        gn = self.gnodes
+        SetMaterial = gn.node_group.nodes.get('SetMaterial_%s_%s' % (
+            self.label, spname))
+        if SetMaterial is None:
+            return
+        for link in SetMaterial.outputs['Geometry'].links:
+            gn.node_group.links.remove(link)
+
+    def build_lod_geometry_node(self, camera, viewport, render):
+        """Geometry node to calculate the level of detail of the atoms.
+
+        The level is the number of distances smaller than the distance
+        between the atom and the camera, divided by the scale of the atom.
+        The viewport and render use different distances.
+
+        Args:
+            camera (bpy.data.object):
+                Camera object
+            viewport (list of float):
+                Distances between the levels in the viewport
+            render (list of float):
+                Distances between the levels in the render
+        """
+        gn = self.gnodes
+        nodes = gn.node_group.nodes
+        links = gn.node_group.links
+        GroupInput = nodes[0]
+        CameraInfo = get_nodes_by_name(nodes, '%s_LodCamera' % self.label,
+                                       'GeometryNodeObjectInfo')
+        CameraInfo.transform_space = 'RELATIVE'
+        CameraInfo.inputs['Object'].default_value = camera
+        Position = get_nodes_by_name(nodes, '%s_LodPosition' % self.label,
+                                     'GeometryNodeInputPosition')
+        Distance = get_nodes_by_name(nodes, '%s_LodDistance' % self.label,
+                                     'ShaderNodeVectorMath')
+        Distance.operation = 'DISTANCE'
+        links.new(Position.outputs['Position'], Distance.inputs[0])
+        links.new(CameraInfo.outputs['Location'], Distance.inputs[1])
+        Metric = get_nodes_by_name(nodes, '%s_LodMetric' % self.label,
+                                   'ShaderNodeMath')
+        Metric.operation = 'DIVIDE'
+        links.new(Distance.outputs['Value'], Metric.inputs[0])
+        links.new(GroupInput.outputs[4], Metric.inputs[1])
+        IsViewport = get_nodes_by_name(nodes, '%s_LodIsViewport' % self.label,
+                                       'GeometryNodeIsViewport')
+        LodIndex = None
+        for i in range(len(viewport)):
+            # render + is_viewport*(viewport - render)
+            Threshold = get_nodes_by_name(nodes, '%s_LodThreshold_%s' % (
+                self.label, i), 'ShaderNodeMath')
+            Threshold.operation = 'MULTIPLY_ADD'
+            Threshold.inputs[1].default_value = viewport[i] - render[i]
+            Threshold.inputs[2].default_value = render[i]
+            links.new(IsViewport.outputs[0], Threshold.inputs[0])
+            Greater = get_nodes_by_name(nodes, '%s_LodGreater_%s' % (
+                self.label, i), 'ShaderNodeMath')
+            Greater.operation = 'GREATER_THAN'
+            links.new(Metric.outputs[0], Greater.inputs[0])
+            links.new(Threshold.outputs[0], Greater.inputs[1])
+            Add = get_nodes_by_name(nodes, '%s_LodIndex_%s' % (
+                self.label, i), 'ShaderNodeMath')
+            Add.operation = 'ADD'
+            links.new(Greater.outputs[0], Add.inputs[0])
+            if LodIndex is None:
+                Add.inputs[1].default_value = 0
+            else:
+                links.new(LodIndex.outputs[0], Add.inputs[1])
+            LodIndex = Add
 
     def check_batoms(self, label):
         """Check batoms exist or not
@@ -451,6 +596,9 @@ class Batoms(BaseCollection, ObjectGN):
         # same length
         dnvert = len(arrays['species_index']) - \
             len(attributes['species_index'])
+        # the frames are replaced below
+        if dnvert != 0:
+            clear_frame_store(self.obj)
         if dnvert > 0:
             # self.obj.data.vertices.add(dnvert)
             self.add_vertices_bmesh(dnvert)
@@ -690,6 +838,48 @@ class Batoms(BaseCollection, ObjectGN):
         scaled_positions = cell.scaled_positions(self.local_positions)
         return scaled_positions
 
+    def cache_clear(self):
+        """Clear the cached attributes and positions of all the objects
+        of the Batoms, e.g. after the mesh is changed outside Batoms.
+        """
+        from batoms.base.object import cache_clear
+        for obj in self.coll.all_objects:
+            cache_clear(obj.name)
+        cache_clear(self.obj_name)
+
+    def update_moved_bonds(self, indices):
+        """
+        Search the bonds of the moved atoms again, reuse the cached
+        neighbor structure when only a few atoms are moved. Used by the
+        interactive edits, e.g. moving an atom or the force field modal.
+
+        indices: list
+            indices of the moved atoms
+        """
+        from batoms.bond.bond import neighbor_caches
+        cache = neighbor_caches.get(self.label)
+        if cache is None or len(indices) == 0:
+            return
+        neighbor = cache['neighbor']
+        moved = neighbor.moved.copy()
+        moved[indices] = True
+        if moved.mean() > neighbor.max_moved:
+            # too many atoms moved, rebuild the bonds and the cache
+            self.bond.update()
+        else:
+            self.bond.update(indices=indices)
+
+    def update_moved_polyhedra(self, indices):
+        """
+        The instanced polyhedra do not follow the atoms in the geometry
+        node, update the transforms of the instances with the moved atoms.
+
+        indices: list
+            indices of the moved atoms
+        """
+        if '%s_polyhedra_instance' % self.label in bpy.data.objects:
+            self.polyhedra.update_instances(indices)
+
     def get_arrays(self, batoms=None, local=False, X=False, sort=True):
         """
         """
@@ -779,20 +969,17 @@ class Batoms(BaseCollection, ObjectGN):
         self.set_subdivisions(subdivisions)
 
     def get_subdivisions(self):
-        nverts = len(self.instancer.data.vertices)
-        return nverts
+        return self.coll.batoms.subdivisions
 
     def set_subdivisions(self, subdivisions):
+        """Subdivisions of the ICO_SPHERE instancers
+        """
         if not isinstance(subdivisions, int):
             raise Exception('subdivisions should be int!')
-        scale = self.scale
-        radius = self.radius
-        self.clean_batom_objects(self.instancer_name)
-        instancer = self.build_instancer(radius=radius,
-                                         scale=scale,
-                                         subdivisions=subdivisions,
-                                         shape='ICO_SPHERE')
-        instancer.parent = self.obj
+        self.coll.batoms.subdivisions = subdivisions
+        for name, sp in self._species.items():
+            sp.data.subdivisions = subdivisions
+            sp.update(sp.data.as_dict())
 
     @property
     def shape(self):
@@ -803,27 +990,27 @@ class Batoms(BaseCollection, ObjectGN):
         self.set_shape(shape)
 
     def get_shape(self):
-        """
-        TODO
-        """
-        # nverts = len(self.instancer.data.vertices)
-        return 'to do'
+        return self.coll.batoms.shape
 
     def set_shape(self, shape):
+        """Shape of the instancers of all species.
+
+        "UV_SPHERE", "ICO_SPHERE" or "POINT_CLOUD". The POINT_CLOUD draws
+        the atoms as points with radius, which are rendered as spheres by
+        Cycles, and needs Blender 3.1 or later.
+
+        >>> au.shape = 'POINT_CLOUD'
         """
-        "UV_SPHERE", "ICO_SPHERE", "CUBE"
-        """
-        shapes = ["UV_SPHERE", "ICO_SPHERE", "CUBE", "METABALL"]
-        scale = self.scale
-        if shape not in [0, 1, 2]:
+        shapes = ["UV_SPHERE", "ICO_SPHERE", "POINT_CLOUD"]
+        if isinstance(shape, int) and shape in [0, 1, 2]:
+            shape = shapes[shape]
+        if not isinstance(shape, str) or shape.upper() not in shapes:
             raise Exception('Shape %s is not supported!' % shape)
-        scale = self.scale
-        radius = self.radius
-        self.clean_batom_objects(self.instancer_name)
-        instancer = self.build_instancer(radius=radius,
-                                         scale=scale,
-                                         shape=shapes[shape])
-        instancer.parent = self.obj
+        shape = shape.upper()
+        self.coll.batoms.shape = shape
+        for name, sp in self._species.items():
+            sp.data.shape = shape
+            sp.update(sp.data.as_dict())
 
     def delete(self, index=[]):
         """Delete atoms by index.
@@ -855,12 +1042,26 @@ class Batoms(BaseCollection, ObjectGN):
         """
         pass
 
-    def get_frames(self, local=True):
+    def get_frames(self, start=None, stop=None, step=None, local=True):
         """
+        Positions of the frames in the slice (start, stop, step), the
+        other frames are not read.
         """
-        frames = self.get_obj_frames(self.obj, local=local)
+        frames = self.get_obj_frames(self.obj, local=local, start=start,
+                                     stop=stop, step=step)
         return frames
 
+    @property
+    def frame_backend(self):
+        return self.coll.batoms.frame_backend
+
+    @frame_backend.setter
+    def frame_backend(self, frame_backend):
+        """Move the frames to the shape keys or to a numpy file."""
+        frames = self.get_frames()
+        self.coll.batoms.frame_backend = frame_backend
+        self.set_frames({'positions': frames})
+
     def set_frames(self, frames=None, frame_start=0, only_basis=False):
         if frames is None:
             frames = self._frames
@@ -1002,11 +1203,13 @@ class Batoms(BaseCollection, ObjectGN):
         n2 = len(other)
         indices1 = list(range(n1))
         indices2 = list(range(n1, n1 + n2))
+        self.merge_categories(other)
         bpy.ops.object.select_all(action='DESELECT')
         self.obj.select_set(True)
         other.obj.select_set(True)
         bpy.context.view_layer.objects.active = self.obj
         bpy.ops.object.join()
+        resize_frame_store(self.obj, indices1)
         # update species and species_index
         self._species.extend(other._species)
         self.selects.add(self.label, indices1)
@@ -1188,6 +1391,7 @@ class Batoms(BaseCollection, ObjectGN):
             bm.verts.new(pos)
         bm.to_mesh(self.obj.data)
         bm.clear()
+        resize_frame_store(self.obj, np.arange(n0))
         # add species
         self.species.add(list(set(arrays['species'])))
         self.set_attribute_with_indices(
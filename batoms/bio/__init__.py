@@ -1 +1 @@
-from batoms.bio.bio import read
\ No newline at end of file
+from batoms.bio.bio import read, read_trajectory
@@ -1,22 +1,30 @@
 import os
-from ase import io
-from ase.io.cube import read_cube_data
+import numpy as np
 from batoms import Batoms
 # from time import time
 
 
+def get_label(filename):
+    """
+    label from the name of the file
+    """
+    base = os.path.basename(filename)
+    label = os.path.splitext(base)[0]
+    label = label.replace('-', '_')
+    if label[:-1].isdigit():
+        label = 'b_' + label
+    return label
+
+
 def read(filename, label = None, **kwargs):
     """
     wrapper function for ase.io.read
     """
-    base = os.path.basename(filename)
-    base = os.path.splitext(base)
+    ext = os.path.splitext(filename)[1]
     if label is None:
-        label = base[0]
-        label = label.replace('-', '_')
-        if label[:-1].isdigit():
-            label = 'b_' + label
-    ext = base[1]
+        label = get_label(filename)
+    from ase import io
+    from ase.io.cube import read_cube_data
     if ext == '.cube':
         # tstart = time()
         volume, atoms = read_cube_data(filename, **kwargs)
@@ -26,3 +34,46 @@ def read(filename, label = None, **kwargs):
         atoms = io.read(filename=filename, **kwargs)
         batoms = Batoms(label=label, from_ase=atoms)
     return batoms
+
+
+def read_trajectory(filename, label=None, start=0, stop=None, step=1,
+                    chunk=100, **kwargs):
+    """
+    Read a trajectory frame by frame, and write the frames to the shape
+    keys chunk by chunk. Only one chunk of positions is kept in memory.
+
+    filename: str
+        any trajectory file readable by ase.io.iread, e.g. extxyz, traj
+    start, stop, step: int
+        range and stride of the frames
+    chunk: int
+        number of frames written at once
+    """
+    from ase import io
+    if label is None:
+        label = get_label(filename)
+    images = io.iread(filename, index=slice(start, stop, step), **kwargs)
+    atoms = next(images, None)
+    if atoms is None:
+        raise ValueError('No frame in %s.' % filename)
+    batoms = Batoms(label=label, from_ase=atoms)
+    natom = len(atoms)
+    obj = batoms.obj
+    index = 1
+    positions = []
+    for atoms in images:
+        if len(atoms) != natom:
+            raise ValueError('Number of atoms changes from %s to %s '
+                             'at frame %s.' % (natom, len(atoms), index +
+                                               len(positions)))
+        positions.append(atoms.positions)
+        # keep one frame, the last frame has different keyframes
+        if len(positions) > chunk:
+            batoms.add_obj_frames(obj, np.array(positions[:-1]), index,
+                                  last=False)
+            index += len(positions) - 1
+            positions = positions[-1:]
+    batoms.add_obj_frames(obj, np.array(positions).reshape(-1, natom, 3),
+                          index)
+    batoms.update_mesh(obj)
+    return batoms
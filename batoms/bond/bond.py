@@ -5,11 +5,13 @@ This module defines the Bond object in the Batoms package.
 """
 
 import bpy
+from bpy.app.handlers import persistent
 import bmesh
 from time import time
 from batoms.attribute import Attributes
-from batoms.utils.butils import object_mode, compareNodeType, get_nodes_by_name
-from batoms.utils import string2Number, number2String
+from batoms.utils.butils import object_mode, compareNodeType, get_nodes_by_name, \
+    get_workers
+from batoms.utils import string2Number, number2String, unique_rows
 import numpy as np
 from batoms.base.object import ObjectGN
 from batoms.base.collection import BaseCollection
@@ -73,6 +75,17 @@ default_bond_datas = {
     'second_bond': np.ones(0, dtype=int),
 }
 
+# The neighbor structure and bondlists used by the incremental update.
+# Saved per label, because the Bond object is re-created every time
+# Batoms(label) is called, e.g. in the modal operators.
+neighbor_caches = {}
+
+
+@persistent
+def neighbor_caches_load(filepath):
+    """Objects with the same label in a new file are different."""
+    neighbor_caches.clear()
+
 
 class Bond(BaseCollection, ObjectGN):
     """Bbond Class
@@ -441,7 +454,7 @@ class Bond(BaseCollection, ObjectGN):
             bondlists['species_index2'].reshape(-1, 1),
             bondlists['order'].reshape(-1, 1),
             bondlists['style'].reshape(-1, 1)), axis=1)
-        pairs = np.unique(pairs, axis=0)
+        pairs = unique_rows(pairs)
         pairs = pairs.reshape(-1, 4)
         for pair in pairs:
             sp1 = number2String(pair[0])
@@ -609,7 +622,7 @@ class Bond(BaseCollection, ObjectGN):
             bondlists['species_index2'].reshape(-1, 1),
             bondlists['order'].reshape(-1, 1),
             bondlists['style'].reshape(-1, 1)), axis=1)
-        pairs = np.unique(pairs, axis=0)
+        pairs = unique_rows(pairs)
         pairs = pairs.reshape(-1, 4)
         for pair in pairs:
             sp1 = number2String(pair[0])
@@ -641,10 +654,15 @@ class Bond(BaseCollection, ObjectGN):
                 self.settings.instancers[sp["name"]][order_style]
         logger.debug('update bond instancer: %s' % (time() - tstart))
 
-    def update(self, bondlists = None, orders = None):
+    def update(self, bondlists = None, orders = None, indices = None):
         """
         Draw bonds.
         calculate bond in all farmes, and merge all bondlists
+
+        indices: list
+            indices of the atoms moved since the last update. If given,
+            only the bonds of these atoms are searched again, when the
+            neighbor structure of the last update can be reused.
         """
 
         object_mode()
@@ -660,20 +678,56 @@ class Bond(BaseCollection, ObjectGN):
         bond_datas = {}
         tstart = time()
         setting = self.settings.as_dict()
+        incremental = self.incremental_support(nframe, show, boundary_data,
+                                               setting)
+        if bondlists is None and indices is not None and incremental:
+            bondlists = self.build_bondlists_incremental(
+                indices, species, frames[0, show, :], self.batoms.cell,
+                self.batoms.pbc, setting)
+            if bondlists is not None and boundary_data is not None:
+                bondlists = self.check_boundary(bondlists)
         if bondlists is None:
+            neighbor_caches.pop(self.label, None)
+            # Verlet lists reused by the frames of trajectory
+            verlet = None
+            if nframe > 1 and self.skin > 0 and len(setting) > 0:
+                from batoms.neighborlist import VerletList, setting2cutoffs
+                verlet = VerletList(species, self.batoms.cell,
+                                    self.batoms.pbc, setting2cutoffs(setting),
+                                    self.skin, self.engine)
+            # search the neighbors of all frames in parallel
+            workers = get_workers()
+            pairs = [None]*nframe
+            if nframe > 1 and workers != 1 and verlet is None \
+                    and len(setting) > 0:
+                from batoms.neighborlist import bondlist_kdtree
+                from batoms.parallel import map_frames
+                pairs = map_frames(bondlist_kdtree, frames[:, show, :],
+                                   workers, key='positions0',
+                                   quantities='ijkptS', species0=species,
+                                   cell=np.array(self.batoms.cell),
+                                   pbc=self.batoms.pbc, setting=setting,
+                                   engine=self.engine)
             for f in range(nframe):
                 # print('update bond: ', f)
                 positions = frames[f, show, :]
                 # build bondlist for unit cell
-                bondlist, bonddatas, peciesBondDatas, molPeciesDatas = \
-                    self.build_bondlists(species, positions, self.batoms.cell,
-                                        self.batoms.pbc, setting)
+                bondlist, bonddatas, peciesBondDatas, mollists, \
+                    molPeciesDatas = self.build_bondlists(
+                        species, positions, self.batoms.cell,
+                        self.batoms.pbc, setting,
+                        verlet=verlet, pairs=pairs[f])
+                if incremental:
+                    self.save_neighbor_cache(species, positions,
+                                             self.batoms.cell,
+                                             self.batoms.pbc, setting,
+                                             bondlist)
                 # build bondlist for boundary atoms
                 # for molecule with cell == [0, 0, 0], skip
                 if boundary_data is not None:
                     bondlist = self.build_bondlists_with_boundary(
                         boundary_data, bondlist, bonddatas,
-                        peciesBondDatas,
+                        peciesBondDatas, mollists,
                         molPeciesDatas)
                     bondlist = self.check_boundary(bondlist)
                 # search molecule
@@ -687,7 +741,10 @@ class Bond(BaseCollection, ObjectGN):
                     bondlists = bondlist
                 else:
                     bondlists = np.append(bondlists, bondlist, axis=0)
-            bondlists = np.unique(bondlists, axis=0)
+            bondlists = unique_rows(bondlists)
+            if verlet is not None:
+                logger.debug('Verlet lists: {0} builds for {1} frames'.format(
+                    verlet.nbuild, verlet.nquery))
         bond_datas = self.calc_bond_data(species, frames[:, show, :],
                                          self.batoms.cell, bondlists,
                                          self.settings,
@@ -880,6 +937,24 @@ class Bond(BaseCollection, ObjectGN):
         self.settings.coll.Bbond.show_hydrogen_bond = show_hydrogen_bond
         self.update()
 
+    @property
+    def engine(self):
+        return self.settings.coll.Bbond.engine
+
+    @engine.setter
+    def engine(self, engine):
+        self.settings.coll.Bbond.engine = engine
+        self.update()
+
+    @property
+    def skin(self):
+        return self.settings.coll.Bbond.skin
+
+    @skin.setter
+    def skin(self, skin):
+        self.settings.coll.Bbond.skin = skin
+        self.update()
+
     def __getitem__(self, indices):
         """Return a subset of the Bbond.
 
@@ -962,6 +1037,7 @@ class Bond(BaseCollection, ObjectGN):
         """
         # could also use self.add_vertices(other.positions)
         object_mode()
+        self.merge_categories(other)
         bpy.ops.object.select_all(action='DESELECT')
         self.obj.select_set(True)
         other.obj.select_set(True)
@@ -991,7 +1067,8 @@ class Bond(BaseCollection, ObjectGN):
         s = "Bonds(Total: {:6d}, {}" .format(len(self), self.arrays)
         return s
 
-    def build_bondlists(self, species, positions, cell, pbc, setting):
+    def build_bondlists(self, species, positions, cell, pbc, setting,
+                        verlet=None, pairs=None):
         """
         build bondlist for atoms
         steps:
@@ -1000,12 +1077,17 @@ class Bond(BaseCollection, ObjectGN):
           return pecies data and its neighbour
         3 add bondlist related with molecule
 
+        verlet: VerletList
+            if given, the neighbor lists of step 1 are filtered from
+            the Verlet lists instead of a new search.
+        pairs: tuple
+            neighbor lists of step 1 already searched, e.g. in parallel.
         """
-        from batoms.neighborlist import bondlist_kdtree
+        from batoms.neighborlist import bondlist_kdtree, bondlist_verlet
         bondlists = np.zeros((0, 11), dtype=int)
         bonddatas = {}
         if len(setting) == 0:
-            return bondlists, bonddatas, {}, {}
+            return bondlists, bonddatas, {}, np.zeros((0, 11), dtype=int), {}
         #
         # tstart = time()
         # ==========================================================
@@ -1016,9 +1098,15 @@ class Bond(BaseCollection, ObjectGN):
         # nlp: polyhedra
         # nlt: bond type: hydrogen bond
         # nlSj: offset of atoms in nlj
-        nli, nlj, nlk, nlp, nlt, nlSj = bondlist_kdtree('ijkptS', species,
-                                                   positions, cell,
-                                                   pbc, setting)
+        if pairs is not None:
+            nli, nlj, nlk, nlp, nlt, nlSj = pairs
+        elif verlet is None:
+            nli, nlj, nlk, nlp, nlt, nlSj = bondlist_kdtree(
+                'ijkptS', species, positions, cell, pbc, setting,
+                engine=self.engine, parallel=get_workers())
+        else:
+            nli, nlj, nlk, nlp, nlt, nlSj = bondlist_verlet(
+                'ijkptS', verlet, positions, setting)
         nb = len(nli)
         nlSi = np.zeros((nb, 3))
         # print('build_bondlists: {0:10.2f} s'.format(time() - tstart))
@@ -1038,19 +1126,16 @@ class Bond(BaseCollection, ObjectGN):
         # not now, we need all bonds here, and then add a final check.
         # bondlists = bondlists[search0]
         # build bondatas, for each atom, save the bonds connect to it.
-        argsort = bondlists[:, 0].argsort()
+        argsort = bondlists[:, 0].argsort(kind='stable')
         bondlists = bondlists[argsort]
         u, indices = np.unique(bondlists[:, 0], return_index=True)
-        indices = np.append(indices, len(bondlists))
-        m = len(u)
-        for i in range(m):
-            bonddatas[u[i]] = bondlists[indices[i]: indices[i + 1]]
+        bonddatas = dict(zip(u, np.split(bondlists, indices[1:])))
         #
         # ===================================================
         # 2 search connected_components (molecule),
         #   return pecies data and its neighbour
-        peciesBondLists, molPeciesDatas = self.build_peciesBondLists(
-            len(positions), bondlists)
+        peciesBondLists, mollists, molPeciesDatas = \
+            self.build_peciesBondLists(len(positions), bondlists)
         # build peciesBondDatas
         peciesBondDatas = {}
         for p in molPeciesDatas:
@@ -1079,33 +1164,106 @@ class Bond(BaseCollection, ObjectGN):
             peciesBondDatas[u[i]] = data
         # ==========================================================
         # 3 add bondlist related with molecule
-        # add bondlist for molecule
-        for mol in peciesBondLists:
-            indices = molPeciesDatas[mol[1]]
-            for i in indices:
-                if i not in bonddatas:
-                    continue
-                data = bonddatas[i]
-                n = len(data)
-                bondlists = np.append(bondlists,  data, axis=0)
-                bondlists[-n:, 2:5] += mol[5:8]
-                bondlists[-n:, 5:8] += mol[5:8]
-            indices = molPeciesDatas[mol[0]]
-            for i in indices:
-                if i not in bonddatas:
-                    continue
-                data = bonddatas[i]
-                n = len(data)
-                bondlists = np.append(bondlists,  data, axis=0)
-                bondlists[-n:, 2:5] -= mol[5:8]
-                bondlists[-n:, 5:8] -= mol[5:8]
-        # print(bondlists)
-        bondlists = bondlists.astype(int)
-        bondlists = np.unique(bondlists, axis=0)
+        # add bondlist for molecule, the atoms of pecies j shifted by
+        # the offset, and the atoms of pecies i shifted back
+        pecies = pack_datas(molPeciesDatas)
+        keys = [peciesBondLists[:, 1], peciesBondLists[:, 0]]
+        offsets = [peciesBondLists[:, 5:8], -peciesBondLists[:, 5:8]]
+        # the other pecies of the molecule, place the molecule once for
+        # each distinct offset of its pecies, instead of once per pecies
+        anchors = unique_rows(mollists[:, [0, 5, 6, 7]])
+        molkeys, moloffsets = place_molecules(mollists, anchors[:, 0],
+                                              -anchors[:, 1:4])
+        keys = np.concatenate(keys + [molkeys])
+        offsets = np.concatenate(offsets + [moloffsets])
+        index, owner = gather_datas(pecies[1], pecies[2], keys)
+        data = gather_bonds(pack_datas(bonddatas, (11, )),
+                            pecies[0][index], offsets[owner])
+        bondlists = np.concatenate((bondlists, data)).astype(int)
+        bondlists = unique_rows(bondlists)
         self.peciesBondLists = peciesBondLists
+        self.mollists = mollists
         self.molPeciesDatas = molPeciesDatas
         self.peciesBondDatas = peciesBondDatas
-        return bondlists, bonddatas, peciesBondDatas, molPeciesDatas
+        return bondlists, bonddatas, peciesBondDatas, mollists, molPeciesDatas
+
+    def incremental_support(self, nframe, show, boundary_data, setting):
+        """
+        The incremental update only supports the bonds of one frame, without
+        boundary atoms, search bond and molecule (search type 2).
+        """
+        if nframe != 1 or not show.all() or self.show_search:
+            return False
+        if boundary_data is not None and len(boundary_data['positions']) > 0:
+            return False
+        for b in setting.values():
+            if b['search'] == 2:
+                return False
+        return True
+
+    def save_neighbor_cache(self, species, positions, cell, pbc, setting,
+                            bondlists):
+        """
+        save the neighbor structure and bondlists for incremental update
+        """
+        from batoms.neighborlist import NeighborCache, setting2cutoffs
+        if len(setting) == 0:
+            return
+        # drop the caches of the deleted Batoms
+        for label in list(neighbor_caches):
+            if label not in bpy.data.collections:
+                del neighbor_caches[label]
+        neighbor = NeighborCache(species, positions, cell, pbc,
+                                 setting2cutoffs(setting))
+        neighbor_caches[self.label] = {'neighbor': neighbor,
+                                       'bondlists': bondlists,
+                                       'uid': self.batoms.obj.session_uid}
+
+    def build_bondlists_incremental(self, indices, species, positions,
+                                    cell, pbc, setting):
+        """
+        Patch the cached bondlists, only the bonds of the moved atoms
+        are searched again.
+
+        return None if the cache can not be used.
+        """
+        from batoms.neighborlist import bondlist_incremental, setting2cutoffs
+        cache = neighbor_caches.get(self.label)
+        if cache is None:
+            return None
+        # a new Batoms with the same label
+        if cache['uid'] != self.batoms.obj.session_uid:
+            neighbor_caches.pop(self.label, None)
+            return None
+        neighbor = cache['neighbor']
+        if not neighbor.valid(species, cell, pbc, setting2cutoffs(setting)):
+            return None
+        tstart = time()
+        indices = np.unique(np.asarray(indices, dtype=int))
+        nli, nlj, nlk, nlp, nlt, nlSj = bondlist_incremental(
+            'ijkptS', neighbor, positions, indices, setting)
+        nb = len(nli)
+        bondlists = np.concatenate((np.array([nli, nlj]).T,
+                                    np.zeros((nb, 3), dtype=int),
+                                    np.array(nlSj),
+                                    nlk.reshape(-1, 1),
+                                    nlp.reshape(-1, 1),
+                                    nlt.reshape(-1, 1)),
+                                   axis=1).astype(int)
+        # remove the old bonds of the moved atoms, and add the new ones
+        bondlists0 = cache['bondlists']
+        mask = np.isin(bondlists0[:, 0], indices) | \
+            np.isin(bondlists0[:, 1], indices)
+        bondlists = unique_rows(np.append(bondlists0[~mask], bondlists,
+                                          axis=0))
+        cache['bondlists'] = bondlists
+        self.peciesBondLists = np.zeros((0, 11), dtype=int)
+        self.mollists = np.zeros((0, 11), dtype=int)
+        self.molPeciesDatas = {}
+        self.peciesBondDatas = {}
+        logger.debug('build_bondlists_incremental: {0:10.2f} s'.format(
+            time() - tstart))
+        return bondlists
 
     def build_peciesBondLists(self, natom, bondlists):
         """
@@ -1113,18 +1271,18 @@ class Bond(BaseCollection, ObjectGN):
         steps:
         1 search connected_components (molecules) inside atoms
         2 construct the molecules by its pecies and the coresponding offsets
-        3 for
         3 return the molecules
         """
         from scipy.sparse import csgraph, csr_matrix
         molPeciesDatas = {}
         peciesBondLists = np.zeros((0, 11), dtype=int)
+        mollists = np.zeros((0, 11), dtype=int)
         # search type 2
         k = bondlists[:, 8]
         indices = np.where(k == 2)[0]
         ns2 = len(indices)
         if ns2 == 0:
-            return peciesBondLists, molPeciesDatas
+            return peciesBondLists, mollists, molPeciesDatas
         bondlists1 = bondlists[indices, :]
         # ========================================================
         # 1 search connected_components (molecules) inside atoms
@@ -1135,10 +1293,9 @@ class Bond(BaseCollection, ObjectGN):
         data = np.ones(ns2, dtype=int)
         matrix = csr_matrix((data, (ai, aj)), shape=(natom, natom))
         n_components1, component_list1 = csgraph.connected_components(matrix)
-        for i in range(n_components1):
-            indices = np.where(component_list1 == i)[0]
-            n = len(indices)
-            if n < 2:
+        groups1 = group_components(n_components1, component_list1)
+        for i, indices in enumerate(groups1):
+            if len(indices) < 2:
                 continue
             molDatas[i] = {'sub': []}
             molDatas[i]['indices'] = indices
@@ -1152,9 +1309,8 @@ class Bond(BaseCollection, ObjectGN):
         aj = aj[mask]
         matrix = csr_matrix((data, (ai, aj)), shape=(natom, natom))
         n_components2, component_list2 = csgraph.connected_components(matrix)
-        #
-        for i in range(n_components2):
-            indices = np.where(component_list2 == i)[0]
+        groups2 = group_components(n_components2, component_list2)
+        for i, indices in enumerate(groups2):
             if component_list1[indices[0]] in molDatas:
                 # this pecies belong to molDatas
                 molDatas[component_list1[indices[0]]]['sub'].append(i)
@@ -1162,138 +1318,90 @@ class Bond(BaseCollection, ObjectGN):
         # pprint(molPeciesDatas)
         # cross box bond, find direct neighbour pecies
         bondlists2 = bondlists1[~mask]
-        n = len(bondlists2)
-        ai = bondlists2[:, 0].astype(int)
-        aj = bondlists2[:, 1].astype(int)
-        peciesBondLists = np.zeros((n, 11), dtype=int)
-        molBondDicts = {}
-        for i in range(n):
-            # molDatasId = component_list1[bondlists2[i, 0]]
-            i1 = component_list2[ai[i]]
-            j1 = component_list2[aj[i]]
-            peciesBondLists[i, 0] = i1
-            peciesBondLists[i, 1] = j1
-            peciesBondLists[i, 2:] = bondlists2[i, 2:]
-            molBondDicts[(i1, j1)] = bondlists2[i, 2:]
-        peciesBondLists = np.unique(peciesBondLists, axis=0)
+        peciesBondLists = bondlists2.astype(int)
+        peciesBondLists[:, 0] = component_list2[bondlists2[:, 0]]
+        peciesBondLists[:, 1] = component_list2[bondlists2[:, 1]]
+        peciesBondLists = unique_rows(peciesBondLists)
         # ========================================================
         # find indirect neighbour pecies inside mol1
-        # find connected path between pecies
-        ai = peciesBondLists[:, 0].astype(int)
-        aj = peciesBondLists[:, 1].astype(int)
-        nml = len(ai)
-        data = np.ones(nml, dtype=int)
-        graph = csr_matrix((data, (ai, aj)), shape=(
-            n_components2, n_components2))
-        dist_matrix, predecessors = csgraph.shortest_path(
-            csgraph=graph, return_predecessors=True)
-        # print('dist_matrix: ', dist_matrix)
-        # print('predecessors: ', predecessors)
-        dist_matrix = dist_matrix.astype(int)
-        mollist = np.zeros(11, dtype=int)
-        for i, data in molDatas.items():
-            indices = data['sub']
-            n = len(indices)
-            if n < 2:
-                continue
-            for j in range(n - 1):
-                for k in range(j + 1, n):
-                    if dist_matrix[indices[j], indices[k]] == 1:
-                        continue
-                    path = [indices[k]]
-                    end = indices[k]
-                    last = indices[k]
-                    for i1 in range(dist_matrix[indices[j], end]):
-                        last = predecessors[indices[j], last]
-                        path = [last] + path
-                    offsets = np.zeros(3)
-                    for i2 in range(0, len(path) - 1):
-                        offsets += molBondDicts[(path[i2], path[i2 + 1])][3:6]
-                    mollist[0] = path[0]
-                    mollist[1] = path[-1]
-                    mollist[5:8] = offsets
-                    peciesBondLists = np.append(
-                        peciesBondLists, np.array([mollist]), axis=0)
+        # walk the pecies graph once, and label each pecies by its offset
+        # relative to the first pecies of the molecule.
+        pecies_offsets = label_offsets(n_components2, peciesBondLists[:, :2],
+                                       peciesBondLists[:, 5:8] -
+                                       peciesBondLists[:, 2:5])
+        # one row per pecies, (root, pecies) and the offset of the pecies
+        # relative to the root pecies of its molecule. The offsets between
+        # two pecies are derived from these rows where they are used.
+        subs = [np.array(data['sub'], dtype=int) for data in molDatas.values()]
+        pecies = np.concatenate([np.zeros(0, dtype=int)] + subs)
+        roots = np.repeat([sub[0] for sub in subs],
+                          [len(sub) for sub in subs]).astype(int)
+        mollists = np.zeros((len(pecies), 11), dtype=int)
+        mollists[:, 0] = roots
+        mollists[:, 1] = pecies
+        mollists[:, 5:8] = pecies_offsets[pecies] - pecies_offsets[roots]
         self.molDatas = molDatas
-        return peciesBondLists, molPeciesDatas
+        return peciesBondLists, mollists, molPeciesDatas
 
     def build_bondlists_with_boundary(self, arrays, bondlists, bonddatas,
-                                      peciesBondDatas, molPeciesDatas):
+                                      peciesBondDatas, mollists,
+                                      molPeciesDatas):
         """
         build extra bondlists based on boundary atoms
         """
         n = len(arrays['positions'])
         if n == 0:
             return bondlists
+        bonds = pack_datas(bonddatas, (11, ))
+        boundary_offsets = np.asarray(arrays['offsets'], dtype=int)
         # search bond type 0 and 1
-        for i in range(n):
-            if arrays['indices'][i] not in bonddatas:
-                # print('no bonds: ', arrays['indices'][i])
-                continue
-            data = bonddatas[arrays['indices'][i]]
-            n = len(data)
-            bondlists = np.append(bondlists,  data, axis=0)
-            bondlists[-n:, 2:5] += arrays['offsets'][i]
-            bondlists[-n:, 5:8] += arrays['offsets'][i]
-            # todo: in this case, some of the atoms overlap
-            # with original atoms.
-            # since it doesn't influence the 3d view, we
-            # just leave it like this
-            # bondlists[-n:, 8] = 1
-        # print('build_bondlists: {0:10.2f} s'.format(time() - tstart))
-        bondlists = np.unique(bondlists, axis=0)
+        # todo: in this case, some of the atoms overlap
+        # with original atoms.
+        # since it doesn't influence the 3d view, we
+        # just leave it like this
+        datas = [bondlists, gather_bonds(bonds, arrays['indices'],
+                                         boundary_offsets)]
         # search bond type 2
-        # divide boudanry atoms by offsets
-        offsets = np.unique(arrays['offsets'], axis=0)
-        n = len(offsets)*len(molPeciesDatas)
-        peciesArrays = np.zeros((n, 4), dtype=int)
-        n = 0
-        for offset in offsets:
-            indices = np.where((arrays['offsets'] == offset).all(axis=1))[0]
-            indices = arrays['indices'][indices]
-            for p, indices0 in molPeciesDatas.items():
-                indices1 = np.intersect1d(indices0, indices)
-                if len(indices1) > 0:
-                    peciesArrays[n][0] = p
-                    peciesArrays[n][1:4] = offset
-                    n += 1
-        peciesArrays = peciesArrays[:n]
-        npa = len(peciesArrays)
-        if npa == 0:
-            return bondlists
-        # search bond type 2
-        for i in range(npa):
-            peciesId = peciesArrays[i, 0]
-            p = peciesBondDatas[peciesId]
+        # divide boudanry atoms by offsets, the pecies with atoms
+        # in the boundary
+        pecies = pack_datas(molPeciesDatas)
+        indices = np.asarray(arrays['indices'], dtype=int)
+        natom = max(indices.max(), pecies[0].max(initial=-1)) + 1
+        pecies_of_atom = np.full(natom, -1)
+        index, owner = gather_datas(pecies[1], pecies[2],
+                                    np.arange(len(pecies[2])))
+        pecies_of_atom[pecies[0][index]] = owner
+        peciesArrays = np.concatenate((
+            pecies_of_atom[indices].reshape(-1, 1), boundary_offsets), axis=1)
+        peciesArrays = peciesArrays[peciesArrays[:, 0] >= 0]
+        peciesArrays = unique_rows(peciesArrays)
+        if len(peciesArrays) > 0:
             # repeat itself
-            indices = molPeciesDatas[peciesId]
-            for j in indices:
-                if j not in bonddatas:
-                    continue
-                data = bonddatas[j]
-                n = len(data)
-                bondlists = np.append(bondlists,  data, axis=0)
-                bondlists[-n:, 2:5] += peciesArrays[i, 1:4]
-                bondlists[-n:, 5:8] += peciesArrays[i, 1:4]
+            keys = [peciesArrays[:, 0]]
+            offsets = [peciesArrays[:, 1:4]]
             # repeat its neighbour pecies
-            for pb in p:
-                peciesId = pb[1]
-                indices = molPeciesDatas[peciesId]
-                for j in indices:
-                    if j not in bonddatas:
-                        continue
-                    data = bonddatas[j]
-                    n = len(data)
-                    bondlists = np.append(bondlists,  data, axis=0)
-                    bondlists[-n:, 2:5] += peciesArrays[i, 1:4] + pb[5:8]
-                    bondlists[-n:, 5:8] += peciesArrays[i, 1:4] + pb[5:8]
-            # todo: in this case, some of the atoms overlap with
-            # original atoms.
-            # since it doesn't influence the 3d view,
-            # we just leave it like this
-            # bondlists[-n:, 8] = 1
+            neighbours = pack_datas(peciesBondDatas, (11, ))
+            index, owner = gather_datas(neighbours[1], neighbours[2],
+                                        peciesArrays[:, 0])
+            pb = neighbours[0][index]
+            keys.append(pb[:, 1])
+            offsets.append(peciesArrays[owner, 1:4] + pb[:, 5:8])
+            # repeat the other pecies of its molecule
+            roots = np.full(len(pecies[2]), -1)
+            roots[mollists[:, 1]] = mollists[:, 0]
+            shifts = np.zeros((len(pecies[2]), 3), dtype=int)
+            shifts[mollists[:, 1]] = mollists[:, 5:8]
+            molkeys, moloffsets = place_molecules(
+                mollists, roots[peciesArrays[:, 0]],
+                peciesArrays[:, 1:4] - shifts[peciesArrays[:, 0]])
+            keys.append(molkeys)
+            offsets.append(moloffsets)
+            index, owner = gather_datas(pecies[1], pecies[2],
+                                        np.concatenate(keys))
+            datas.append(gather_bonds(bonds, pecies[0][index],
+                                      np.concatenate(offsets)[owner]))
         # print('build_bondlists: {0:10.2f} s'.format(time() - tstart))
-        bondlists = np.unique(bondlists, axis=0)
+        bondlists = unique_rows(np.concatenate(datas).astype(int))
         # search bond type 2
 
         return bondlists
@@ -1555,5 +1663,135 @@ class Bond(BaseCollection, ObjectGN):
             data['array'] = dict(self.arrays)
         data['show_search'] = self.show_search
         data['show_hydrogen_bond'] = self.show_hydrogen_bond
+        data['engine'] = self.engine
+        data['skin'] = self.skin
         data['settings'] = self.settings.as_dict()
-        return data
\ No newline at end of file
+        return data
+
+
+def pack_datas(datas, shape=()):
+    """
+    Pack a dict of arrays, e.g. bonddatas and molPeciesDatas, into one
+    table, so that the data of key i is table[start[i]: start[i] + count[i]].
+    """
+    table = np.zeros((0, ) + shape, dtype=int)
+    if len(datas) == 0:
+        return table, np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    keys = np.fromiter(datas.keys(), dtype=int, count=len(datas))
+    values = [np.asarray(v, dtype=int).reshape((-1, ) + shape)
+              for v in datas.values()]
+    n = np.array([len(v) for v in values], dtype=int)
+    starts = np.zeros(keys.max() + 1, dtype=int)
+    counts = np.zeros(keys.max() + 1, dtype=int)
+    starts[keys] = np.cumsum(n) - n
+    counts[keys] = n
+    table = np.concatenate([table] + values)
+    return table, starts, counts
+
+
+def gather_datas(starts, counts, keys):
+    """
+    Indices of the rows of the keys in the packed table, and the position
+    of the key for each row. Keys without data are skipped.
+    """
+    keys = np.asarray(keys, dtype=int)
+    n = np.zeros(len(keys), dtype=int)
+    mask = keys < len(counts)
+    n[mask] = counts[keys[mask]]
+    owner = np.repeat(np.arange(len(keys)), n)
+    first = np.zeros(len(keys), dtype=int)
+    first[mask] = starts[keys[mask]]
+    index = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n) + \
+        np.repeat(first, n)
+    return index, owner
+
+
+def gather_bonds(bonds, atoms, offsets):
+    """
+    Copy the bonds of the atoms, and shift them by the offsets.
+
+    bonds: tuple
+        bonddatas packed by pack_datas
+    atoms: array
+        indices of atoms
+    offsets: array
+        (n, 3), offset of each atom
+    """
+    table, starts, counts = bonds
+    index, owner = gather_datas(starts, counts, atoms)
+    data = table[index]
+    offsets = np.asarray(offsets, dtype=int).reshape(-1, 3)[owner]
+    data[:, 2:5] += offsets
+    data[:, 5:8] += offsets
+    return data
+
+
+def place_molecules(mollists, roots, offsets):
+    """
+    Place the molecules, with the root pecies shifted by the offsets.
+    Return the pecies of the molecules and their offsets.
+
+    mollists: array
+        (n, 11), one row per pecies, (root, pecies) and the offset of the
+        pecies relative to the root pecies, see build_peciesBondLists
+    roots: array
+        root pecies of the molecules
+    offsets: array
+        (m, 3), offset of the root pecies
+    """
+    table = mollists[np.argsort(mollists[:, 0], kind='stable')]
+    counts = np.bincount(table[:, 0], minlength=1)
+    starts = np.cumsum(counts) - counts
+    index, owner = gather_datas(starts, counts, roots)
+    offsets = np.asarray(offsets, dtype=int).reshape(-1, 3)[owner] + \
+        table[index, 5:8]
+    return table[index, 1], offsets
+
+
+def group_components(n, labels):
+    """
+    Indices of the nodes of each connected component, sorted by index.
+    """
+    order = np.argsort(labels, kind='stable')
+    counts = np.bincount(labels, minlength=n)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+def label_offsets(n, pairs, offsets):
+    """
+    Offset-labelled connected components.
+
+    Breadth-first search over the graph once, the offset of a node is the
+    offset of its parent plus the offset of the edge between them. So the
+    offsets are relative to the first node of each connected component.
+
+    n: int
+        number of nodes
+    pairs: array
+        (m, 2), edges (i, j), used in both directions
+    offsets: array
+        (m, 3), cell offset of node j relative to node i
+    """
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=int).reshape(-1, 3)
+    ai = np.concatenate((pairs[:, 0], pairs[:, 1]))
+    aj = np.concatenate((pairs[:, 1], pairs[:, 0]))
+    offsets = np.concatenate((offsets, -offsets))
+    order = np.argsort(ai, kind='stable')
+    indptr = np.searchsorted(ai[order], np.arange(n + 1)).tolist()
+    aj = aj[order].tolist()
+    offsets = offsets[order].tolist()
+    labels = [None]*n
+    for root in range(n):
+        if labels[root] is not None:
+            continue
+        labels[root] = [0, 0, 0]
+        queue = [root]
+        for p in queue:
+            for e in range(indptr[p], indptr[p + 1]):
+                q = aj[e]
+                if labels[q] is None:
+                    labels[q] = [labels[p][c] + offsets[e][c]
+                                 for c in range(3)]
+                    queue.append(q)
+    return np.array(labels, dtype=int).reshape(-1, 3)
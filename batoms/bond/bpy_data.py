@@ -96,6 +96,17 @@ class Bond(Base):
     label: StringProperty(name="label", default='batoms')
     show_search: BoolProperty(name="show_search", default=False)
     show_hydrogen_bond: BoolProperty(name="show_hydrogen_bond", default=False)
+    engine: EnumProperty(
+        name="engine",
+        description="Neighbor search engine",
+        items=(('kdtree', "KD-tree", "Add boundary atoms and search by KD-tree"),
+               ('cells', "Cells", "Linked-cell search with periodic images")),
+        default='kdtree')
+    skin: FloatProperty(
+        name="skin",
+        description="Skin of the Verlet neighbor lists for trajectory, "
+        "0 to search every frame",
+        min=0, soft_max=2, default=0.0)
     ui_list_index: IntProperty(name="ui_list_index",
                             default=0)
     # collection
@@ -4,7 +4,7 @@ from time import time
 from batoms.attribute import Attributes
 from batoms.base.object import ObjectGN
 from batoms.utils.butils import object_mode, compareNodeType
-from batoms.utils import number2String, string2Number
+from batoms.utils import number2String, string2Number, unique_rows
 import logging
 # logger = logging.getLogger('batoms')
 logger = logging.getLogger(__name__)
@@ -494,7 +494,7 @@ class SearchBond(ObjectGN):
             return default_search_bond_datas
         bondlists1 = bondlists[indices1]
         bondlists1 = bondlists1[:, [0, 2, 3, 4]]
-        bondlists1 = np.unique(bondlists1, axis=0)
+        bondlists1 = unique_rows(bondlists1)
         indices1 = bondlists1[:, 0].astype(int)
         model_styles1 = arrays['model_style'][indices1]
         shows1 = arrays['show'][indices1]
@@ -509,7 +509,7 @@ class SearchBond(ObjectGN):
         #
         bondlists2 = bondlists[indices2]
         bondlists2 = bondlists2[:, [1, 5, 6, 7]]
-        bondlists2 = np.unique(bondlists2, axis=0)
+        bondlists2 = unique_rows(bondlists2)
         indices2 = bondlists2[:, 0].astype(int)
         model_styles2 = arrays['model_style'][indices2]
         shows2 = arrays['show'][indices2]
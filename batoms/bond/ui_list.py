@@ -115,4 +115,6 @@ class BATOMS_PT_bond_pair(Panel):
             col.prop(kb, "material_style", text="material_style")
             col.prop(kb, "color1",  text="color1")
             col.prop(kb, "color2",  text="color2")
+            col.separator()
+            col.prop(ba, "skin", text="Skin")
             op = layout.operator("bond.draw", icon='GREASEPENCIL', text="Draw")
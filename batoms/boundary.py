@@ -10,8 +10,9 @@ import numpy as np
 from ase.geometry import complete_cell
 from batoms.attribute import Attributes
 from batoms.base.object import ObjectGN
-from batoms.utils import number2String, string2Number
-from batoms.utils.butils import compareNodeType, object_mode
+from batoms.utils import number2String, string2Number, unique_rows
+from batoms.utils.butils import compareNodeType, object_mode, get_workers
+from batoms.parallel import map_frames
 import logging
 # logger = logging.getLogger('batoms')
 logger = logging.getLogger(__name__)
@@ -332,26 +333,23 @@ class Boundary(ObjectGN):
         if not self.active:
             self.set_arrays(default_boundary_datas)
             return
+        # use local positions for boundary search
         frames = self.batoms.get_frames()
-        images = self.batoms.as_ase()
-        nframe = self.batoms.nframe
-        if nframe == 1:
-            images = [images]
+        arrays = self.batoms.arrays
+        cell = np.array(self.batoms.cell)
+        nframe = len(frames)
         tstart = time()
-        for f in range(nframe):
-            # print('update boundary: ', f)
-            # print(images[f].positions)
-            # use local positions for boundary search
-            boundary_list = search_boundary(images[f],
-                                            self.boundary)
-            if f == 0:
-                boundary_lists = boundary_list
-            else:
-                boundary_lists = np.append(
-                    boundary_lists, boundary_list, axis=0)
-        boundary_lists = np.unique(boundary_lists, axis=0)
+        workers = get_workers()
+        if nframe > 1 and workers != 1:
+            boundary_lists = map_frames(search_boundary, frames, workers,
+                                        key='frames', cell=cell,
+                                        boundary=self.boundary)
+            boundary_lists = np.concatenate(boundary_lists)
+        else:
+            boundary_lists = search_boundary(frames, cell, self.boundary)
+        boundary_lists = unique_rows(boundary_lists)
         boundary_datas = self.calc_boundary_data(
-            boundary_lists, images[0].arrays, frames, self.batoms.cell)
+            boundary_lists, arrays, frames, cell)
         # update unit cell
 
         #
@@ -657,23 +655,30 @@ class Boundary(ObjectGN):
         data['boundary'] = self.boundary
         return data
 
-def search_boundary(atoms,
+def search_boundary(frames, cell,
                     boundary=[[0, 1], [0, 1], [0, 1]],
                     ):
-    """Search atoms in the boundary
+    """Search atoms in the boundary for all frames in one pass, only use
+    numpy, so that it can also run in parallel for chunks of frames.
+
+    The window is separable, so for each axis, we only keep the atoms
+    whose scaled position shifted by an integer lies inside the window
+    of this axis. Then the images are the cartesian product of the shifts
+    of the three axes for each atom. The memory scales with the number
+    of boundary atoms, instead of tiling all atoms for every image.
 
     Args:
-        atoms: _description_
+        frames (array): positions of atoms, (nframe, natom, 3)
+            or (natom, 3)
+        cell (array): cell
         boundary (list, optional): _description_.
             Defaults to [[0, 1], [0, 1], [0, 1]].
 
     Returns:
-        _type_: _description_
+        array: unique (index, offset) of the atoms in the boundary
+            of all frames
     """
     # tstart = time()
-    cell = atoms.cell
-    positions = atoms.positions
-    species = atoms.arrays['species']
     if isinstance(boundary, float):
         boundary = [[-boundary, 1 + boundary],
                     [-boundary, 1+boundary], [-boundary, 1+boundary]]
@@ -682,39 +687,49 @@ def search_boundary(atoms,
     f = np.floor(boundary)
     c = np.ceil(boundary)
     ib = np.array([f[:, 0], c[:, 1]]).astype(int)
-    M = np.product(ib[1] - ib[0] + 1)
-    # get scaled positions
+    # get scaled positions, all frames are searched together,
+    # the atom index is recovered by index % natom
+    frames = np.asarray(frames, dtype=float)
+    natom = frames.shape[-2]
     positions = np.linalg.solve(complete_cell(cell).T,
-                                positions.T).T
+                                frames.reshape(-1, 3).T).T
     n = len(positions)
-    npositions = np.tile(positions, (M - 1,) + (1,)
-                         * (len(positions.shape) - 1))
-    i0 = 0
-    # index
-    offsets = np.zeros((M*n, 4), dtype=int)
-    ind0 = np.arange(n).reshape(-1, 1)
-    species0 = species
-    species = []
-    # repeat the positions so that
-    # it completely covers the boundary
-    for m0 in range(ib[0, 0], ib[1, 0] + 1):
-        for m1 in range(ib[0, 1], ib[1, 1] + 1):
-            for m2 in range(ib[0, 2], ib[1, 2] + 1):
-                if m0 == 0 and m1 == 0 and m2 == 0:
-                    continue
-                i1 = i0 + n
-                npositions[i0:i1] += (m0, m1, m2)
-                offsets[i0:i1] = np.append(
-                    ind0, np.array([[m0, m1, m2]]*n), axis=1)
-                species.extend(species0)
-                i0 = i1
-    # boundary condition
-    ind1 = np.where((npositions[:, 0] > boundary[0][0]) &
-                    (npositions[:, 0] < boundary[0][1]) &
-                    (npositions[:, 1] > boundary[1][0]) &
-                    (npositions[:, 1] < boundary[1][1]) &
-                    (npositions[:, 2] > boundary[2][0]) &
-                    (npositions[:, 2] < boundary[2][1]))[0]
-    offsets_b = offsets[ind1]
+    # for each axis, the (atom, shift) pairs inside the window,
+    # sorted by atom
+    indices = []
+    shifts = []
+    counts = []
+    for i in range(3):
+        ind = []
+        shift = []
+        for m in range(ib[0, i], ib[1, i] + 1):
+            p = positions[:, i] + m
+            ind1 = np.where((p > boundary[i][0]) & (p < boundary[i][1]))[0]
+            ind.append(ind1)
+            shift.append(np.full(len(ind1), m))
+        ind = np.concatenate(ind)
+        shift = np.concatenate(shift)
+        order = np.argsort(ind, kind='stable')
+        indices.append(ind[order])
+        shifts.append(shift[order])
+        counts.append(np.bincount(ind, minlength=n))
+    # cartesian product of the shifts for each atom
+    count = counts[0]*counts[1]*counts[2]
+    atoms = np.repeat(np.arange(n), count)
+    # local index of the image for each atom
+    r = np.arange(len(atoms)) - np.repeat(np.cumsum(count) - count, count)
+    starts = [np.cumsum(c) - c for c in counts]
+    r0 = r // (counts[1][atoms]*counts[2][atoms])
+    r1 = (r // counts[2][atoms]) % counts[1][atoms]
+    r2 = r % counts[2][atoms]
+    offsets_b = np.zeros((len(atoms), 4), dtype=int)
+    offsets_b[:, 0] = atoms
+    for i, ri in enumerate([r0, r1, r2]):
+        offsets_b[:, i + 1] = shifts[i][starts[i][atoms] + ri]
+    # remove the atoms in the unit cell
+    offsets_b = offsets_b[(offsets_b[:, 1:] != 0).any(axis=1)]
+    if len(frames.shape) == 3 and frames.shape[0] > 1:
+        offsets_b[:, 0] = offsets_b[:, 0] % natom
+        offsets_b = unique_rows(offsets_b)
     # print('search boundary: {0:10.2f} s'.format(time() - tstart))
     return offsets_b
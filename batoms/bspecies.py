@@ -4,6 +4,38 @@ from batoms.base.collection import Setting
 from batoms.base.object import BaseObject
 
 
+def build_sphere_mesh(name, radius, shape='UV_SPHERE', segments=(24, 16),
+                      subdivisions=2):
+    """Build a smooth sphere mesh by bmesh, without the operators.
+
+    Args:
+        name (str): name of the mesh
+        radius (float): radius of the sphere
+        shape (str, optional): 'UV_SPHERE' or 'ICO_SPHERE'.
+            Defaults to 'UV_SPHERE'.
+        segments (list of 2 int, optional): segments and rings of the
+            UV sphere. Defaults to (24, 16).
+        subdivisions (int, optional): subdivisions of the icosphere.
+            Defaults to 2.
+
+    Returns:
+        bpy Mesh: mesh of the sphere
+    """
+    import bmesh
+    mesh = bpy.data.meshes.new(name)
+    bm = bmesh.new()
+    if shape.upper() == 'UV_SPHERE':
+        bmesh.ops.create_uvsphere(bm, u_segments=segments[0],
+                                  v_segments=segments[1], radius=radius)
+    else:
+        bmesh.ops.create_icosphere(bm, subdivisions=subdivisions,
+                                   radius=radius)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.polygons.foreach_set('use_smooth', [True]*len(mesh.polygons))
+    return mesh
+
+
 class Species(BaseObject):
     """_summary_
 
@@ -90,33 +122,30 @@ class Species(BaseObject):
         sp = self.data
         name = '%s_%s' % (self.label, sp.name)
         radius = sp.radius*sp.scale
-        segments = sp.segments
-        shape = 'UV_SPHERE'
         self.delete_obj(name)
-        if shape.upper() == 'UV_SPHERE':
-            bpy.ops.mesh.primitive_uv_sphere_add(segments=segments[0],
-                                                 ring_count=segments[1],
-                                                 radius=radius)
-        if shape.upper() == 'METABALL':
-            bpy.ops.object.metaball_add(type='BALL', location=[0, 0, 0])
-        obj = bpy.context.view_layer.objects.active
+        mesh = bpy.data.meshes.get(name)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+        # the atoms of POINT_CLOUD are drawn as points in the geometry node,
+        # the instancer is only used by the boundary and search bond.
+        mesh = build_sphere_mesh(name, radius, shape=sp.shape,
+                                 segments=sp.segments,
+                                 subdivisions=sp.subdivisions)
+        obj = bpy.data.objects.new(name, mesh)
+        bpy.data.collections['%s_instancer' % self.label].objects.link(obj)
         # In the geometry node, a new scale will be add to the instance
         # Here we use a small value to hide the instance from preview
         obj.scale = [0.001, 0.001, 0.001]
-        obj.name = name
-        obj.data.name = name
         obj.batoms.atom.radius = radius
         obj.batoms.type = 'INSTANCER'
-        #
-        obj.users_collection[0].objects.unlink(obj)
-        bpy.data.collections['%s_instancer' % self.label].objects.link(obj)
-        bpy.ops.object.shade_smooth()
-        if shape.upper() != 'METABALL':
-            obj.hide_set(True)
-            obj.hide_render = True
+        obj.hide_set(True)
+        obj.hide_render = True
         #
         self.build_materials(material_style = sp.material_style)
         self.assign_materials()
+        lod_coll = bpy.data.collections.get(self.lod_name)
+        if lod_coll is not None:
+            self.build_lod(lod_coll['segments'])
         # self.color = sp.color
         bpy.context.view_layer.update()
         self.parent.batoms.add_geometry_node(sp.name, obj)
@@ -162,8 +191,19 @@ class Species(BaseObject):
     def assign_materials(self):
         """Assign materials for instancer with order
         """
+        materials = self.obj.data.materials
+        for obj in [self.obj] + self.lod_instancers:
+            # the lod instancers share the materials of the instancer
+            if obj != self.obj:
+                obj.data.materials.clear()
+                for mat in materials:
+                    obj.data.materials.append(mat)
+            self.assign_mesh_materials(obj.data)
+
+    def assign_mesh_materials(self, mesh):
+        """Assign materials for the faces of the mesh by occupancy
+        """
         # find the face index for ele
-        mesh = self.obj.data
         occs = self.sorted_occupancies
         nele = len(occs)
         # for occupancy
@@ -186,6 +226,62 @@ class Species(BaseObject):
                 tos = toe
             mesh.polygons.foreach_set('material_index', material_indexs)
 
+    @property
+    def lod_name(self):
+        return '%s_%s_lod' % (self.label, self.name)
+
+    @property
+    def lod_instancers(self):
+        """Instancers of the level of detail, from high to low resolution
+
+        Returns:
+            list: list of bpy Object
+        """
+        coll = bpy.data.collections.get(self.lod_name)
+        if coll is None:
+            return []
+        return sorted(coll.objects, key=lambda obj: obj.name)
+
+    def build_lod(self, segments):
+        """Build one instancer for each level of detail.
+
+        The instancers are saved in a collection, ordered by name, so that
+        the geometry node can pick the instancer by the index of the level.
+
+        Args:
+            segments (list of int): segments of each level, from high to
+                low resolution, e.g. [48, 24, 12, 6]
+        """
+        sp = self.data
+        radius = sp.radius*sp.scale
+        self.delete_lod()
+        coll = bpy.data.collections.new(self.lod_name)
+        bpy.data.collections['%s_instancer' % self.label].children.link(coll)
+        coll['segments'] = list(segments)
+        for i, n in enumerate(segments):
+            name = '%s_%s' % (self.lod_name, i)
+            mesh = build_sphere_mesh(name, radius,
+                                     segments=[n, max(3, n//2)])
+            obj = bpy.data.objects.new(name, mesh)
+            coll.objects.link(obj)
+            obj.batoms.atom.radius = radius
+            obj.batoms.type = 'INSTANCER'
+            obj.hide_set(True)
+            obj.hide_render = True
+        self.assign_materials()
+
+    def delete_lod(self):
+        """Delete the instancers of the level of detail
+        """
+        coll = bpy.data.collections.get(self.lod_name)
+        if coll is None:
+            return
+        for obj in coll.objects:
+            mesh = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            bpy.data.meshes.remove(mesh)
+        bpy.data.collections.remove(coll)
+
     @property
     def data(self):
         """Get data for a this species
@@ -298,6 +394,7 @@ class Species(BaseObject):
         """
         self.build_materials(node_inputs=materials)
         self.assign_materials()
+        self.update_point_cloud()
 
     @property
     def color(self):
@@ -343,6 +440,13 @@ class Species(BaseObject):
         self.data.material_style = material_style
         self.build_materials(material_style = material_style)
         self.assign_materials()
+        self.update_point_cloud()
+
+    def update_point_cloud(self):
+        """The points use the material of the instancer, update it after
+        the materials are rebuilt."""
+        if self.data.shape == 'POINT_CLOUD':
+            self.parent.batoms.add_geometry_node(self.name, self.obj)
 
     @property
     def radius(self):
@@ -376,7 +480,7 @@ class Species(BaseObject):
         self.set_segments(segments)
 
     def get_segments(self):
-        return self.data.segmetns[:]
+        return self.data.segments[:]
 
     def set_segments(self, segments):
         if isinstance(segments, int):
@@ -385,6 +489,27 @@ class Species(BaseObject):
         self.data.segments = segments
         self.update(self.data.as_dict())
 
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @shape.setter
+    def shape(self, shape):
+        """
+        >>> h2o['O'].shape = 'ICO_SPHERE'
+        """
+        self.data.shape = shape.upper()
+        self.update(self.data.as_dict())
+
+    @property
+    def subdivisions(self):
+        return self.data.subdivisions
+
+    @subdivisions.setter
+    def subdivisions(self, subdivisions):
+        self.data.subdivisions = subdivisions
+        self.update(self.data.as_dict())
+
     def as_dict(self) -> dict:
         data = {
             'species': self.name,
@@ -451,7 +576,7 @@ class Bspecies(Setting):
             segments = [32, 24]
         elif natom <= 1e4:
             segments = [16, 16]
-        elif natom <= 1e4:
+        elif natom <= 5e4:
             segments = [10, 10]
         elif natom <= 1e5:
             segments = [8, 8]
@@ -505,6 +630,9 @@ class Bspecies(Setting):
             sp.name = name
             sp.label = self.label
             sp.segments = self.segments
+            if self.batoms is not None:
+                sp.shape = self.batoms.coll.batoms.shape
+                sp.subdivisions = self.batoms.coll.batoms.subdivisions
             sp = Species(sp.name, parent=self, data=data)
 
     def update_geometry_node(self):
@@ -634,6 +762,27 @@ class Bspecies(Setting):
         for name, sp in self.species.items():
             sp.build_instancer()
 
+    def set_lod(self, lod=None):
+        """Set the level of detail of the instancers.
+
+        Every atom picks the instancer by its distance to the camera.
+
+        Args:
+            lod (dict, optional): 'camera', 'segments' of each level,
+                'viewport' and 'render' distances between the levels.
+                None to use one instancer for each species.
+        """
+        if lod is not None:
+            self.batoms.build_lod_geometry_node(lod['camera'],
+                                                lod['viewport'],
+                                                lod['render'])
+        for name, sp in self.species.items():
+            if lod is None:
+                sp.delete_lod()
+            else:
+                sp.build_lod(lod['segments'])
+            self.batoms.add_geometry_node(name, sp.obj)
+
     def as_dict(self) -> dict:
         species = self.species
         data = {}
@@ -4,7 +4,6 @@ Wrapper functions for ASE build
 
 """
 
-from ase import build
 from batoms.batoms import Batoms
 
 
@@ -18,6 +17,7 @@ def molecule(label, symbol, **kwargs):
     Returns:
         _type_: _description_
     """
+    from ase import build
     atoms = build.molecule(symbol, **kwargs)
     batoms = Batoms(label=label, from_ase=atoms)
     return batoms
@@ -33,6 +33,7 @@ def bulk(label, symbol, **kwargs):
     Returns:
         _type_: _description_
     """
+    from ase import build
     atoms = build.bulk(symbol, **kwargs)
     batoms = Batoms(label=label, from_ase=atoms)
     return batoms
@@ -52,6 +53,7 @@ def surface(label, lattice, indices, layers, **kwargs):
     """
     if isinstance(lattice, Batoms):
         lattice = lattice.atoms
+    from ase import build
     atoms = build.surface(lattice, indices, layers, **kwargs)
     atoms.info.pop('species', None)
     batoms = Batoms(label=label, from_ase=atoms)
@@ -1,4 +1,5 @@
 import bpy
+from bpy.app.handlers import persistent
 import console_python
 from batoms.batoms import Batoms
 import logging
@@ -6,32 +7,152 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Counter of the changes of the collections, increased by the handlers.
+collection_stamp = [0]
+# Labels bound in each console, {console_id: (stamp, {name: label})}
+console_bindings = {}
+
+
+class BatomsProxy():
+    """Bind a Batoms in the console without building it.
+
+    The Batoms object is created the first time the proxy is used, and
+    created again if the collection is replaced.
+    """
+
+    def __init__(self, label):
+        object.__setattr__(self, '_label', label)
+        object.__setattr__(self, '_batoms', None)
+        object.__setattr__(self, '_uid', None)
+
+    def _get_batoms(self):
+        coll = bpy.data.collections.get(self._label)
+        if coll is None:
+            raise KeyError('Batoms {} does not exist.'.format(self._label))
+        if self._batoms is None or self._uid != coll.session_uid:
+            object.__setattr__(self, '_batoms', Batoms(self._label))
+            object.__setattr__(self, '_uid', coll.session_uid)
+        return self._batoms
+
+    def __getattr__(self, name):
+        return getattr(self._get_batoms(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_batoms(), name, value)
+
+    def __dir__(self):
+        return dir(self._get_batoms())
+
+    def __repr__(self):
+        return repr(self._get_batoms())
+
+    def __len__(self):
+        return len(self._get_batoms())
+
+    def __getitem__(self, index):
+        return self._get_batoms()[index]
+
+    def __setitem__(self, index, value):
+        self._get_batoms()[index] = value
+
+    def __add__(self, other):
+        return self._get_batoms() + other
+
+    def __mul__(self, m):
+        return self._get_batoms() * m
+
+    def __iadd__(self, other):
+        self._get_batoms().extend(other)
+        return self
+
+
+def get_name(label):
+    """Valid python name of the label."""
+    name = label.replace('-', '_')
+    name = name.replace('.', '')
+    if name[:1].isdigit():
+        name = 'b_' + name
+    return name
+
+
+def get_stamp():
+    # a collection added in the last console line is found by the length
+    return (collection_stamp[0], len(bpy.data.collections))
+
+
+def bind_batoms(console, console_id):
+    """Bind the new batoms to the console, and remove the deleted ones.
+    Nothing is done if the collections are not changed.
+    """
+    stamp = get_stamp()
+    old_stamp, bindings = console_bindings.get(console_id, (None, {}))
+    if old_stamp == stamp:
+        return
+    namespace = console.locals
+    namespace.setdefault('Batoms', Batoms)
+    labels = {get_name(coll.name): coll.name
+              for coll in bpy.data.collections
+              if coll.batoms.type == 'BATOMS'}
+    for name, label in list(bindings.items()):
+        if labels.get(name) == label:
+            continue
+        # only remove the proxies bound by the hook
+        value = namespace.get(name)
+        if isinstance(value, BatomsProxy) and value._label == label:
+            del namespace[name]
+        del bindings[name]
+    for name, label in labels.items():
+        if name in bindings or name in namespace:
+            continue
+        logger.info("Python console: Add Batoms {}".format(name))
+        namespace[name] = BatomsProxy(label)
+        bindings[name] = label
+    console_bindings[console_id] = (stamp, bindings)
+
+
 def console_hook():
     """add batoms to namespace of python console
     """
-    from batoms.utils.butils import read_batoms_list
-    import console_python
-    items = read_batoms_list()
     for area in bpy.context.screen.areas:
         if area.type == 'CONSOLE':
             for region in area.regions:
                 if region.type == 'WINDOW':
-                    console, stdout, stderr = console_python.get_console(hash(region))
-                    for item in items:
-                        item = item.replace('-', '_')
-                        item = item.replace('.', '')
-                        if item[:1].isdigit():
-                            item = 'b_' + item
-                        console.push("from batoms import Batoms")
-                        if item not in console.locals:
-                            logger.info("Python console: Add Batoms {}".format(item))
-                            console.push("{}=Batoms('{}')".format(item, item))
-                            console.push("".format(item))
-                            # console.locals[item] = Batoms(item)
+                    console_id = hash(region)
+                    console, stdout, stderr = console_python.get_console(
+                        console_id)
+                    bind_batoms(console, console_id)
+
+
+@persistent
+def depsgraph_update_collections(scene, depsgraph):
+    """A collection is added, removed or renamed."""
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Collection):
+            collection_stamp[0] += 1
+            return
+
+
+@persistent
+def load_post_collections(filepath):
+    collection_stamp[0] += 1
+    console_bindings.clear()
 
 
 def register_hook():
     console_python.execute.hooks.append((console_hook, ()))
+    if depsgraph_update_collections not in \
+            bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(
+            depsgraph_update_collections)
+    if load_post_collections not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(load_post_collections)
+
 
 def unregister_hook():
     console_python.execute.hooks.remove((console_hook, ()))
+    if depsgraph_update_collections in \
+            bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(
+            depsgraph_update_collections)
+    if load_post_collections in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(load_post_collections)
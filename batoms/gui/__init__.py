@@ -78,7 +78,8 @@ classes = [
 
 def register_class():
     from bpy.utils import register_class
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
     scene = bpy.types.Scene
     scene.batoms = PointerProperty(type=BatomsCollection)
@@ -86,7 +87,8 @@ def register_class():
 
 def unregister_class():
     from bpy.utils import unregister_class
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     scene = bpy.types.Scene
     del scene.batoms
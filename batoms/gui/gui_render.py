@@ -1,6 +1,7 @@
 import bpy
 from bpy.types import Panel
 from bpy.props import (
+    BoolProperty,
     FloatVectorProperty,
     IntVectorProperty,
     FloatProperty,
@@ -49,6 +50,11 @@ class Render_PT_prepare(Panel):
         row.prop(render, "light_direction_y")
         row.prop(render, "light_direction_z")
         layout.prop(render, "energy")
+        layout.separator()
+        layout.prop(render, "lod")
+        if render.lod:
+            layout.prop(render, "lod_viewport")
+            layout.prop(render, "lod_render")
 
 
 # ---------------------------------------------------
@@ -64,6 +70,19 @@ def modify_render_attr(context, key, value):
         context.space_data.region_3d.view_perspective = 'CAMERA'
 
 
+def set_lod_attr(key, value):
+    """Set level of detail attribute of the render
+
+    Args:
+        key (str): name of the attribute
+        value (_type_): value of the attribute
+    """
+    from batoms.batoms import Batoms
+    if bpy.context.object and bpy.context.object.batoms.type != 'OTHER':
+        batoms = Batoms(label=bpy.context.object.batoms.label)
+        setattr(batoms.render, key, value)
+
+
 def set_light_attr(key, value):
     """Set light attribute
 
@@ -326,3 +345,24 @@ class RenderProperties(bpy.types.PropertyGroup):
         get=get_attr("lens", get_default_camera_data),
         set=set_attr("lens", set_camera_attr)
     )
+
+    lod: BoolProperty(
+        name="LOD", default=False,
+        description="Level of detail of the atoms by the distance to camera",
+        get=get_attr("lod", get_active_render_collection),
+        set=set_attr("lod", set_lod_attr)
+    )
+
+    lod_viewport: FloatVectorProperty(
+        name="Viewport", size=3, default=(10, 25, 50),
+        description="Distances between the levels in the viewport",
+        get=get_attr("lod_viewport", get_active_render_collection),
+        set=set_attr("lod_viewport", set_lod_attr)
+    )
+
+    lod_render: FloatVectorProperty(
+        name="Render", size=3, default=(20, 50, 100),
+        description="Distances between the levels in the render",
+        get=get_attr("lod_render", get_active_render_collection),
+        set=set_attr("lod_render", set_lod_attr)
+    )
@@ -105,5 +105,8 @@ class BATOMS_PT_species(Panel):
             col.prop(kb, "material_style", text="material_style")
             sub.prop(kb, "color", text="Color")
             col.prop(kb, "scale",  text="Scale")
+            col.prop(kb, "shape",  text="Shape")
+            if kb.shape == 'ICO_SPHERE':
+                col.prop(kb, "subdivisions",  text="Subdivisions")
             op = layout.operator("batoms.species_update",
                                  icon='GREASEPENCIL', text="Update")
@@ -1,6 +1,9 @@
+import os
 import sys
+import json
 import subprocess
 import importlib
+import importlib.util
 from time import time
 from bpy.types import Operator
 from bpy.props import (StringProperty,
@@ -19,12 +22,54 @@ def has_pip():
     return not subprocess.call([sys.executable, "-m", "pip", "--version"])
 
 def has_module(modname):
+    """Find the module without importing it, importing scikit-image or
+    ase takes seconds."""
     try:
-        module = importlib.import_module(modname)
-        return True
-    except ImportError:
+        return importlib.util.find_spec(modname) is not None
+    except (ImportError, ValueError):
         return False
 
+
+def get_stamp_file():
+    """The stamp of the dependencies found, one for each version of the
+    Python of Blender."""
+    import bpy
+    folder = os.path.join(bpy.utils.user_resource('CONFIG'), 'batoms')
+    return os.path.join(folder, 'dependencies-py{}.{}.json'.format(
+        *sys.version_info[:2]))
+
+
+def read_stamp():
+    """The dependencies are checked before, and the modules are still at
+    the same place."""
+    try:
+        with open(get_stamp_file()) as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if stamp.get('executable') != sys.executable or \
+            stamp.get('dependencies') != dependencies:
+        return False
+    return all(os.path.exists(path) for path in stamp['origins'].values())
+
+
+def write_stamp():
+    origins = {}
+    for modname in dependencies.values():
+        spec = importlib.util.find_spec(modname)
+        origins[modname] = spec.origin or ''
+    stamp = {'executable': sys.executable,
+             'dependencies': dependencies,
+             'origins': origins,
+             }
+    try:
+        filename = get_stamp_file()
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as f:
+            json.dump(stamp, f)
+    except OSError as e:
+        logger.debug("Cannot write the stamp of dependencies: {}".format(e))
+
 def install_pip():
     # if not exist
     cmd = [sys.executable, "-m", "ensurepip", "--upgrade"]
@@ -46,6 +91,7 @@ def install_module(package, modname):
         cmd = [sys.executable, "-m", "pip",
                 "install", "--upgrade", package]
         subprocess.call(cmd)
+        importlib.invalidate_caches()
         logger.info("package {0} installed.".format(package))
     # else:
         # print("package {0} installed.".format(package))
@@ -53,8 +99,12 @@ def install_module(package, modname):
 
 def install():
     tstart = time()
-    for package, modname in dependencies.items():
-        install_module(package, modname)
+    if read_stamp():
+        return
+    found = [install_module(package, modname)
+             for package, modname in dependencies.items()]
+    if all(found):
+        write_stamp()
     logger.debug("Pip install time: {:.2f}".format(time() - tstart))
 
 
@@ -0,0 +1,102 @@
+"""
+Time the import of every module during the startup of batoms.
+
+Enabled by the environment variable BATOMS_PROFILE_STARTUP=1, the table
+is logged at the end of register(). Only uses the standard library, it is
+imported before bpy.
+"""
+import os
+import sys
+import importlib.abc
+from time import perf_counter
+import logging
+# logger = logging.getLogger('batoms')
+logger = logging.getLogger(__name__)
+
+
+def is_enabled():
+    return os.environ.get('BATOMS_PROFILE_STARTUP', '') not in ('', '0')
+
+
+class TimedLoader(importlib.abc.Loader):
+    """Wrap the loader of a module to time its execution."""
+
+    def __init__(self, loader, timer, name):
+        self.loader = loader
+        self.timer = timer
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self.timer.stack
+        stack.append(0.0)
+        tstart = perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            total = perf_counter() - tstart
+            children = stack.pop()
+            self.timer.times[self.name] = (total, total - children)
+            if stack:
+                stack[-1] += total
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Find the module with the other finders, and time its loader."""
+
+    def __init__(self):
+        # {name: (cumulative, self)} in seconds
+        self.times = {}
+        self.stack = []
+        self.tstart = perf_counter()
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and \
+                    hasattr(spec.loader, 'exec_module'):
+                spec.loader = TimedLoader(spec.loader, self, fullname)
+            return spec
+        return None
+
+    def table(self, nmax=30):
+        """The slowest modules by their own import time."""
+        rows = sorted(self.times.items(), key=lambda x: x[1][1],
+                      reverse=True)
+        s = '{:50s} {:>10s} {:>10s}\n'.format('module', 'self (s)',
+                                              'total (s)')
+        for name, (total, own) in rows[:nmax]:
+            s += '{:50s} {:10.3f} {:10.3f}\n'.format(name, own, total)
+        s += '{} modules imported, startup time: {:.2f} s'.format(
+            len(rows), perf_counter() - self.tstart)
+        return s
+
+
+timer = None
+
+
+def start():
+    global timer
+    if timer is None:
+        timer = ImportTimer()
+        sys.meta_path.insert(0, timer)
+
+
+def stop():
+    """Remove the timer and log the table."""
+    global timer
+    if timer is None:
+        return
+    if timer in sys.meta_path:
+        sys.meta_path.remove(timer)
+    logger.info('Import time of batoms:\n' + timer.table())
+    timer = None
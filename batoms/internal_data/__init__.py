@@ -42,7 +42,8 @@ from bpy.types import Collection, Object
 
 def register_class():
     from bpy.utils import register_class
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
     
     Collection.batoms = PointerProperty(name='Batoms',
@@ -54,7 +55,8 @@ def register_class():
 
 def unregister_class():
     from bpy.utils import unregister_class
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     disable_module()
     
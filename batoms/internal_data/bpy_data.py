@@ -48,6 +48,14 @@ class Bspecies(Base):
     scale: FloatProperty(name="scale", min=0, soft_max=2, default=1)
     radius: FloatProperty(name="radius", default=1.0)
     segments: IntVectorProperty(name="segments", size=2, default=(24, 16))
+    shape: EnumProperty(
+        name="shape",
+        description="Shape of the instancer of the atoms",
+        items=(('UV_SPHERE', "UV_SPHERE", "UV sphere"),
+               ('ICO_SPHERE', "ICO_SPHERE", "Icosphere"),
+               ('POINT_CLOUD', "POINT_CLOUD", "Points, rendered as spheres by Cycles")),
+        default='UV_SPHERE')
+    subdivisions: IntProperty(name="subdivisions", min=1, max=7, default=2)
     color: FloatVectorProperty(
         name="color", size=4,
         subtype='COLOR',
@@ -68,6 +76,8 @@ class Bspecies(Base):
             'material_style': self.material_style,
             'color': self.color[:],
             'scale': self.scale,
+            'shape': self.shape,
+            'subdivisions': self.subdivisions,
             'elements': self.element_dict,
         }
         return setdict
@@ -121,6 +131,14 @@ class Battribute(Base):
     dimension: IntProperty(name="index", default=1)
     shape_: IntVectorProperty(name="shape_", soft_min=0, size=32)
     delimiter: StringProperty(name="delimiter", default='@')
+    packed: BoolProperty(name="packed", default=False,
+                         description="Array saved in one mesh attribute, "
+                         "e.g. FLOAT_VECTOR")
+    categorical: BoolProperty(name="categorical", default=False,
+                              description="String saved as INT code "
+                              "of the categories")
+    categories: StringProperty(name="categories", default='[]',
+                               description="json list of the categories")
 
     @property
     def natt(self) -> int:
@@ -201,6 +219,16 @@ class Bvolume(bpy.types.PropertyGroup):
     label: StringProperty(name="label", default='')
     npoint: IntProperty(name="npoint")
     shape: IntVectorProperty(name="shape", size=3)
+    storage: EnumProperty(
+        name="storage",
+        description="Storage of the volumetric data",
+        items=(('FILE', "Numpy file", "Float64 numpy file beside the "
+                ".blend, which is not self-contained then"),
+               ('MESH', "Mesh", "Float32 vertices of a mesh")),
+        default='FILE')
+    # numpy file of the data, empty if the data is in a mesh
+    filepath: StringProperty(name="filepath", default='',
+                             subtype='FILE_PATH')
 
 
 class Bboundary(Base):
@@ -344,6 +372,14 @@ class BatomsCollection(bpy.types.PropertyGroup):
         default='0')
 
     segments: IntVectorProperty(name="segments", size=2, default=(24, 16))
+    shape: EnumProperty(
+        name="shape",
+        description="Shape of the instancer of the atoms",
+        items=(('UV_SPHERE', "UV_SPHERE", "UV sphere"),
+               ('ICO_SPHERE', "ICO_SPHERE", "Icosphere"),
+               ('POINT_CLOUD', "POINT_CLOUD", "Points, rendered as spheres by Cycles")),
+        default='UV_SPHERE')
+    subdivisions: IntProperty(name="subdivisions", min=1, max=7, default=2)
     scale: FloatProperty(name="scale", default=1)
     show: BoolProperty(name="show", default=True)
     show_unit_cell: BoolProperty(name="show_unit_cell", default=True)
@@ -354,6 +390,13 @@ class BatomsCollection(bpy.types.PropertyGroup):
     boundary: PointerProperty(name="Bboundary", type=Bboundary)
     cell: PointerProperty(name='Bcell', type=Bcell)
     crystal_view: BoolProperty(name="crystal_view", default=False)
+    frame_backend: EnumProperty(
+        name="frame_backend",
+        description="Storage of the frames",
+        items=(('SHAPE_KEY', "Shape keys", "One shape key per frame"),
+               ('MEMMAP', "Numpy file",
+                "Frames in a memory-mapped numpy file")),
+        default='SHAPE_KEY')
     ui_list_index_species: IntProperty(name="ui_list_index_species",
                                default=0)
     ui_list_index_select: IntProperty(name="ui_list_index_select",
@@ -398,6 +441,13 @@ class BatomsObject(bpy.types.PropertyGroup):
                           type=Bcell)
     volume: PointerProperty(name='Bvolume',
                             type=Bvolume)
+    # numpy file of the frames, instead of the shape keys
+    frames_file: StringProperty(name="frames_file", default='',
+                                subtype='FILE_PATH')
+    # numpy file of the transforms of the instanced polyhedra in all frames
+    instances_file: StringProperty(name="instances_file", default='',
+                                   subtype='FILE_PATH')
+    frame_start: IntProperty(name="frame_start", default=0)
 
     # collection
     settings_attribute: CollectionProperty(name='settings_attribute',
@@ -3,6 +3,7 @@
 import numpy as np
 from time import time
 from ase.geometry import wrap_positions
+from batoms.parallel import cpu_workers
 import logging
 # logger = logging.getLogger('batoms')
 logger = logging.getLogger(__name__)
@@ -20,81 +21,96 @@ def RemovePbc(species0, positions0, cell, pbc, cutoffs):
 
 
 def bondlist_kdtree(quantities, species0, positions0, cell, pbc,
-                    setting, self_interaction=False):
+                    setting, self_interaction=False, engine='kdtree',
+                    parallel=1):
     """
     return
 
     i: index1
     j: index2
     k: search bond style
+
+    engine: str
+        'kdtree': add boundary atoms and search by KD-tree.
+        'cells': linked-cell search with periodic images of the bins,
+        faster and less memory for dense periodic crystals.
+    parallel: int
+        number of threads for the KD-tree search, -1 means all the CPUs.
+    """
+    cutoffs = setting2cutoffs(setting)
+    i, j, b, distances, offsets_j = primitive_neighbor_pairs(
+        species0, positions0, cell, pbc, cutoffs, engine, parallel)
+    return bondlist_from_pairs(quantities, i, j, b, distances, offsets_j,
+                               setting, self_interaction)
+
+
+def bondlist_incremental(quantities, cache, positions0, indices,
+                         setting, self_interaction=False):
+    """
+    Only search the bonds related with the moved atoms (indices),
+    using the neighbor structure saved in the cache.
+
+    return the same quantities as bondlist_kdtree, for all bonds
+    which include at least one of the moved atoms.
+    """
+    i, j, b, distances, offsets_j = cache.query(positions0, indices)
+    return bondlist_from_pairs(quantities, i, j, b, distances, offsets_j,
+                               setting, self_interaction)
+
+
+def bondlist_verlet(quantities, verlet, positions0, setting,
+                    self_interaction=False):
+    """
+    Search the bonds using the Verlet list, the neighbor lists are only
+    rebuilt when the atoms moved more than half of the skin.
+
+    return the same quantities as bondlist_kdtree.
+    """
+    i, j, b, distances, offsets_j = verlet.query(positions0)
+    return bondlist_from_pairs(quantities, i, j, b, distances, offsets_j,
+                               setting, self_interaction)
+
+
+def setting2cutoffs(setting):
+    """
+    get cutoffs {pair: [min, max]} from bond setting
     """
     cutoffs = {}
     for pair, b in setting.items():
         cutoffs[pair] = [b['min'], b['max']]
-    natom = len(positions0)
-    # orignal atoms
-    array1 = {
-        'positions': positions0,
-        'species': species0,
-        'indices': np.arange(natom),
-        'offsets': np.zeros((natom, 3)),
-    }
-    # atoms added with boundary
-    array2 = RemovePbc(species0, positions0, cell, pbc, cutoffs)
-    bonddatas = primitive_neighbor_kdtree(array1, array2, cutoffs)
-    # build bondlist
-    i = []
-    j = []
-    k = []
-    p = []
-    t = []
-    for pair, data in bonddatas.items():
-        if len(data) == 0:
-            continue
-        i1 = []
-        j1 = []
-        for i2, j2 in data.items():
-            n = len(j2)
-            i1.extend([i2]*n)
-            j1.extend(j2)
-        # remove bothways for same species, e.g. ('C', 'C')
-        if pair[0] == pair[1]:
-            i1 = np.array(i1)
-            j1 = np.array(j1)
-            # wrong, offset1 could be non zero
-            mask = np.where(
-                (array1['indices'][i1] > array2['indices'][j1]), False, True)
-            i1 = i1[mask]
-            j1 = j1[mask]
-            i1 = list(i1)
-            j1 = list(j1)
-        n = len(i1)
-        k1 = [setting[pair]['search']]*n
-        p1 = [setting[pair]['polyhedra']]*n
-        t1 = [setting[pair]['type']]*n
-        i.extend(i1)
-        j.extend(j1)
-        k.extend(k1)
-        p.extend(p1)
-        t.extend(t1)
-    # offsets
-    offsets_i = array1['offsets'][i]
-    offsets_j = array2['offsets'][j]
-    distance_vector = array1['positions'][i] - array2['positions'][j]
-    distances = np.sqrt(np.sum(distance_vector*distance_vector, axis=1))
-    #
-    i = array1['indices'][i]
-    j = array2['indices'][j]
-    k = np.array(k)
-    p = np.array(p)
-    t = np.array(t)
+    return cutoffs
+
+
+def bondlist_from_pairs(quantities, i, j, b, distances, offsets_j,
+                        setting, self_interaction=False):
+    """
+    build bondlist from the flat neighbor lists
+
+    i: index1
+    j: index2
+    b: index of the pair in setting
+    d: distance
+    S: offset of atoms in j
+    """
+    pairs = list(setting)
+    # remove bothways for same species, e.g. ('C', 'C')
+    same_species = np.array([pair[0] == pair[1] for pair in pairs],
+                            dtype=bool)
+    mask = ~(same_species[b] & (i > j))
+    i = i[mask]
+    j = j[mask]
+    b = b[mask]
+    distances = distances[mask]
+    offsets_j = offsets_j[mask]
+    # per pair properties, indexed by the pair index b
+    k = np.array([setting[pair]['search'] for pair in pairs], dtype=int)[b]
+    p = np.array([setting[pair]['polyhedra'] for pair in pairs],
+                 dtype=int)[b]
+    t = np.array([setting[pair]['type'] for pair in pairs], dtype=int)[b]
+    offsets_i = np.zeros((len(i), 3))
     # Remove all self-interaction.
     if not self_interaction:
-        mask = np.where((i == j) &
-                        ((array1['offsets'][i] ==
-                         array2['offsets'][j]).all(axis=1)),
-                        False, True)
-        # print(mask)
+        mask = ~((i == j) & (offsets_i == offsets_j).all(axis=1))
         i = i[mask]
         j = j[mask]
         k = k[mask]
@@ -129,25 +145,500 @@ def bondlist_kdtree(quantities, species0, positions0, cell, pbc,
 
 
 def neighbor_kdtree(species0, positions0, cell, pbc,
-                    cutoffs):
+                    cutoffs, engine='kdtree'):
     """
     wrap to pbc structure
 
+    return flat arrays
+
+    i: index1
+    j: index2
+    S: offset of atoms in j
+    d: distance
+    """
+    i, j, b, distances, offsets_j = primitive_neighbor_pairs(
+        species0, positions0, cell, pbc, cutoffs, engine)
+    return i, j, offsets_j, distances
+
+
+def primitive_neighbor_pairs(species0, positions0, cell, pbc,
+                             cutoffs, engine='kdtree', parallel=1):
     """
+    build flat neighbor lists for atoms with pbc, using the given engine.
+
+    return
+
+    i: index1
+    j: index2
+    b: index of the pair in cutoffs
+    d: distance
+    S: offset of atoms in j
+    """
+    if engine == 'cells':
+        return primitive_neighbor_pairs_cells(species0, positions0,
+                                              cell, pbc, cutoffs)
+    elif engine != 'kdtree':
+        raise ValueError('Unsupported engine: {}.'.format(engine))
     natom = len(positions0)
+    # atoms added with boundary, the first natom atoms are the wrapped
     # orignal atoms
+    array2 = RemovePbc(species0, positions0, cell, pbc, cutoffs)
     array1 = {
-        'positions': positions0,
+        'positions': array2['positions'][:natom],
         'species': species0,
         'indices': np.arange(natom),
-        'offsets': np.zeros((natom, 3)),
+        'offsets': array2['offsets'][:natom],
     }
-    # atoms added with boundary
-    array2 = RemovePbc(species0, positions0, cell, pbc, cutoffs)
-    bonddatas = primitive_neighbor_kdtree(array1, array2, cutoffs)
-    # bondlists = neighbor_kdtree(quantities,
-    # array1, array2, cutoffs, self_interaction)
-    return bonddatas
+    i, j, b, distances = primitive_neighbor_pairs_kdtree(array1, array2,
+                                                         cutoffs, parallel)
+    return array1['indices'][i], array2['indices'][j], b, distances, \
+        array2['offsets'][j] - array1['offsets'][i]
+
+
+class NeighborCache():
+    """
+    Cache the KD-tree of the atoms with boundary atoms, so that the
+    neighbours of a few moved atoms can be searched without rebuilding
+    the whole neighbor lists.
+
+    Parameters:
+
+    species0: array
+        species of atoms
+    positions0: array
+        positions of atoms when the cache is built
+    cell: array
+    pbc: list
+    cutoffs: dict
+        {pair: [min, max]}
+    max_moved: float
+        the cache is outdated when the ratio of moved atoms is larger
+        than max_moved.
+    """
+
+    def __init__(self, species0, positions0, cell, pbc, cutoffs,
+                 max_moved=0.1):
+        from scipy.spatial import cKDTree
+        self.species = np.array(species0)
+        self.cell = np.array(cell, dtype=float)
+        self.pbc = np.array(pbc, dtype=bool)
+        self.cutoffs = {pair: list(cutoff)
+                        for pair, cutoff in cutoffs.items()}
+        self.max_moved = max_moved
+        self.codes, _, self.table, self.cutoff_table = species_pair_table(
+            self.species, self.species, self.cutoffs)
+        self.boundary = RemovePbc(species0, positions0, cell, pbc, cutoffs)
+        self.tree = cKDTree(self.boundary['positions'])
+        # atoms moved since the tree was built
+        self.moved = np.zeros(len(positions0), dtype=bool)
+
+    def valid(self, species0, cell, pbc, cutoffs):
+        """
+        check the cache is built for the same atoms and cutoffs
+        """
+        if len(species0) != len(self.species):
+            return False
+        if not (np.array(species0) == self.species).all():
+            return False
+        if not np.allclose(np.array(cell, dtype=float), self.cell):
+            return False
+        if not (np.array(pbc, dtype=bool) == self.pbc).all():
+            return False
+        cutoffs = {pair: list(cutoff) for pair, cutoff in cutoffs.items()}
+        if cutoffs != self.cutoffs:
+            return False
+        return self.moved.mean() <= self.max_moved
+
+    def query(self, positions0, indices):
+        """
+        search neighbours of the moved atoms with their new positions.
+
+        return flat arrays for all pairs which include the moved atoms,
+        in both directions.
+
+        i: index1
+        j: index2
+        b: index of the pair in cutoffs
+        d: distance
+        S: offset of atoms in j
+        """
+        from scipy.spatial import cKDTree
+        positions0 = np.asarray(positions0, dtype=float)
+        indices = np.unique(np.asarray(indices, dtype=int))
+        self.moved[indices] = True
+        moved = np.where(self.moved)[0]
+        maxCutoff = self.cutoff_table[:, 1].max()
+        # 1) moved atoms with the atoms not moved, from the tree
+        # the tree only covers maxCutoff outside the cell, so the moved
+        # atoms are wrapped into the cell, and the shift is added to offsets
+        wrapped = wrap_positions(positions0[indices], self.cell,
+                                 pbc=self.pbc)
+        shifts = np.zeros((len(indices), 3))
+        if abs(np.linalg.det(self.cell)) > 1e-6:
+            shifts = np.rint(np.linalg.solve(
+                self.cell.T, (wrapped - positions0[indices]).T).T)
+        tree = cKDTree(wrapped)
+        data = tree.sparse_distance_matrix(self.tree, maxCutoff,
+                                           output_type='ndarray')
+        j = self.boundary['indices'][data['j']]
+        mask = ~self.moved[j]
+        i1 = indices[data['i'][mask]]
+        j1 = j[mask]
+        S1 = (self.boundary['offsets'][data['j'][mask]] -
+              shifts[data['i'][mask]]).astype(int)
+        d1 = data['v'][mask]
+        # 2) moved atoms with all the other moved atoms
+        i2, j2, b2, d2, S2 = primitive_neighbor_pairs_cells(
+            self.species[moved], positions0[moved], self.cell,
+            self.pbc, self.cutoffs)
+        i2 = moved[i2]
+        j2 = moved[j2]
+        mask = np.isin(i2, indices) | np.isin(j2, indices)
+        # add both directions for 1)
+        i = np.concatenate((i1, j1, i2[mask]))
+        j = np.concatenate((j1, i1, j2[mask]))
+        S = np.concatenate((S1, -S1, S2[mask]))
+        d = np.concatenate((d1, d1, d2[mask]))
+        # filter by the pair and its [min, max] cutoff
+        b = self.table[self.codes[i], self.codes[j]]
+        cutoff_min = self.cutoff_table[b, 0]
+        mask = (b >= 0) & (d <= self.cutoff_table[b, 1]) & \
+            ((d > cutoff_min) | (cutoff_min <= 1e-6))
+        return i[mask], j[mask], b[mask], d[mask], S[mask]
+
+
+class VerletList():
+    """
+    Verlet neighbor lists for a trajectory with the same atoms and cell.
+
+    The candidate pairs are searched with the max cutoff + skin. For the
+    following frames, only the distances of the candidate pairs are
+    calculated again, until any atom moved more than skin/2 since the
+    last build, then the candidate pairs are rebuilt.
+
+    Parameters:
+
+    species0: array
+        species of atoms
+    cell: array
+    pbc: list
+    cutoffs: dict
+        {pair: [min, max]}
+    skin: float
+    engine: str
+        engine used to build the candidate pairs
+    """
+
+    def __init__(self, species0, cell, pbc, cutoffs, skin, engine='kdtree'):
+        self.species = np.array(species0)
+        self.cell = np.array(cell, dtype=float)
+        self.pbc = pbc
+        self.cutoffs = cutoffs
+        self.skin = skin
+        self.engine = engine
+        self.cutoff_table = np.array([cutoff for cutoff in cutoffs.values()],
+                                     dtype=float).reshape(-1, 2)
+        # candidate pairs are searched without the min cutoff
+        self.cutoffs_skin = {pair: [0, cutoff[1] + skin]
+                             for pair, cutoff in cutoffs.items()}
+        self.positions = None
+        self.nbuild = 0
+        self.nquery = 0
+
+    def build(self, positions0):
+        """
+        build the candidate pairs with the max cutoff + skin
+        """
+        i, j, b, distances, offsets = primitive_neighbor_pairs(
+            self.species, positions0, self.cell, self.pbc,
+            self.cutoffs_skin, self.engine)
+        self.i = i
+        self.j = j
+        self.b = b
+        self.offsets = np.asarray(offsets).astype(int)
+        # vector from the offset, it does not change between frames
+        self.shifts = self.offsets @ self.cell
+        self.positions = np.array(positions0, dtype=float)
+        self.nbuild += 1
+
+    def query(self, positions0):
+        """
+        return flat arrays for the pairs within the cutoffs
+
+        i: index1
+        j: index2
+        b: index of the pair in cutoffs
+        d: distance
+        S: offset of atoms in j
+        """
+        positions0 = np.asarray(positions0, dtype=float)
+        self.nquery += 1
+        if self.positions is None or \
+                len(positions0) != len(self.positions):
+            self.build(positions0)
+        else:
+            displacement = np.linalg.norm(positions0 - self.positions,
+                                          axis=1)
+            if len(displacement) > 0 and \
+                    displacement.max() > self.skin/2:
+                self.build(positions0)
+        i = self.i
+        j = self.j
+        b = self.b
+        d = np.linalg.norm(positions0[j] + self.shifts - positions0[i],
+                           axis=1)
+        cutoff_min = self.cutoff_table[b, 0]
+        mask = (d <= self.cutoff_table[b, 1]) & \
+            ((d > cutoff_min) | (cutoff_min <= 1e-6))
+        return i[mask], j[mask], b[mask], d[mask], self.offsets[mask]
+
+
+def species_pair_table(species1, species2, cutoffs):
+    """
+    Encode species as integer codes, and build lookup tables for the pairs
+
+    return
+
+    codes1: species code of atoms1
+    codes2: species code of atoms2
+    table: index of the pair in cutoffs, indexed by (code1, code2),
+           -1 if the pair is not in cutoffs.
+    cutoff_table: [min, max] of each pair in cutoffs
+    """
+    n1 = len(species1)
+    species, codes = np.unique(np.append(species1, species2),
+                               return_inverse=True)
+    codes = codes.reshape(-1)
+    nsp = len(species)
+    table = -np.ones((nsp, nsp), dtype=int)
+    cutoff_table = np.zeros((len(cutoffs), 2))
+    for ib, (pair, cutoff) in enumerate(cutoffs.items()):
+        cutoff_table[ib] = cutoff
+        if pair[0] not in species or pair[1] not in species:
+            continue
+        c1 = np.searchsorted(species, pair[0])
+        c2 = np.searchsorted(species, pair[1])
+        table[c1, c2] = ib
+    return codes[:n1], codes[n1:], table, cutoff_table
+
+
+def primitive_neighbor_pairs_kdtree(array1, array2,
+                                    cutoffs, parallel=1):
+    """non pbc
+    build flat neighbor lists between atoms1 and atoms2.
+    In the non-pbc case: atoms1 and atoms2 could be the same.
+    In pbc case, atoms2 is atoms1 + boundary atoms
+
+    One tree is built for all pairs with the global max cutoff, then
+    the neighbours are filtered by the species pair and its cutoff.
+    With parallel > 1 (or -1 for all the CPUs), atoms1 are split into
+    chunks which are searched in threads.
+
+    return
+
+    i: index in array1
+    j: index in array2
+    b: index of the pair in cutoffs
+    d: distance
+    """
+    from scipy.spatial import cKDTree
+    tstart = time()
+    codes1, codes2, table, cutoff_table = species_pair_table(
+        array1['species'], array2['species'], cutoffs)
+    # only atoms belong to at least one pair
+    indices_i = np.where((table >= 0).any(axis=1)[codes1])[0]
+    indices_j = np.where((table >= 0).any(axis=0)[codes2])[0]
+    if len(indices_i) == 0 or len(indices_j) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), \
+            np.zeros(0, dtype=int), np.zeros(0)
+    maxCutoff = cutoff_table[:, 1].max()
+    tree2 = cKDTree(array2['positions'][indices_j])
+    workers = cpu_workers(parallel)
+    if workers > 1 and len(indices_i) > 10000:
+        i, j, d = sparse_distance_threads(array1['positions'][indices_i],
+                                          tree2, maxCutoff, workers)
+    else:
+        tree1 = cKDTree(array1['positions'][indices_i])
+        # all pairs within max cutoff, as a structured array (i, j, v)
+        data = tree1.sparse_distance_matrix(tree2, maxCutoff,
+                                            output_type='ndarray')
+        i, j, d = data['i'], data['j'], data['v']
+    i = indices_i[i]
+    j = indices_j[j]
+    b = table[codes1[i], codes2[j]]
+    # filter by the pair and its [min, max] cutoff
+    cutoff_min = cutoff_table[b, 0]
+    mask = (b >= 0) & (d <= cutoff_table[b, 1]) & \
+        ((d > cutoff_min) | (cutoff_min <= 1e-6))
+    i = i[mask]
+    j = j[mask]
+    b = b[mask]
+    d = d[mask]
+    logger.debug('Build bondlist: {:1.2f}'.format(time() - tstart))
+    return i, j, b, d
+
+
+def sparse_distance_threads(positions, tree, maxCutoff, workers):
+    """
+    The KD-tree releases the GIL, split the positions into chunks and
+    search the chunks against the tree in threads.
+
+    return flat arrays i, j, d
+    """
+    from scipy.spatial import cKDTree
+    from concurrent.futures import ThreadPoolExecutor
+
+    def search(start, end):
+        tree1 = cKDTree(positions[start:end])
+        data = tree1.sparse_distance_matrix(tree, maxCutoff,
+                                            output_type='ndarray')
+        return data['i'] + start, data['j'], data['v']
+
+    bounds = np.linspace(0, len(positions), workers + 1).astype(int)
+    with ThreadPoolExecutor(workers) as executor:
+        results = list(executor.map(search, bounds[:-1], bounds[1:]))
+    i, j, d = zip(*results)
+    return np.concatenate(i), np.concatenate(j), np.concatenate(d)
+
+
+def primitive_neighbor_pairs_cells(species, positions, cell, pbc,
+                                   cutoffs):
+    """pbc and non pbc
+    build flat neighbor lists using a linked-cell (cell-list) search.
+
+    Atoms are binned in fractional coordinates, bins are at least as wide
+    as the max cutoff, so only the neighbouring bins need to be searched.
+    Periodic images are handled by shifting the bin index instead of
+    replicating the atoms.
+
+    return
+
+    i: index1
+    j: index2
+    b: index of the pair in cutoffs
+    d: distance
+    S: offset of atoms in j
+    """
+    from ase.geometry import complete_cell
+    from itertools import product
+    tstart = time()
+    positions = np.asarray(positions, dtype=float)
+    natom = len(positions)
+    pbc = np.array(pbc, dtype=bool)
+    codes, _, table, cutoff_table = species_pair_table(
+        species, species, cutoffs)
+    if not (table >= 0).any() or natom == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), \
+            np.zeros(0, dtype=int), np.zeros(0), np.zeros((0, 3), dtype=int)
+    maxCutoff = cutoff_table[:, 1].max()
+    cell = complete_cell(np.asarray(cell, dtype=float))
+    # height of the cell along each axis
+    volume = abs(np.linalg.det(cell))
+    heights = volume/np.linalg.norm(np.cross(cell[[1, 2, 0]],
+                                             cell[[2, 0, 1]]), axis=1)
+    scaled = np.linalg.solve(cell.T, positions.T).T
+    # wrap atoms into the cell, and record the shift
+    shifts = np.zeros((natom, 3), dtype=int)
+    shifts[:, pbc] = np.floor(scaled[:, pbc]).astype(int)
+    scaled = scaled - shifts
+    # bins along each axis, for non pbc, use the range of the atoms
+    origin = np.where(pbc, 0, scaled.min(axis=0))
+    length = np.where(pbc, 1, np.maximum(scaled.max(axis=0) - origin, 1e-6))
+    nbins = np.maximum(1, np.floor(length*heights/maxCutoff)).astype(int)
+    # number of bins to search along each axis
+    nsearch = np.ceil(maxCutoff*nbins/(length*heights + 1e-12)).astype(int)
+    nsearch = np.maximum(1, nsearch)
+    bins3d = np.floor((scaled - origin)/length*nbins).astype(int)
+    bins3d = np.clip(bins3d, 0, nbins - 1)
+    bins = np.ravel_multi_index(bins3d.T, nbins)
+    # sort atoms by bins, the atoms inside one bin are contiguous
+    order = bins.argsort(kind='stable')
+    counts = np.bincount(bins, minlength=np.prod(nbins))
+    starts = np.cumsum(counts) - counts
+    wrapped = np.dot(scaled, cell)[order]
+    bins3d = bins3d[order]
+    codes = codes[order]
+    # atoms belong to at least one pair, either side for the half stencil
+    active = (table >= 0).any(axis=1) | (table >= 0).any(axis=0)
+    indices_i = np.where(active[codes])[0]
+    # the stencil is separable, precompute the neighbouring bin, the image
+    # and the shift vector for each axis
+    axis_bins = []
+    axis_images = []
+    axis_vectors = []
+    for c in range(3):
+        if pbc[c] or nbins[c] > 1:
+            deltas = range(-nsearch[c], nsearch[c] + 1)
+        else:
+            deltas = range(0, 1)
+        axis_bins.append({})
+        axis_images.append({})
+        axis_vectors.append({})
+        for delta in deltas:
+            nbin = bins3d[indices_i, c] + delta
+            image = np.floor_divide(nbin, nbins[c])
+            axis_bins[c][delta] = nbin - image*nbins[c]
+            axis_images[c][delta] = image
+            axis_vectors[c][delta] = image[:, None]*cell[c]
+    axis_vectors[0] = {key: value - wrapped[indices_i]
+                       for key, value in axis_vectors[0].items()}
+    i = [np.zeros(0, dtype=int)]
+    j = [np.zeros(0, dtype=int)]
+    d = [np.zeros(0)]
+    S = [np.zeros((0, 3), dtype=int)]
+    # half stencil, the other half is added by symmetry
+    for delta in product(*axis_bins):
+        if delta < (0, 0, 0):
+            continue
+        nbin = (axis_bins[0][delta[0]]*nbins[1] +
+                axis_bins[1][delta[1]])*nbins[2] + axis_bins[2][delta[2]]
+        # no image along non pbc axis
+        mask = np.ones(len(indices_i), dtype=bool)
+        for c in np.where(~pbc)[0]:
+            mask &= axis_images[c][delta[c]] == 0
+        n = counts[nbin]*mask
+        total = n.sum()
+        if total == 0:
+            continue
+        # expand to all atoms inside the neighbouring bin
+        ind_j = np.repeat(starts[nbin] - (np.cumsum(n) - n), n) + \
+            np.arange(total)
+        distance_vector = np.repeat(axis_vectors[0][delta[0]] +
+                                    axis_vectors[1][delta[1]] +
+                                    axis_vectors[2][delta[2]],
+                                    n, axis=0) + wrapped[ind_j]
+        d2 = np.einsum('ij,ij->i', distance_vector, distance_vector)
+        keep = np.repeat(np.arange(len(indices_i)), n)
+        mask = d2 <= maxCutoff**2
+        if delta == (0, 0, 0):
+            # inside the same bin, only once for each pair
+            mask &= ind_j >= indices_i[keep]
+        keep = keep[mask]
+        i.append(indices_i[keep])
+        j.append(ind_j[mask])
+        d.append(np.sqrt(d2[mask]))
+        S.append(np.array([axis_images[c][delta[c]][keep]
+                           for c in range(3)]).T.reshape(-1, 3))
+    i = np.concatenate(i)
+    j = np.concatenate(j)
+    d = np.concatenate(d)
+    S = np.concatenate(S)
+    # add the other half: (j, i, -S), except the atom itself
+    mask = ~((i == j) & (S == 0).all(axis=1))
+    i, j = np.append(i, j[mask]), np.append(j, i[mask])
+    d = np.append(d, d[mask])
+    S = np.append(S, -S[mask], axis=0)
+    b = table[codes[i], codes[j]]
+    # filter by the pair and its [min, max] cutoff
+    cutoff_min = cutoff_table[b, 0]
+    mask = (b >= 0) & (d <= cutoff_table[b, 1]) & \
+        ((d > cutoff_min) | (cutoff_min <= 1e-6))
+    i = order[i[mask]]
+    j = order[j[mask]]
+    # offsets of atoms j relative to the original positions
+    S = S[mask] + shifts[i] - shifts[j]
+    logger.debug('Build bondlist by cells: {:1.2f}'.format(time() - tstart))
+    return i, j, b[mask], d[mask], S
 
 
 def primitive_neighbor_kdtree(array1, array2,
@@ -156,45 +647,22 @@ def primitive_neighbor_kdtree(array1, array2,
     build bond lists between atoms1 and atoms2.
     In the non-pbc case: atoms1 and atoms2 could be the same.
     In pbc case, atoms2 is atoms1 + boundary atoms
+
+    return a dict for each pair, which save the neighbours of each atom.
+    Use primitive_neighbor_pairs_kdtree to get flat arrays.
     """
-    from scipy.spatial import KDTree
-    tstart = time()
+    i, j, b, d = primitive_neighbor_pairs_kdtree(array1, array2,
+                                                 cutoffs, parallel)
     bonddatas = {}
-    for pair, cutoff in cutoffs.items():
-        bonddatas[pair] = {}
-        indices_i = np.where(array1['species'] == pair[0])[0]
-        indices_j = np.where(array2['species'] == pair[1])[0]
-        if len(indices_i) == 0 or len(indices_j) == 0:
-            continue
-        indices_min = None
-        # qurey the smaller array is faster, flip is needed
-        p1 = array1['positions'][indices_i]
-        p2 = array2['positions'][indices_j]
-        # find max
-        tree = KDTree(p2)
-        indices_max = tree.query_ball_point(p1, r=cutoff[1], workers=parallel)
-        # find min
-        if cutoff[0] > 1e-6:
-            indices_min = tree.query_ball_point(
-                p1, r=cutoff[0], workers=parallel)
-        #
-        n = len(p1)
-        if indices_min is not None:
-            for k in range(n):
-                indices_max[k] = list(
-                    set(indices_max[k]) - set(indices_min[k]))
-                m = len(indices_max[k])
-                if m == 0:
-                    continue
-                bonddatas[pair][indices_i[k]] = indices_j[indices_max[k]]
-        else:
-            for k in range(n):
-                m = len(indices_max[k])
-                if m == 0:
-                    continue
-                bonddatas[pair][indices_i[k]] = indices_j[indices_max[k]]
-    logger.debug('Build bondlist: {:1.2f}'.format(time() - tstart))
-    # print(bonddatas)
+    for ib, pair in enumerate(cutoffs):
+        mask = b == ib
+        i1 = i[mask]
+        j1 = j[mask]
+        argsort = i1.argsort(kind='stable')
+        i1 = i1[argsort]
+        j1 = j1[argsort]
+        u, indices = np.unique(i1, return_index=True)
+        bonddatas[pair] = dict(zip(u, np.split(j1, indices[1:])))
     return bonddatas
 
 
@@ -253,6 +721,11 @@ def build_boundary(species, positions,
     # tstart = time()
     wraped_positions = wrap_positions(positions, cell, pbc=pbc)
     distances = pointCellDistance(wraped_positions, cell)
+    # offsets of the atoms moved by the wrapping
+    shifts = np.zeros((len(positions), 3))
+    if len(positions) > 0 and abs(np.linalg.det(cell)) > 1e-6:
+        shifts = np.rint(np.linalg.solve(np.array(cell).T,
+                         (wraped_positions - positions).T).T)
     natom = len(positions)
     # find atoms close to cell face with distance of r
     indices = [[[], []], [[], []], [[], []]]
@@ -276,13 +749,14 @@ def build_boundary(species, positions,
     nb1 = 0
     nb2 = 0
     for c in range(3):
-        if not pbc[i]:
+        if not pbc[c]:
             continue
         for i in range(2):
             nb2 = nb1 + len(indices[c][i])
             indices_b[nb1:nb2] = indices[c][i]
             positions_b[nb1:nb2] = positions[indices[c][i]]
-            offsets_b[nb1:nb2][:, c] = offset[i]
+            offsets_b[nb1:nb2] = shifts[indices[c][i]]
+            offsets_b[nb1:nb2][:, c] += offset[i]
             nb1 = nb2
     # build edge
     for c in [[0, 1], [0, 2], [1, 2]]:
@@ -294,8 +768,9 @@ def build_boundary(species, positions,
                 nb2 = nb1 + len(indices_j)
                 indices_b[nb1:nb2] = indices_j
                 positions_b[nb1:nb2] = positions[indices_j]
-                offsets_b[nb1:nb2][:, c[0]] = offset[i]
-                offsets_b[nb1:nb2][:, c[1]] = offset[j]
+                offsets_b[nb1:nb2] = shifts[indices_j]
+                offsets_b[nb1:nb2][:, c[0]] += offset[i]
+                offsets_b[nb1:nb2][:, c[1]] += offset[j]
                 nb1 = nb2
     # build corner
     if pbc[0] and pbc[1] and pbc[2]:
@@ -309,9 +784,10 @@ def build_boundary(species, positions,
                     nb2 = nb1 + len(indices3)
                     indices_b[nb1:nb2] = indices3
                     positions_b[nb1:nb2] = positions[indices3]
-                    offsets_b[nb1:nb2][:, 0] = offset[i]
-                    offsets_b[nb1:nb2][:, 1] = offset[j]
-                    offsets_b[nb1:nb2][:, 2] = offset[k]
+                    offsets_b[nb1:nb2] = shifts[indices3]
+                    offsets_b[nb1:nb2][:, 0] += offset[i]
+                    offsets_b[nb1:nb2][:, 1] += offset[j]
+                    offsets_b[nb1:nb2][:, 2] += offset[k]
                     nb1 = nb2
     positions_b = positions_b[0:nb2]
     indices_b = indices_b[0:nb2]
@@ -319,10 +795,10 @@ def build_boundary(species, positions,
     offsets_b = offsets_b[0:nb2]
     positions_b = positions_b + np.dot(offsets_b, cell)
     if include_self:
-        positions_b = np.append(positions, positions_b, axis=0)
+        positions_b = np.append(wraped_positions, positions_b, axis=0)
         indices_b = np.append(np.arange(natom), indices_b)
         species_b = np.append(species, species_b)
-        offsets_b = np.append(np.zeros((natom, 3)), offsets_b, axis=0)
+        offsets_b = np.append(shifts, offsets_b, axis=0)
 
     # print('build boundary: {:1.2f}'.format(time() - tstart))
     boundary_data = {
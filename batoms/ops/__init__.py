@@ -76,13 +76,15 @@ manuals = [manual_mapping.batoms_ase_manual_map,manual_mapping.batoms_manual_map
 
 def register_class():
     from bpy.utils import register_class
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
 
 
 def unregister_class():
     from bpy.utils import unregister_class
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
 
 
@@ -9,7 +9,6 @@ from bpy.props import (StringProperty,
                        IntProperty,
                        BoolProperty,
                        )
-from ase.cluster import Decahedron, Icosahedron, Octahedron, wulff_construction
 from batoms import Batoms
 
 
@@ -52,6 +51,7 @@ class BuildDecahedron(Operator):
             self.label = self.symbol
         latticeconstant = None if self.latticeconstant == 0 else \
             self.latticeconstant
+        from ase.cluster import Decahedron
         atoms = Decahedron(
             symbol=self.symbol,
             p=self.p,
@@ -94,6 +94,7 @@ class BuildIcosahedron(Operator):
             self.label = self.symbol
         latticeconstant = None if self.latticeconstant == 0 else \
             self.latticeconstant
+        from ase.cluster import Icosahedron
         atoms = Icosahedron(
             symbol=self.symbol,
             noshells=self.noshells,
@@ -143,6 +144,7 @@ class BuildOctahedron(Operator):
             self.label = self.symbol
         latticeconstant = None if self.latticeconstant == 0 else \
             self.latticeconstant
+        from ase.cluster import Octahedron
         atoms = Octahedron(
             symbol=self.symbol,
             cutoff=self.cutoff,
@@ -9,7 +9,6 @@ from bpy.props import (StringProperty,
                        FloatProperty,
                        BoolProperty,
                        )
-from ase.build import graphene_nanoribbon
 from batoms import Batoms
 
 
@@ -78,6 +77,7 @@ class BuildNanoribbon(Operator):
         description="saturate_element")
 
     def execute(self, context):
+        from ase.build import graphene_nanoribbon
         atoms = graphene_nanoribbon(
             n=self.n,
             m=self.m,
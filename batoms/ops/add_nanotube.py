@@ -10,7 +10,6 @@ from bpy.props import (StringProperty,
                        FloatProperty,
                        BoolProperty,
                        )
-from ase.build import nanotube
 from batoms import Batoms
 
 
@@ -60,6 +59,7 @@ class BuildNanotube(Operator):
     def execute(self, context):
         if self.label == '':
             self.label = self.symbol
+        from ase.build import nanotube
         atoms = nanotube(
             n=self.n,
             m=self.m,
@@ -9,7 +9,6 @@ from bpy.props import (StringProperty,
                        FloatVectorProperty,
                        BoolProperty,
                        )
-from ase.build import molecule, bulk
 from ase import Atoms
 from batoms import Batoms
 
@@ -31,6 +30,7 @@ class AddMolecule(Operator):
     def execute(self, context):
         if self.label == '':
             self.label = self.formula
+        from ase.build import molecule
         atoms = molecule(self.formula)
         if self.label in bpy.data.collections:
             self.label = "%s_001" % self.label
@@ -94,6 +94,7 @@ class AddBulk(Operator):
             self.latticeconstant[2]
         crystalstructure = None if self.crystalstructure == '' \
             else self.crystalstructure
+        from ase.build import bulk
         atoms = bulk(self.formula, crystalstructure=crystalstructure,
                      a=a, b=b, c=c,
                      orthorhombic=self.orthorhombic,
@@ -11,11 +11,6 @@ from bpy.props import (StringProperty,
                        FloatProperty,
                        BoolProperty,
                        )
-from ase.build import (fcc100, fcc110, fcc111, fcc211, fcc111_root,
-                       bcc100, bcc110, bcc111, bcc111_root,
-                       hcp10m10, hcp0001, hcp0001_root,
-                       diamond100, diamond111,
-                       )
 from batoms import Batoms
 
 
@@ -60,6 +55,7 @@ class BuildSurfaceFCC100(Operator):
         if self.label == '':
             self.label = '%s100'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import fcc100
         atoms = fcc100(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -113,6 +109,7 @@ class BuildSurfaceFCC110(Operator):
         if self.label == '':
             self.label = '%s100'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import fcc110
         atoms = fcc110(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -166,6 +163,7 @@ class BuildSurfaceFCC111(Operator):
         if self.label == '':
             self.label = '%s111'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import fcc111
         atoms = fcc111(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -215,6 +213,7 @@ class BuildSurfaceFCC211(Operator):
         if self.label == '':
             self.label = '%s211'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import fcc211
         atoms = fcc211(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -269,6 +268,7 @@ class BuildSurfaceFCC111Root(Operator):
         if self.label == '':
             self.label = '%s111_root'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import fcc111_root
         atoms = fcc111_root(self.symbol, size=self.size,
                             root=self.root,
                             a=a,
@@ -322,6 +322,7 @@ class BuildSurfaceBCC100(Operator):
         if self.label == '':
             self.label = '%s100'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import bcc100
         atoms = bcc100(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -375,6 +376,7 @@ class BuildSurfaceBCC110(Operator):
         if self.label == '':
             self.label = '%s110'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import bcc110
         atoms = bcc110(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -428,6 +430,7 @@ class BuildSurfaceBCC111(Operator):
         if self.label == '':
             self.label = '%s111'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import bcc111
         atoms = bcc111(self.symbol, size=self.size,
                        a=a,
                        vacuum=self.vacuum,
@@ -483,6 +486,7 @@ class BuildSurfaceBCC111Root(Operator):
         if self.label == '':
             self.label = '%s111_root'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import bcc111_root
         atoms = bcc111_root(self.symbol, size=self.size,
                             root=self.root,
                             a=a,
@@ -542,6 +546,7 @@ class BuildSurfaceHCP0001(Operator):
             self.label = '%s0001'%self.symbol
         a = None if self.a == 0 else self.a
         c = None if self.c == 0 else self.c
+        from ase.build import hcp0001
         atoms = hcp0001(self.symbol, size=self.size,
                         a=a,
                         c=c,
@@ -602,6 +607,7 @@ class BuildSurfaceHCP10m10(Operator):
             self.label = '%s10m10'%self.symbol
         a = None if self.a == 0 else self.a
         c = None if self.c == 0 else self.c
+        from ase.build import hcp10m10
         atoms = hcp10m10(self.symbol, size=self.size,
                          a=a,
                          c=c,
@@ -658,6 +664,7 @@ class BuildSurfaceHCP0001Root(Operator):
         if self.label == '':
             self.label = '%s0001_root'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import hcp0001_root
         atoms = hcp0001_root(self.symbol, size=self.size,
                              root=self.root,
                              a=a,
@@ -711,6 +718,7 @@ class BuildSurfaceDiamond100(Operator):
         if self.label == '':
             self.label = '%s_100'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import diamond100
         atoms = diamond100(self.symbol, size=self.size,
                            a=a,
                            vacuum=self.vacuum,
@@ -764,6 +772,7 @@ class BuildSurfaceDiamond111(Operator):
         if self.label == '':
             self.label = '%s_111'%self.symbol
         a = None if self.a == 0 else self.a
+        from ase.build import diamond111
         atoms = diamond111(self.symbol, size=self.size,
                            a=a,
                            vacuum=self.vacuum,
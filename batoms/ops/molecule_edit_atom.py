@@ -6,8 +6,6 @@ from bpy.props import (StringProperty,
 import bmesh
 from batoms import Batoms
 from ase import Atoms
-from ase.build.rotate import rotation_matrix_from_points
-from ase.build import rotate
 from ase.data import covalent_radii, chemical_symbols
 from ase.geometry import get_distances
 import numpy as np
@@ -51,6 +49,8 @@ def edit_atom(batoms, indices, element):
     Args:
         element (str): The target element
     """
+    from ase.build import rotate
+    from ase.build.rotate import rotation_matrix_from_points
     logger.debug('replace atoms')
     positions = batoms.positions
     species = batoms.arrays['species']
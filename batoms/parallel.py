@@ -0,0 +1,104 @@
+"""
+Run the per-frame calculations, e.g. bond and boundary search, in
+parallel.
+
+This module only uses numpy, the functions sent to the workers must not
+use bpy. The positions of all frames are saved in a shared memory, so
+that they are not copied to every worker.
+"""
+import os
+import sys
+import numpy as np
+from time import time
+import logging
+# logger = logging.getLogger('batoms')
+logger = logging.getLogger(__name__)
+
+
+def cpu_workers(workers):
+    """
+    Number of workers, -1 means all the CPUs, the same as scipy.
+    """
+    if workers is None:
+        return 1
+    if workers < 0:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def get_executor(workers):
+    """
+    Process pool if the process can be forked, otherwise a thread pool.
+
+    A new process started by spawn would import bpy again (batoms/__init__),
+    which is not available outside Blender.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    if 'fork' in multiprocessing.get_all_start_methods() and \
+            sys.platform != 'darwin':
+        return ProcessPoolExecutor(workers,
+                                   mp_context=multiprocessing.get_context(
+                                       'fork'))
+    return ThreadPoolExecutor(workers)
+
+
+def map_frames(func, frames, workers=1, key='positions', **kwargs):
+    """
+    Apply the function to every frame.
+
+    func: function
+        func(**{key: positions}, **kwargs), positions of one frame
+        is passed by the keyword key.
+    frames: array
+        (nframe, natom, 3)
+    workers: int
+        number of workers, -1 means all the CPUs.
+
+    return a list of the results of each frame.
+    """
+    nframe = len(frames)
+    workers = min(cpu_workers(workers), nframe)
+    if workers <= 1:
+        return [func(**{key: frames[f]}, **kwargs) for f in range(nframe)]
+    from multiprocessing import shared_memory
+    tstart = time()
+    frames = np.ascontiguousarray(frames, dtype=float)
+    shm = shared_memory.SharedMemory(create=True,
+                                     size=max(1, frames.nbytes))
+    try:
+        shared = np.ndarray(frames.shape, dtype=frames.dtype, buffer=shm.buf)
+        shared[:] = frames
+        # a few chunks per worker to balance the load
+        chunks = np.array_split(np.arange(nframe),
+                                min(nframe, workers*4))
+        with get_executor(workers) as executor:
+            futures = [executor.submit(_run_frames, func, shm.name,
+                                       frames.shape, frames.dtype.str,
+                                       chunk, key, kwargs)
+                       for chunk in chunks]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+    finally:
+        shm.close()
+        shm.unlink()
+    logger.debug('map {0} frames with {1} workers: {2:10.2f} s'.format(
+        nframe, workers, time() - tstart))
+    return results
+
+
+def _run_frames(func, name, shape, dtype, indices, key, kwargs):
+    """
+    Run the function for the frames in the shared memory.
+    """
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        frames = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        # copy the frame, the results may keep a view of the positions
+        results = [func(**{key: np.array(frames[f])}, **kwargs)
+                   for f in indices]
+    finally:
+        shm.close()
+    return results
@@ -11,7 +11,6 @@ import numpy as np
 
 from ase.atoms import Atoms
 from ase.cell import Cell
-from ase.io.espresso import label_to_symbol
 
 
 def read_atom_line(line):
@@ -115,6 +114,7 @@ HELIX    3   3 GLY A  724  LEU A  728  5   5
 
 def read_pdb(fileobj, index=-1, read_arrays=True):
     """Read PDB files."""
+    from ase.io.espresso import label_to_symbol
     if isinstance(fileobj, str):
         fileobj = open(fileobj)
     images = []
@@ -38,7 +38,8 @@ def register_class():
                                     type=bpy_data.Cavity)
     Scene.Bcavity = PointerProperty(type=gui.CavityProperties)
 #
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
 
 def unregister_class():
@@ -48,7 +49,8 @@ def unregister_class():
     del Collection.Bcavity
     del Object.Bcavity
     del Scene.Bcavity
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     for cls in reversed(classes_bpy_data):
         unregister_class(cls)
\ No newline at end of file
@@ -11,8 +11,7 @@ from batoms.attribute import Attributes
 from batoms.base.object import ObjectGN
 from batoms.plugins.base import PluginObject
 from .setting import CavitySettings
-from scipy import spatial
-from batoms.utils.butils import object_mode, get_nodes_by_name
+from batoms.utils.butils import object_mode, get_nodes_by_name, get_workers
 from batoms.utils import string2Number
 import logging
 # logger = logging.getLogger('batoms')
@@ -123,6 +122,7 @@ class Cavity(ObjectGN, PluginObject):
         Algorithm:
         Use KDTree to query the tree for neighbors within a radius r.
         """
+        from scipy import spatial
         tstart = time()
         kdtree_mesh = spatial.KDTree(meshgrids)
         indices = kdtree_mesh.query_ball_point(points, radii)
@@ -174,7 +174,8 @@ class Cavity(ObjectGN, PluginObject):
         cell = self.batoms.cell
         self.build_grid(cell, self.resolution)
         self.build_kdtree(arrays["positions"])
-        indices, distances = self.query_distance(self.meshgrids)
+        indices, distances = self.query_distance(self.meshgrids,
+                                                 parallel=get_workers())
         spheres = self.find_cage_spheres(distances)
         spheres = self.check_sphere_boundary(spheres, cell)
         # spheres = self.refine_spheres(spheres)
@@ -305,7 +306,8 @@ class Cavity(ObjectGN, PluginObject):
             grids.append(grid)
         meshgrids0 = self.base_meshgrids(grids)
         meshgrids = meshgrids0 + center
-        indices, distances = self.query_distance(meshgrids)
+        indices, distances = self.query_distance(meshgrids,
+                                                 parallel=get_workers())
         imax = np.argmax(distances)
         radius = distances[imax]
         return center, radius
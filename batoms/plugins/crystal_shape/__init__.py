@@ -39,7 +39,8 @@ def register_class():
                                     type=bpy_data.CrystalShape)
     Scene.Bcrystalshape = PointerProperty(type=gui.CrystalShapeProperties)
     #
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
 
 def unregister_class():
@@ -49,7 +50,8 @@ def unregister_class():
     del Collection.Bcrystalshape
     del Object.Bcrystalshape
     del Scene.Bcrystalshape
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     for cls in reversed(classes_bpy_data):
         unregister_class(cls)
\ No newline at end of file
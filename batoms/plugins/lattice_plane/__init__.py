@@ -40,7 +40,8 @@ def register_class():
                                     type=bpy_data.LatticePlane)
     Scene.Blatticeplane = PointerProperty(type=gui.LatticePlaneProperties)
     #
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
 
 def unregister_class():
@@ -51,7 +52,8 @@ def unregister_class():
     del Collection.Blatticeplane
     del Object.Blatticeplane
     del Scene.Blatticeplane
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     for cls in reversed(classes_bpy_data):
         unregister_class(cls)
@@ -55,16 +55,17 @@ class MolecularSurface(BaseObject):
         return mat
 
     def draw(self, ms_name="ALL"):
-        from batoms.utils.butils import clean_coll_object_by_type
+        from batoms.utils.butils import clean_coll_object_by_type, get_workers
         # delete old plane
         clean_coll_object_by_type(self.batoms.coll, 'MS')
+        parallel = get_workers()
         for ms in self.settings.bpy_setting:
             if ms_name.upper() != "ALL" and ms.name != ms_name:
                 continue
             if ms.type == 'SAS':
-                self.draw_SAS(ms)
+                self.draw_SAS(ms, parallel=parallel)
             elif ms.type == 'SES':
-                self.draw_SES(ms)
+                self.draw_SES(ms, parallel=parallel)
 
     @property
     def sas_objs(self):
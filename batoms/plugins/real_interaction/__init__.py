@@ -20,7 +20,8 @@ classes = [
 
 def register_class():
     from bpy.utils import register_class
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
     scene = bpy.types.Scene
     scene.rbpanel = PointerProperty(type=modal_rigid_body.RigidBodyProperties)
@@ -29,7 +30,8 @@ def register_class():
     
 def unregister_class():
     from bpy.utils import unregister_class
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     scene = bpy.types.Scene
     del scene.rbpanel
@@ -22,12 +22,6 @@ from bpy.props import (StringProperty,
                        FloatVectorProperty,
                        )
 
-from ase.optimize import QuasiNewton, MDMin
-try:
-    from asap3 import EMT
-except:
-    from ase.calculators.emt import EMT
-from ase.constraints import FixAtoms
 import logging
 # logger = logging.getLogger('batoms')
 logger = logging.getLogger(__name__)
@@ -45,6 +39,7 @@ def translate(selected_vertices, displacement,
     # bpy.context.scene.frame_set(frame_start)
     batoms = Batoms(label)
     # Move selected atom with mouse
+    from ase.constraints import FixAtoms
     atoms = batoms.atoms
     fixed = []
     for label, species, name, index in selected_vertices:
@@ -59,7 +54,13 @@ def translate(selected_vertices, displacement,
     optimize(atoms, fmax, steps)
     batoms.set_frames([atoms], frame_start=frame_start)
     # set new positions of atoms
+    positions0 = batoms.positions
     batoms.positions = atoms
+    # update the bonds of the moved atoms
+    moved = ~np.isclose(batoms.positions, positions0).all(axis=1)
+    moved = np.where(moved)[0]
+    batoms.update_moved_bonds(moved)
+    batoms.update_moved_polyhedra(moved)
     # batoms.model_style = 1
     # batoms.bondsetting.add(['Al', 'Al'])
     # batoms.draw_bonds()
@@ -69,6 +70,11 @@ def translate(selected_vertices, displacement,
 def optimize(atoms, fmax=0.05, steps=5):
     """
     """
+    from ase.optimize import QuasiNewton
+    try:
+        from asap3 import EMT
+    except ImportError:
+        from ase.calculators.emt import EMT
     atoms.calc = EMT()
     qn = QuasiNewton(atoms)
     qn.run(fmax=fmax, steps=steps)
@@ -36,7 +36,8 @@ def register_class():
                                     type=bpy_data.Template)
     Scene.Btemplate = PointerProperty(type=gui.TemplateProperties)
     #
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
 
 def unregister_class():
@@ -46,7 +47,8 @@ def unregister_class():
     del Collection.Btemplate
     del Object.Btemplate
     del Scene.Btemplate
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
     for cls in reversed(classes_bpy_data):
         unregister_class(cls)
@@ -25,7 +25,8 @@ def register_class():
     from bpy.types import Collection, Object
     from bpy.props import PointerProperty
     from bpy.utils import register_class
-    for cls in classes:
+    from batoms.utils.butils import get_register_classes
+    for cls in get_register_classes(classes):
         register_class(cls)
     # attach to blender internal data
     Collection.Bpolyhedra = PointerProperty(name='Bpolyhedra',
@@ -37,7 +38,8 @@ def register_class():
 def unregister_class():
     from bpy.types import Collection, Object
     from bpy.utils import unregister_class
-    for cls in reversed(classes):
+    from batoms.utils.butils import get_register_classes
+    for cls in reversed(get_register_classes(classes)):
         unregister_class(cls)
 
     del Collection.Bpolyhedra
@@ -60,9 +60,11 @@ class Polyhedra(Base):
     # collection
     settings: CollectionProperty(name='polyhedrasetting',
                               type=PolyhedraSetting)
+    # draw the polyhedra with the same shape as instances
+    instanced: BoolProperty(name="instanced", default=False)
     
     def as_dict(self) -> dict:
         setdict = {
-            
+            'instanced': self.instanced,
         }
         return setdict
\ No newline at end of file
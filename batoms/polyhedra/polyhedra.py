@@ -4,11 +4,13 @@ This module defines the polyhedras object in the Batoms package.
 
 """
 
+import os
 import bpy
+from bpy.app.handlers import persistent
 from time import time
 from batoms.attribute import Attributes
 from batoms.utils.butils import object_mode, compareNodeType, get_nodes_by_name
-from batoms.utils import string2Number
+from batoms.utils import string2Number, unique_rows
 import numpy as np
 from batoms.base.object import ObjectGN
 from .setting import PolyhedraSettings
@@ -36,6 +38,13 @@ default_GroupInput = [
     ['style', 'NodeSocketInt', 'POINT'],
 ]
 
+default_instance_GroupInput = [
+    ['template_index', 'NodeSocketInt', 'POINT'],
+    ['instance_rotation1', 'NodeSocketVector', 'POINT'],
+    ['instance_scale', 'NodeSocketVector', 'POINT'],
+    ['instance_rotation2', 'NodeSocketVector', 'POINT'],
+]
+
 default_polyhedra_datas = {
     'atoms_index1': np.ones(0, dtype=int),
     'atoms_index2': np.ones(0, dtype=int),
@@ -353,33 +362,268 @@ class Polyhedra(ObjectGN):
         species = arrays['species']
         # frames_boundary = self.batoms.get_frames(self.batoms.batoms_boundary)
         # frames_search = self.batoms.get_frames(self.batoms.batoms_search)
-        nframe = len(frames)
-        polyhedra_datas = {}
+        # Scale Instances and Rotate Instances nodes are new in 3.1
+        instanced = self.instanced and bpy.app.version_string >= '3.1.0'
         tstart = time()
-        for f in range(nframe):
-            logger.debug('update polyhedra: {}'.format(f))
-            positions = frames[f, show, :]
-            bondlists = self.bondlists
-            if len(bondlists) == 0:
-                self.batoms.bond.update()
-                bondlists = self.batoms.bond.bondlists
-            polyhedra_kinds = \
-                self.calc_polyhedra_data(bondlists,
-                                         species,
-                                         positions,
-                                         arrays['model_style'][show])
-            if f == 0:
-                polyhedra_datas = polyhedra_kinds
-
+        # the polyhedra of the first frame, the mesh follows the atoms
+        # in the other frames by the geometry node
+        positions = frames[0, show, :]
+        bondlists = self.bondlists
+        if len(bondlists) == 0:
+            self.batoms.bond.update()
+            bondlists = self.batoms.bond.bondlists
+        polyhedra_datas = \
+            self.calc_polyhedra_data(bondlists,
+                                     species,
+                                     positions,
+                                     arrays['model_style'][show],
+                                     instanced=instanced,
+                                     frames=frames[:, show, :])
         if len(polyhedra_datas) == 0:
             return
+        instances = polyhedra_datas.get('instances', [])
+        # indices of all atoms, not only the shown ones
+        for template in instances:
+            template['atoms_index'] = np.where(show)[0][
+                template['atoms_index']]
         self.set_arrays(polyhedra_datas)
+        self.set_instances(instances)
         # self.coll.objects.link(bb.obj)
         # bpy.data.collections['Collection'].objects.unlink(bb.obj)
         # bb.set_frames()
         # bpy.context.scene.frame_set(self.batoms.nframe)
         logger.debug('draw polyhedra: {0:10.2f} s'.format(time() - tstart))
 
+    @property
+    def instanced(self):
+        return self.settings.coll.Bpolyhedra.instanced
+
+    @instanced.setter
+    def instanced(self, instanced):
+        self.settings.coll.Bpolyhedra.instanced = instanced
+        self.update()
+
+    @property
+    def obj_instance(self):
+        return bpy.data.objects.get('%s_polyhedra_instance' % self.label)
+
+    def set_instances(self, instances):
+        """
+        Draw the polyhedra with the same shape as instances.
+
+        One point for each polyhedron, at its center, with the index of
+        its template and the transform as attributes. The mesh of each
+        template is an instancer. If the number of polyhedra is not
+        changed, only the points and transforms are written.
+
+        The centers and transforms of all frames are saved in one numpy
+        file, the frame change handler writes the current one to the mesh.
+        """
+        tstart = time()
+        name = '%s_polyhedra_instance' % self.label
+        # remove the instancers of the old templates
+        i = len(instances)
+        while '%s_polyhedra_instancer_%s' % (self.label, i) in \
+                bpy.data.objects:
+            self.delete_obj('%s_polyhedra_instancer_%s' % (self.label, i))
+            i += 1
+        if len(instances) == 0:
+            instance_caches.pop(self.label, None)
+            self.delete_obj(name)
+            return
+        # (nframe, n, 12), center, rotation1, scale and rotation2
+        transforms = np.concatenate([t['transforms'] for t in instances],
+                                    axis=1)
+        template_index = np.concatenate([np.full(len(t['centers']), i)
+                                         for i, t in enumerate(instances)])
+        n = transforms.shape[1]
+        obj = self.obj_instance
+        if obj is None or len(obj.data.vertices) != n:
+            self.delete_obj(name)
+            mesh = bpy.data.meshes.new(name)
+            mesh.from_pydata(transforms[0, :, :3], [], [])
+            mesh.update()
+            obj = bpy.data.objects.new(name, mesh)
+            self.settings.coll.objects.link(obj)
+            obj.batoms.type = 'POLYHEDRA'
+            obj.batoms.label = self.label
+            obj.parent = self.batoms.obj
+            mesh.attributes.new('template_index', 'INT', 'POINT')
+            for key in ['instance_rotation1', 'instance_scale',
+                        'instance_rotation2']:
+                mesh.attributes.new(key, 'FLOAT_VECTOR', 'POINT')
+        obj.data.attributes['template_index'].data.foreach_set(
+            'value', template_index)
+        set_instance_transforms(obj, transforms[0])
+        if len(transforms) > 1:
+            save_instance_store(obj, transforms)
+        else:
+            clear_instance_store(obj)
+        instance_caches[self.label] = {'instances': instances,
+                                       'uid': obj.session_uid}
+        for i, template in enumerate(instances):
+            self.build_instancer(i, template)
+        self.build_instance_geometry_node(len(instances))
+        logger.debug('polyhedra: set_instances: {0:10.2f} s'.format(
+            time() - tstart))
+
+    def update_instances(self, indices):
+        """
+        Fit the transforms of the instances with the moved atoms again,
+        only their points are written. Draw all polyhedra again if the
+        templates are not cached, or a polyhedron loses its shape.
+
+        indices: list
+            indices of the moved atoms
+        """
+        obj = self.obj_instance
+        if obj is None or len(indices) == 0:
+            return
+        cache = instance_caches.get(self.label)
+        if cache is None or cache['uid'] != obj.session_uid:
+            self.update()
+            return
+        positions = self.batoms.local_positions
+        start = 0
+        points = []
+        transforms = []
+        for template in cache['instances']:
+            k = len(template['atoms_index'])
+            moved = np.isin(template['atoms_index'], indices).any(axis=1)
+            if moved.any():
+                subset = dict(template,
+                              atoms_index=template['atoms_index'][moved],
+                              offsets=template['offsets'][moved])
+                if not fit_instance_frames(subset, positions[None]).all():
+                    self.update()
+                    return
+                points.append(start + np.where(moved)[0])
+                transforms.append(subset['transforms'][0])
+            start += k
+        if len(points) > 0:
+            set_instance_transforms(obj, np.concatenate(transforms),
+                                    np.concatenate(points))
+
+    def build_instancer(self, index, template):
+        """
+        Mesh of the template, only the vertices are written if the faces
+        are not changed.
+        """
+        name = '%s_polyhedra_instancer_%s' % (self.label, index)
+        obj = bpy.data.objects.get(name)
+        vertices = template['vertices']
+        faces = template['faces']
+        if obj is not None and len(obj.data.vertices) == len(vertices) and \
+                len(obj.data.polygons) == len(faces):
+            old = np.empty(len(faces)*3, dtype=int)
+            obj.data.polygons.foreach_get('vertices', old)
+            if (old == faces.reshape(-1)).all():
+                obj.data.vertices.foreach_set('co', vertices.reshape(-1))
+                obj.data.update()
+                obj.data.materials.clear()
+                obj.data.materials.append(
+                    self.settings.materials[template['species']][0])
+                return obj
+        self.delete_obj(name)
+        mesh = bpy.data.meshes.new(name)
+        mesh.from_pydata(vertices, [], faces.tolist())
+        mesh.update()
+        mesh.materials.append(self.settings.materials[template['species']][0])
+        obj = bpy.data.objects.new(name, mesh)
+        obj.batoms.type = 'INSTANCER'
+        self.batoms.coll.children['%s_instancer' %
+                                  self.label].objects.link(obj)
+        obj.hide_set(True)
+        obj.hide_render = True
+        return obj
+
+    def build_instance_geometry_node(self, ntemplate):
+        """
+        Instance the templates on the points of obj_instance, the
+        transform is rotation1 @ scale @ rotation2.
+        """
+        from batoms.utils.butils import build_modifier
+        name = 'GeometryNodes_%s_polyhedra_instance' % self.label
+        modifier = self.obj_instance.modifiers.get(name)
+        if modifier is None:
+            modifier = build_modifier(self.obj_instance, name)
+        inputs = modifier.node_group.inputs
+        GroupInput = modifier.node_group.nodes[0]
+        GroupOutput = modifier.node_group.nodes[1]
+        nodes = modifier.node_group.nodes
+        links = modifier.node_group.links
+        for att in default_instance_GroupInput:
+            if att[0] in inputs:
+                continue
+            GroupInput.outputs.new(type=att[1], name=att[0])
+            inputs.new(att[1], att[0])
+            id = inputs[att[0]].identifier
+            modifier['%s_use_attribute' % id] = True
+            modifier['%s_attribute_name' % id] = att[0]
+        JoinGeometry = get_nodes_by_name(nodes,
+                                         '%s_JoinGeometry' % self.label,
+                                         'GeometryNodeJoinGeometry')
+        links.new(JoinGeometry.outputs[0], GroupOutput.inputs['Geometry'])
+        for link in JoinGeometry.inputs[0].links:
+            links.remove(link)
+        Position = get_nodes_by_name(nodes,
+                                     '%s_Position' % self.label,
+                                     'GeometryNodeInputPosition')
+        for i in range(ntemplate):
+            ObjectInstancer = get_nodes_by_name(nodes,
+                                                '%s_ObjectInstancer_%s' % (
+                                                    self.label, i),
+                                                'GeometryNodeObjectInfo')
+            ObjectInstancer.inputs['Object'].default_value = \
+                bpy.data.objects['%s_polyhedra_instancer_%s' % (
+                    self.label, i)]
+            CompareTemplate = get_nodes_by_name(nodes,
+                                                '%s_CompareTemplate_%s' % (
+                                                    self.label, i),
+                                                compareNodeType)
+            CompareTemplate.operation = 'EQUAL'
+            CompareTemplate.inputs[1].default_value = i
+            links.new(GroupInput.outputs['template_index'],
+                      CompareTemplate.inputs[0])
+            InstanceOnPoint = get_nodes_by_name(nodes,
+                                                '%s_InstanceOnPoint_%s' % (
+                                                    self.label, i),
+                                                'GeometryNodeInstanceOnPoints')
+            links.new(GroupInput.outputs['Geometry'],
+                      InstanceOnPoint.inputs['Points'])
+            links.new(CompareTemplate.outputs[0],
+                      InstanceOnPoint.inputs['Selection'])
+            links.new(ObjectInstancer.outputs['Geometry'],
+                      InstanceOnPoint.inputs['Instance'])
+            links.new(GroupInput.outputs['instance_rotation2'],
+                      InstanceOnPoint.inputs['Rotation'])
+            # scale and rotate in global space, around the center
+            ScaleInstances = get_nodes_by_name(nodes,
+                                               '%s_ScaleInstances_%s' % (
+                                                   self.label, i),
+                                               'GeometryNodeScaleInstances')
+            ScaleInstances.inputs['Local Space'].default_value = False
+            links.new(InstanceOnPoint.outputs['Instances'],
+                      ScaleInstances.inputs['Instances'])
+            links.new(GroupInput.outputs['instance_scale'],
+                      ScaleInstances.inputs['Scale'])
+            links.new(Position.outputs['Position'],
+                      ScaleInstances.inputs['Center'])
+            RotateInstances = get_nodes_by_name(nodes,
+                                                '%s_RotateInstances_%s' % (
+                                                    self.label, i),
+                                                'GeometryNodeRotateInstances')
+            RotateInstances.inputs['Local Space'].default_value = False
+            links.new(ScaleInstances.outputs['Instances'],
+                      RotateInstances.inputs['Instances'])
+            links.new(GroupInput.outputs['instance_rotation1'],
+                      RotateInstances.inputs['Rotation'])
+            links.new(Position.outputs['Position'],
+                      RotateInstances.inputs['Pivot Point'])
+            links.new(RotateInstances.outputs['Instances'],
+                      JoinGeometry.inputs[0])
+        modifier.node_group.update_tag()
+
     def update_geometry_node_material(self):
         """
         Make sure all species has a geometry node flow 
@@ -528,28 +772,25 @@ class Polyhedra(ObjectGN):
         pass
 
     def calc_polyhedra_data(self, bondlists, species, positions,
-                            model_styles):
+                            model_styles, instanced=False, frames=None):
         """
+        instanced: bool
+            the polyhedra with the same shape are not added to the mesh,
+            but returned as instances of the shape templates.
+        frames: array
+            (nframe, natom, 3), positions of all frames, the polyhedra
+            are only instanced if they keep the shape in all frames.
         """
-        from ase.data import chemical_symbols
-        from scipy.spatial import ConvexHull
-
         tstart = time()
-        chemical_symbols = np.array(chemical_symbols)
+        if frames is None:
+            frames = positions[None]
         # find bonds contribute to polyhedra
         indices = bondlists[:, 8].astype(bool)
         bondlists = bondlists[indices]
         # maxinum number of poly
         npoly = len(bondlists)
         if npoly == 0:
-            return default_polyhedra_datas
-        # properties
-        npoly = npoly*12
-        atoms_index1 = np.zeros(npoly, dtype=int)  # 0, 1, 2
-        atoms_index2 = np.zeros(npoly, dtype=int)  # 0, 1, 2
-        face_species_index = np.zeros(npoly, dtype=int)  # 0, 1, 2
-        widths = np.ones(npoly, dtype=float)
-        species_index = np.zeros(npoly, dtype=int)
+            return dict(default_polyhedra_datas, instances=[])
         # ------------------------------------
         # offsets10 = bondlists[:, 2:5]
         offsets20 = bondlists[:, 5:8]
@@ -557,77 +798,93 @@ class Polyhedra(ObjectGN):
         indices20 = bondlists[:, 1].astype(int)
         positions20 = positions[indices20] + offsets20
         # ---------------------------------------------
-        vertices = []
-        offsets = []
-        edges = []
-        faces = []
+        vertices = [np.zeros((0, 3))]
+        offsets = [np.zeros((0, 3))]
+        atoms_index1 = [np.zeros(0, dtype=int)]
+        atoms_index2 = [np.zeros(0, dtype=int)]
+        widths = [np.zeros(0)]
+        species_index = [np.zeros(0, dtype=int)]
+        faces = [np.zeros((0, 3), dtype=int)]
+        face_species_index = [np.zeros(0, dtype=int)]
+        instances = []
         nv = 0
-        nf = 0
         speciesarray = species[indices10]
         for poly in self.settings:
             # find center atoms == species
             spis = np.where(speciesarray == poly.species)[0]
-            indices1 = indices10[spis]
             bondlist1 = bondlists[spis]
             # center atoms is define by i and the offset
             atom_centers = bondlist1[:, [0, 2, 3, 4]]
-            positions21 = positions20[spis]
-            # find indices of center atoms
-            u, indices = np.unique(atom_centers, axis=0, return_inverse=True)
-            indices = np.append(indices, len(indices1))
-            n = len(u)
-            # print(n)
-            for i in range(n):
-                if model_styles[int(u[i, 0])] != 2:
+            # find indices of center atoms, and group the vertices
+            # of each center
+            u, inverse = unique_rows(atom_centers, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(u))
+            keep = (model_styles[u[:, 0].astype(int)] == 2) & (counts >= 4)
+            order = np.argsort(inverse, kind='stable')
+            order = order[keep[inverse[order]]]
+            if len(order) == 0:
+                continue
+            counts1 = counts[keep]
+            if instanced:
+                templates, mask = polyhedra_instances(
+                    positions20[spis][order], counts1)
+                for template in templates:
+                    template['species'] = poly.species
+                    # atoms at the vertices, to follow them in the frames
+                    vertex_indices = template['vertex_indices']
+                    template['atoms_index'] = \
+                        indices20[spis][order][vertex_indices]
+                    template['offsets'] = \
+                        offsets20[spis][order][vertex_indices]
+                    fit = fit_instance_frames(template, frames)
+                    # the others go to the mesh
+                    mask[template['polyhedra'][~fit]] = False
+                    if fit.sum() < 2:
+                        mask[template['polyhedra']] = False
+                        continue
+                    select_instances(template, fit)
+                    instances.append(template)
+                order = order[np.repeat(~mask, counts1)]
+                counts1 = counts1[~mask]
+                if len(order) == 0:
                     continue
-                mask = np.where(indices == i)[0]
-                vertices1 = positions21[mask]
-                dnv = len(vertices1)
-                if dnv >= 4:
-                    # search face for polyhedra
-                    hull = ConvexHull(vertices1)
-                    face = hull.simplices
-                    # tri = Delaunay(vertices1)
-                    # face = tri.simplices
-                    dnf = len(face)
-                    face = face + nv
-                    edge = []
-                    for f in face:
-                        edge.append([f[0], f[1]])
-                        edge.append([f[0], f[2]])
-                        edge.append([f[1], f[2]])
-                    edges = edges + list(edge)
-                    faces = faces + list(face)
-                    vertices.extend(vertices1)
-                    offsets.extend(bondlist1[mask, 5:8])
-                    nv1 = nv + dnv
-                    nf1 = nf + dnf
-                    atoms_index1[nv:nv1] = bondlist1[mask, 0]
-                    atoms_index2[nv:nv1] = bondlist1[mask, 1]
-                    widths[nv:nv1] = poly.width
-                    species_index[nv:nv1] = string2Number(poly.species)
-                    face_species_index[nf:nf1] = string2Number(poly.species)
-                    nv = nv1
-                    nf = nf1
-        n = len(vertices)
+            # search face for polyhedra
+            face = polyhedra_faces(positions20[spis][order], counts1)
+            dnv = len(order)
+            sp = string2Number(poly.species)
+            vertices.append(positions20[spis][order])
+            offsets.append(bondlist1[order, 5:8])
+            atoms_index1.append(indices10[spis][order])
+            atoms_index2.append(indices20[spis][order])
+            widths.append(np.full(dnv, poly.width))
+            species_index.append(np.full(dnv, sp))
+            faces.append(face + nv)
+            face_species_index.append(np.full(len(face), sp))
+            nv += dnv
+        n = nv
         if n == 0:
-            datas = default_polyhedra_datas
+            datas = dict(default_polyhedra_datas)
         else:
-            nf = len(faces)
+            faces = np.concatenate(faces)
+            # each edge once
+            edges = np.sort(faces[:, [[0, 1], [0, 2], [1, 2]]].reshape(-1, 2),
+                            axis=1)
+            edges = unique_rows(edges)
             shows = np.ones(n, dtype=int)
             datas = {
-                'atoms_index1': atoms_index1[0:n],
-                'atoms_index2': atoms_index2[0:n],
-                'species_index': species_index[0:n],
-                'face_species_index': face_species_index[0:nf],
-                'vertices': np.array(vertices),
-                'offsets': np.array(offsets),
-                'widths': widths[0:n],
-                'edges': edges,
-                'faces': faces,
+                'atoms_index1': np.concatenate(atoms_index1),
+                'atoms_index2': np.concatenate(atoms_index2),
+                'species_index': np.concatenate(species_index),
+                'face_species_index': np.concatenate(face_species_index),
+                'vertices': np.concatenate(vertices),
+                'offsets': np.concatenate(offsets),
+                'widths': np.concatenate(widths),
+                'edges': edges.tolist(),
+                'faces': faces.tolist(),
                 'shows': shows,
                 'model_styles': model_styles,
             }
+        datas['instances'] = instances
         # print('datas: ', datas)
         logger.debug('calc_polyhedra_data: {0:10.2f} s'.format(time() - tstart))
         return datas
@@ -648,4 +905,434 @@ class Polyhedra(ObjectGN):
         if len(self) > 1:
             data['array'] = dict(self.arrays)
         data['settings'] = self.settings.as_dict()
-        return data
\ No newline at end of file
+        data['instanced'] = self.instanced
+        return data
+
+
+# faces of the tetrahedron
+tetrahedron_faces = np.array([[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]])
+
+
+def polyhedra_faces(vertices, counts):
+    """
+    Faces of the convex hulls of many polyhedra.
+
+    The polyhedra are grouped by the number of vertices. The faces of a
+    group are taken from a template, the tetrahedron, the octahedron by
+    its opposite vertices, or for the others, the hull of one polyhedron
+    with the vertices sorted by their angles. The template faces are
+    checked, ConvexHull is only called for the polyhedra which do not
+    fit any template.
+
+    vertices: array
+        (n, 3), vertices of all polyhedra, one polyhedron after another
+    counts: array
+        number of vertices of each polyhedron
+
+    return the faces (m, 3) for all vertices, in the order of polyhedra.
+    """
+    counts = np.asarray(counts, dtype=int)
+    starts = np.cumsum(counts) - counts
+    npoly = len(counts)
+    polys = [np.zeros(0, dtype=int)]
+    faces = [np.zeros((0, 3), dtype=int)]
+    for cn in np.unique(counts):
+        group = np.where(counts == cn)[0]
+        points = vertices[starts[group, None] + np.arange(cn)]
+        for index, perm, template in group_faces(points):
+            face = perm[:, template]
+            polys.append(np.repeat(group[index], face.shape[1]))
+            faces.append((face + starts[group[index], None, None])
+                         .reshape(-1, 3))
+    polys = np.concatenate(polys)
+    faces = np.concatenate(faces)
+    order = np.argsort(polys, kind='stable')
+    logger.debug('polyhedra_faces: {0} polyhedra, {1} faces'.format(
+        npoly, len(faces)))
+    return faces[order]
+
+
+def group_faces(points, max_template=4):
+    """
+    Faces of polyhedra with the same number of vertices.
+
+    points: array
+        (m, cn, 3)
+
+    yield (index, perm, template), the indices of the polyhedra, the
+    order of their vertices (k, cn) and the faces of the template (nf, 3).
+    The faces of the polyhedra are perm[:, template], vertex perm[:, v]
+    of all the polyhedra is the vertex v of the template.
+    """
+    from scipy.spatial import ConvexHull
+    m, cn = points.shape[:2]
+    remain = np.arange(m)
+    if cn == 4:
+        perm = np.broadcast_to(np.arange(4), (m, 4))
+        valid = check_faces(points, perm[:, tetrahedron_faces])
+        yield remain[valid], perm[valid], tetrahedron_faces
+        remain = remain[~valid]
+    elif cn == 6:
+        perm, valid = octahedron_order(points)
+        valid[valid] = check_faces(points[valid],
+                                   perm[valid][:, octahedron_faces])
+        yield remain[valid], perm[valid], octahedron_faces
+        remain = remain[~valid]
+    # the template is the hull of the first polyhedron left, with the
+    # vertices sorted by their angles
+    ntemplate = 0
+    while len(remain) > 1 and ntemplate < max_template:
+        perm = angular_order(points[remain])
+        hull = ConvexHull(points[remain[0]][perm[0]])
+        valid = check_faces(points[remain], perm[:, hull.simplices])
+        valid[0] = True
+        yield remain[valid], perm[valid], hull.simplices
+        remain = remain[~valid]
+        ntemplate += 1
+    for i in remain:
+        hull = ConvexHull(points[i])
+        yield np.array([i]), np.arange(cn)[None, :], hull.simplices
+
+
+# one vertex from each of the three pairs of opposite vertices
+octahedron_faces = np.array([[a, 2 + b, 4 + c] for a in range(2)
+                             for b in range(2) for c in range(2)])
+
+
+def octahedron_order(points):
+    """
+    Order the vertices of octahedra by pairs of opposite vertices,
+    (a, a', b, b', c, c').
+
+    points: array
+        (m, 6, 3)
+
+    return the order (m, 6) and whether the pairs are found.
+    """
+    m = len(points)
+    d = points - points.mean(axis=1, keepdims=True)
+    d /= np.linalg.norm(d, axis=2, keepdims=True) + 1e-12
+    cos = np.einsum('mik, mjk->mij', d, d)
+    opposite = cos.argmin(axis=2)
+    rows = np.arange(m)[:, None]
+    valid = (opposite[rows, opposite] == np.arange(6)).all(axis=1)
+    pairs = np.zeros((m, 6), dtype=int)
+    used = np.zeros((m, 6), dtype=bool)
+    rows = np.arange(m)
+    for k in range(3):
+        first = (~used).argmax(axis=1)
+        pairs[:, 2*k] = first
+        pairs[:, 2*k + 1] = opposite[rows, first]
+        used[rows, first] = True
+        used[rows, opposite[rows, first]] = True
+    valid &= used.all(axis=1)
+    return pairs, valid
+
+
+def angular_order(points):
+    """
+    Sort the vertices of each polyhedron by the polar angle and then the
+    azimuthal angle of the direction from the center.
+
+    points: array
+        (m, cn, 3)
+    """
+    d = points - points.mean(axis=1, keepdims=True)
+    d /= np.linalg.norm(d, axis=2, keepdims=True) + 1e-12
+    z = np.round(d[:, :, 2], 2)
+    phi = np.round(np.arctan2(d[:, :, 1], d[:, :, 0]), 2)
+    return np.lexsort((phi, z), axis=-1)
+
+
+def check_faces(points, faces, eps=1e-6):
+    """
+    Whether the faces are the convex hull, i.e. all the vertices are on
+    the same side of every face, and no face is degenerate.
+
+    points: array
+        (m, cn, 3)
+    faces: array
+        (m, nf, 3)
+    """
+    m = len(points)
+    if m == 0:
+        return np.zeros(0, dtype=bool)
+    rows = np.arange(m)[:, None]
+    a = points[rows, faces[:, :, 0]]
+    b = points[rows, faces[:, :, 1]]
+    c = points[rows, faces[:, :, 2]]
+    normals = np.cross(b - a, c - a)
+    norms = np.linalg.norm(normals, axis=2)
+    size = np.linalg.norm(points - points.mean(axis=1, keepdims=True),
+                          axis=2).max(axis=1)
+    dist = np.einsum('mfk, mpk->mfp', normals, points) - \
+        np.einsum('mfk, mfk->mf', normals, a)[:, :, None]
+    tol = eps*(norms*size[:, None])[:, :, None]
+    side = ((dist <= tol).all(axis=2) | (dist >= -tol).all(axis=2)).all(axis=1)
+    return side & (norms > eps*size[:, None]**2).all(axis=1)
+
+
+def polyhedra_instances(vertices, counts, eps=1e-3, min_count=2):
+    """
+    Find the polyhedra with the same shape as instances of a template.
+
+    The polyhedra of the same template in group_faces have the same
+    topology. A polyhedron is an instance if its vertices are an affine
+    transform of the vertices of the first polyhedron of the template.
+
+    vertices: array
+        (n, 3), vertices of all polyhedra, one polyhedron after another
+    counts: array
+        number of vertices of each polyhedron
+    eps: float
+        tolerance of the vertices, relative to the size of the polyhedron
+    min_count: int
+        minimum number of instances of a template
+
+    return the templates and whether each polyhedron is an instance.
+    Each template has the keys:
+        vertices: (cn, 3) vertices, centered at zero
+        faces: (nf, 3)
+        polyhedra: (k, ) indices of the polyhedra
+        vertex_indices: (k, cn) indices of the vertices of each polyhedron,
+            in the order of the template vertices
+        centers: (k, 3) centers of the polyhedra
+        matrices: (k, 3, 3) the transform of each polyhedron,
+            vertex = center + matrix @ template vertex
+    """
+    counts = np.asarray(counts, dtype=int)
+    starts = np.cumsum(counts) - counts
+    instanced = np.zeros(len(counts), dtype=bool)
+    templates = []
+    for cn in np.unique(counts):
+        group = np.where(counts == cn)[0]
+        indices = starts[group, None] + np.arange(cn)
+        points = vertices[indices]
+        for index, perm, template in group_faces(points):
+            if len(index) < min_count:
+                continue
+            vertex_indices = np.take_along_axis(indices[index], perm, axis=1)
+            x = vertices[vertex_indices]
+            centers = x.mean(axis=1)
+            x = x - centers[:, None, :]
+            ref = x[0]
+            # x = ref @ matrix.T
+            matrices = np.einsum('ij, mjk->mki', np.linalg.pinv(ref), x)
+            error = np.abs(np.einsum('mki, ji->mjk', matrices, ref) - x)
+            size = np.linalg.norm(x, axis=2).max(axis=1)
+            fit = error.max(axis=(1, 2)) <= eps*size
+            if fit.sum() < min_count:
+                continue
+            templates.append({'vertices': ref,
+                              'faces': template,
+                              'polyhedra': group[index][fit],
+                              'vertex_indices': vertex_indices[fit],
+                              'centers': centers[fit],
+                              'matrices': matrices[fit],
+                              })
+            instanced[group[index][fit]] = True
+    return templates, instanced
+
+
+def instance_transforms(template, frames):
+    """
+    Centers and matrices of the instances of a template in all frames,
+    vertex = center + matrix @ template vertex, by least squares.
+
+    frames: array
+        (nframe, natom, 3), positions of the atoms
+
+    return centers (nframe, k, 3), matrices (nframe, k, 3, 3) and the
+    errors of the fit relative to the size of the polyhedra (nframe, k)
+    """
+    ref = template['vertices']
+    pinv = np.linalg.pinv(ref)
+    nframe = len(frames)
+    k = len(template['atoms_index'])
+    centers = np.empty((nframe, k, 3))
+    matrices = np.empty((nframe, k, 3, 3))
+    errors = np.empty((nframe, k))
+    for f in range(nframe):
+        x = frames[f][template['atoms_index']] + template['offsets']
+        centers[f] = x.mean(axis=1)
+        x = x - centers[f][:, None, :]
+        matrices[f] = np.einsum('ij, mjk->mki', pinv, x)
+        error = np.abs(np.einsum('mki, ji->mjk', matrices[f], ref) - x)
+        size = np.linalg.norm(x, axis=2).max(axis=1)
+        errors[f] = error.max(axis=(1, 2))/size
+    return centers, matrices, errors
+
+
+def fit_instance_frames(template, frames, eps=1e-3):
+    """
+    Fit the transforms of the instances in all frames, saved as
+    template['transforms'] (nframe, k, 12): the center, rotation1, scale
+    and rotation2.
+
+    return whether each instance keeps the shape of the template, within
+    eps, in all frames.
+    """
+    centers, matrices, errors = instance_transforms(template, frames)
+    nframe, k = errors.shape
+    transforms = np.empty((nframe, k, 12))
+    transforms[:, :, :3] = centers
+    for f in range(nframe):
+        for i, value in enumerate(decompose_affine(matrices[f])):
+            transforms[f, :, 3*i + 3:3*i + 6] = value
+    template['transforms'] = transforms
+    return (errors <= eps).all(axis=0)
+
+
+def select_instances(template, fit):
+    """Keep only the instances in fit."""
+    for key in ['polyhedra', 'vertex_indices', 'centers', 'matrices',
+                'atoms_index', 'offsets']:
+        template[key] = template[key][fit]
+    template['transforms'] = template['transforms'][:, fit]
+
+
+def set_instance_transforms(obj, transforms, indices=None):
+    """
+    Write the centers and transforms to the points of the instances.
+
+    transforms: array
+        (n, 12), center, rotation1, scale and rotation2
+    indices: array
+        indices of the points, all points by default
+    """
+    keys = ['co', 'instance_rotation1', 'instance_scale',
+            'instance_rotation2']
+    attributes = obj.data.attributes
+    n = len(obj.data.vertices)
+    for i, key in enumerate(keys):
+        value = transforms[:, 3*i:3*i + 3]
+        if indices is not None:
+            data = np.empty(n*3, dtype=np.float32)
+            if key == 'co':
+                obj.data.vertices.foreach_get('co', data)
+            else:
+                attributes[key].data.foreach_get('vector', data)
+            data = data.reshape(-1, 3)
+            data[indices] = value
+            value = data
+        value = np.asarray(value, dtype=np.float32).reshape(-1)
+        if key == 'co':
+            obj.data.vertices.foreach_set('co', value)
+        else:
+            attributes[key].data.foreach_set('vector', value)
+    obj.data.update()
+
+
+# {obj_name: FrameStore} of the transforms of the instanced polyhedra
+instance_stores = {}
+# templates of the instanced polyhedra, to update the moved instances,
+# {label: {'instances': templates, 'uid': session_uid}}
+instance_caches = {}
+
+
+def get_instance_store(obj):
+    """The FrameStore of the transforms, None if there is one frame."""
+    from batoms.base.object import FrameStore
+    filepath = obj.batoms.instances_file
+    if filepath == '':
+        return None
+    filepath = bpy.path.abspath(filepath)
+    store = instance_stores.get(obj.name)
+    if store is None or store.filepath != filepath:
+        if not os.path.exists(filepath):
+            logger.warning('File of the instances not found: %s' % filepath)
+            return None
+        store = FrameStore(filepath)
+        instance_stores[obj.name] = store
+    return store
+
+
+def save_instance_store(obj, transforms):
+    """Save the transforms of all frames to a numpy file."""
+    from batoms.utils.butils import get_sidecar_filepath
+    clear_instance_store(obj)
+    filepath = get_sidecar_filepath('%s_frames.npy' % obj.name)
+    np.save(bpy.path.abspath(filepath),
+            np.asarray(transforms, dtype=np.float32))
+    obj.batoms.instances_file = filepath
+    return get_instance_store(obj)
+
+
+def clear_instance_store(obj):
+    store = instance_stores.pop(obj.name, None)
+    if store is not None:
+        store.close()
+    obj.batoms.instances_file = ''
+
+
+@persistent
+def frame_change_instances(scene, *args):
+    """Write the centers and transforms of the current frame to the
+    instanced polyhedra.
+    """
+    for name in list(instance_stores):
+        obj = bpy.data.objects.get(name)
+        if obj is None or obj.batoms.instances_file == '':
+            instance_stores.pop(name).close()
+            continue
+        store = instance_stores[name]
+        index = min(max(scene.frame_current, 0), len(store) - 1)
+        if store.current == index or obj.mode != 'OBJECT':
+            continue
+        transforms = store[index]
+        if len(transforms) != len(obj.data.vertices):
+            continue
+        set_instance_transforms(obj, transforms)
+        store.current = index
+
+
+@persistent
+def instance_store_load(filepath):
+    """Open the transforms of the instances in the new file."""
+    for store in instance_stores.values():
+        store.close()
+    instance_stores.clear()
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH' and obj.batoms.instances_file != '':
+            get_instance_store(obj)
+
+
+@persistent
+def instance_store_save(filepath):
+    """Put the numpy files of the transforms beside the .blend file
+    before it is saved.
+    """
+    from batoms.utils.butils import save_sidecar_file
+    for obj in bpy.data.objects:
+        if obj.type != 'MESH' or obj.batoms.instances_file == '':
+            continue
+        store = instance_stores.pop(obj.name, None)
+        if store is not None:
+            store.close()
+        obj.batoms.instances_file = save_sidecar_file(
+            obj.batoms.instances_file, '%s_frames.npy' % obj.name, filepath)
+
+
+def decompose_affine(matrices):
+    """
+    Decompose the matrices into rotation1 @ scale @ rotation2, the
+    rotations are returned as euler angles (XYZ), which can be used by the
+    Instance on Points, Scale Instances and Rotate Instances nodes.
+
+    matrices: array
+        (m, 3, 3)
+    """
+    from scipy.spatial.transform import Rotation
+    u, s, vt = np.linalg.svd(matrices)
+    # proper rotations, the reflection goes to the scale
+    flip = np.linalg.det(u) < 0
+    u[flip, :, 2] *= -1
+    s[flip, 2] *= -1
+    flip = np.linalg.det(vt) < 0
+    vt[flip, 2, :] *= -1
+    s[flip, 2] *= -1
+    if len(matrices) == 0:
+        return np.zeros((0, 3)), s, np.zeros((0, 3))
+    rotation1 = Rotation.from_matrix(u).as_euler('xyz')
+    rotation2 = Rotation.from_matrix(vt).as_euler('xyz')
+    return rotation1, s, rotation2
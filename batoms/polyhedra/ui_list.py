@@ -105,5 +105,6 @@ class BATOMS_PT_polyhedra(Panel):
             sub.prop(kb, "color", text="Color")
             # col.prop(kb, "show_edge",  text="Show edge")
             # col.prop(kb, "width",  text="Width")
+            layout.prop(ba, "instanced", text="Instanced")
             op = layout.operator("batoms.polyhedra_draw",
                                  icon='GREASEPENCIL', text="Update")
@@ -12,6 +12,7 @@ from bpy.props import (
     BoolProperty,
     StringProperty,
     EnumProperty,
+    IntProperty,
 )
 from batoms.install.pip_dependencies import has_module
 from batoms.install import update
@@ -217,6 +218,14 @@ class BatomsAddonPreferences(AddonPreferences):
         set=set_logging_level,
         default=2,
         )
+
+    workers: IntProperty(
+        name="Workers",
+        description="Number of workers for the parallel calculation, "
+        "e.g. bond and boundary search of trajectory, -1 means all the CPUs",
+        min=-1,
+        default=1,
+        )
     
     isosurface: BoolProperty(
         name="isosurface",
@@ -333,6 +342,7 @@ class BatomsAddonPreferences(AddonPreferences):
         box = layout.box().column()
         box.label(text="Custom Settings")
         box.prop(self, "logging_level")
+        box.prop(self, "workers")
         box.prop(self, "batoms_setting_path")
         
 
@@ -2,6 +2,7 @@ import bpy
 from bpy.props import (StringProperty,
                        BoolProperty,
                        IntProperty,
+                       IntVectorProperty,
                        FloatProperty,
                        FloatVectorProperty,
                        CollectionProperty,
@@ -53,6 +54,19 @@ class Render(bpy.types.PropertyGroup):
                             description="Distance from camera",
                             default=-1)
     padding: FloatVectorProperty(name="padding", default=[1, 1, 1, 1], size=4)
+    lod: BoolProperty(name="lod", default=False,
+                      description="Level of detail of the atoms")
+    lod_segments: IntVectorProperty(name="lod_segments",
+                                    default=[48, 24, 12, 6], size=4,
+                                    description="Segments of each level")
+    lod_viewport: FloatVectorProperty(name="lod_viewport",
+                                      default=[10, 25, 50], size=3,
+                                      description="Distances between the "
+                                      "levels in the viewport")
+    lod_render: FloatVectorProperty(name="lod_render",
+                                    default=[20, 50, 100], size=3,
+                                    description="Distances between the "
+                                    "levels in the render")
 
     
     light_ui_list_index: IntProperty(name="light_ui_list_index",
@@ -288,6 +288,62 @@ class Render(BaseCollection):
         bpy.context.scene.cycles.motion_blur_position = 'START'
         bpy.context.scene.cycles.motion_blur_shutter = 30.0
 
+    @property
+    def lod(self):
+        return self.coll.Brender.lod
+
+    @lod.setter
+    def lod(self, lod):
+        self.coll.Brender.lod = lod
+        self.update_lod()
+
+    @property
+    def lod_segments(self):
+        return self.coll.Brender.lod_segments[:]
+
+    @lod_segments.setter
+    def lod_segments(self, lod_segments):
+        self.coll.Brender.lod_segments = lod_segments
+        self.update_lod()
+
+    @property
+    def lod_viewport(self):
+        return np.array(self.coll.Brender.lod_viewport)
+
+    @lod_viewport.setter
+    def lod_viewport(self, lod_viewport):
+        self.coll.Brender.lod_viewport = lod_viewport
+        self.update_lod()
+
+    @property
+    def lod_render(self):
+        return np.array(self.coll.Brender.lod_render)
+
+    @lod_render.setter
+    def lod_render(self, lod_render):
+        self.coll.Brender.lod_render = lod_render
+        self.update_lod()
+
+    def update_lod(self):
+        """Update the level of detail of the atoms.
+
+        Every atom uses the instancer with segments lod_segments[i],
+        where i is the number of distances in lod_viewport (lod_render
+        for rendering) smaller than the distance between the atom and
+        the camera. Needs Blender 3.1 or later.
+        """
+        if self.batoms is None:
+            return
+        if not self.lod or bpy.app.version_string < '3.1.0':
+            self.batoms.species.set_lod(None)
+            return
+        lod = {'camera': self.camera.obj,
+               'segments': self.lod_segments,
+               'viewport': self.lod_viewport,
+               'render': self.lod_render,
+               }
+        self.batoms.species.set_lod(lod)
+
     def set_viewport_distance_center(self, center=None,
                                      padding=None, canvas=None):
         """
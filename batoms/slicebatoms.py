@@ -80,3 +80,20 @@ class SliceBatoms(childObjectGN):
         model_style = np.array(bond).astype(int)
         self.set_attribute('model_style', model_style)
         self.parent.draw_ball_and_stick()
+
+    @property
+    def position(self):
+        return childObjectGN.position.fget(self)
+
+    @position.setter
+    def position(self, value):
+        if len(self.indices) == 1:
+            self.set_position(value)
+            self.parent.update_moved_bonds(self.indices)
+            self.parent.update_moved_polyhedra(self.indices)
+        else:
+            positions = self.parent.positions
+            positions[self.indices] = value
+            self.parent.positions = positions
+            self.parent.update_moved_bonds(self.indices)
+            self.parent.update_moved_polyhedra(self.indices)
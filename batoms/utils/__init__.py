@@ -572,4 +572,70 @@ def deprecated(msg):
     """
     logger.warning(msg)
     msg = "="*80 + "\n" + "Warning: " + msg + "\n" + "="*80 + "\n"
-    print(msg)
\ No newline at end of file
+    print(msg)
+
+def encode_rows(*arrays):
+    """Pack each row of integer arrays into one int64 key.
+
+    The columns are packed one by one, with the range of the column over
+    all the arrays as the radix, e.g. the offsets of the bondlists only
+    take a few bits. So the keys of the same row are the same for all the
+    arrays, and the order of the keys is the lexicographic order of the
+    rows.
+
+    Returns:
+        list: the keys of each array, or None if the arrays are not
+            integer or the key does not fit into int64.
+    """
+    arrays = [np.asarray(array) for array in arrays]
+    arrays = [array.reshape(-1, 1) if array.ndim == 1 else array
+              for array in arrays]
+    table = np.concatenate(arrays)
+    if table.dtype.kind not in 'iub':
+        return None
+    if len(table) == 0:
+        return [np.zeros(len(array), dtype=np.int64) for array in arrays]
+    lo = table.min(axis=0)
+    span = table.max(axis=0) - lo + 1
+    if math.prod(int(s) for s in span) >= 2**63:
+        return None
+    keys = []
+    for array in arrays:
+        key = np.zeros(len(array), dtype=np.int64)
+        for c in range(table.shape[1]):
+            key = key*int(span[c]) + (array[:, c] - lo[c])
+        keys.append(key)
+    return keys
+
+
+def unique_rows(array, return_index=False, return_inverse=False):
+    """Unique rows of an integer array, the same as np.unique(array, axis=0),
+    but np.unique runs on the int64 keys of the rows, which is a simple sort
+    instead of the sort over a structured view.
+    """
+    array = np.asarray(array)
+    keys = encode_rows(array) if array.ndim == 2 else None
+    if keys is None:
+        results = np.unique(array, axis=0, return_index=True,
+                            return_inverse=True)
+        index, inverse = results[1], results[2].reshape(-1)
+    else:
+        _, index, inverse = np.unique(keys[0], return_index=True,
+                                      return_inverse=True)
+    results = (array[index], )
+    if return_index:
+        results += (index, )
+    if return_inverse:
+        results += (inverse, )
+    return results[0] if len(results) == 1 else results
+
+
+def isin_rows(array, test):
+    """Whether each row of the array is also a row of the test array."""
+    array = np.asarray(array)
+    keys = encode_rows(array, test)
+    if keys is None:
+        test = set(map(tuple, np.asarray(test).tolist()))
+        return np.array([tuple(row) in test for row in array.tolist()],
+                        dtype=bool)
+    return np.isin(keys[0], keys[1])
@@ -45,6 +45,79 @@ def get_all_consoles():
                     consoles.append(console)
     return consoles
 
+def is_headless():
+    """Run without UI, e.g. blender -b on a render node. The UI classes,
+    menus, keymaps and the console hook are not registered.
+    BATOMS_HEADLESS=0 or 1 overrides the background mode of Blender.
+    """
+    import os
+    headless = os.environ.get('BATOMS_HEADLESS')
+    if headless is not None:
+        return headless not in ('', '0')
+    return bpy.app.background
+
+
+def get_register_classes(classes):
+    """Skip the panels, menus and lists in headless mode."""
+    if not is_headless():
+        return classes
+    ui_types = (bpy.types.Panel, bpy.types.Menu, bpy.types.UIList,
+                bpy.types.Header)
+    return [cls for cls in classes if not issubclass(cls, ui_types)]
+
+
+def get_sidecar_filepath(filename, blend_filepath=None):
+    """Path of a data file saved beside the .blend file, relative ('//')
+    and prefixed by the name of the .blend file, so the files of the
+    .blend files in the same directory do not collide. If the .blend file
+    is not saved, the file is in the temporary directory of Blender, and
+    is moved beside the .blend file when it is saved.
+
+    blend_filepath: str
+        path of the .blend file, the current one by default
+    """
+    import os
+    if blend_filepath is None:
+        blend_filepath = bpy.data.filepath
+    if blend_filepath:
+        blend = bpy.path.display_name_from_filepath(blend_filepath)
+        return '//%s_%s' % (blend, filename)
+    return os.path.join(bpy.app.tempdir, filename)
+
+
+def save_sidecar_file(filepath, filename, blend_filepath):
+    """Put a data file beside the .blend file which is being saved, and
+    return its new path. A file in the temporary directory is moved, a
+    file beside another .blend file is copied, that file may still use it.
+    """
+    import os
+    import shutil
+    src = os.path.normpath(bpy.path.abspath(filepath))
+    if not os.path.exists(src):
+        return filepath
+    new = get_sidecar_filepath(filename, blend_filepath)
+    dst = os.path.normpath(os.path.join(os.path.dirname(blend_filepath),
+                                        new[2:]))
+    if os.path.normcase(src) == os.path.normcase(dst):
+        return new
+    tempdir = os.path.normpath(bpy.app.tempdir)
+    if os.path.normcase(os.path.dirname(src)) == os.path.normcase(tempdir):
+        shutil.move(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+    return new
+
+
+def get_workers():
+    """
+    Number of workers for the parallel calculation, from the preferences.
+    """
+    addon = bpy.context.preferences.addons.get('batoms')
+    if addon is None:
+        return 1
+    return addon.preferences.workers
+
+
 def object_mode():
     for object in bpy.data.objects:
         if object.mode == 'EDIT':
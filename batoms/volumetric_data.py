@@ -1,7 +1,14 @@
 """
 Add Volumetric data.
+
+With the 'FILE' storage, the data is saved in numpy files beside the
+.blend file, the .blend file is not self-contained, and these files must
+be copied with it.
 """
+import os
+from collections import OrderedDict
 import bpy
+from bpy.app.handlers import persistent
 import numpy as np
 from time import time
 from batoms.base.collection import Setting
@@ -9,6 +16,60 @@ import logging
 # logger = logging.getLogger('batoms')
 logger = logging.getLogger(__name__)
 
+# volumes opened from the numpy files, {filepath: (stamp, volume)}
+volume_caches = OrderedDict()
+volume_cache_size = 4
+
+
+def save_volume_file(filepath, volume):
+    """Save the volume as a float64 numpy file. The data is written to a
+    new file, so that the volumes already opened are not changed.
+    """
+    filepath = bpy.path.abspath(filepath)
+    volume_caches.pop(filepath, None)
+    temp = filepath + '.tmp.npy'
+    np.save(temp, np.asarray(volume, dtype=np.float64))
+    os.replace(temp, filepath)
+
+
+@persistent
+def volume_files_save(filepath):
+    """Put the numpy files of the volumetric data beside the .blend file
+    before it is saved.
+    """
+    from batoms.utils.butils import save_sidecar_file
+    for coll in bpy.data.collections:
+        for setting in coll.batoms.settings_volume:
+            if setting.filepath == '':
+                continue
+            volume_caches.pop(bpy.path.abspath(setting.filepath), None)
+            setting.filepath = save_sidecar_file(
+                setting.filepath,
+                '%s_volume_%s.npy' % (setting.label, setting.name),
+                filepath)
+
+
+def read_volume_file(filepath):
+    """Open the numpy file as a read-only memory map, the data is only
+    read when it is used. The recently opened files are cached.
+    """
+    filepath = bpy.path.abspath(filepath)
+    if not os.path.exists(filepath):
+        logger.warning('File of the volumetric data not found: %s' %
+                       filepath)
+        return None
+    stat = os.stat(filepath)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cache = volume_caches.get(filepath)
+    if cache is not None and cache[0] == stamp:
+        volume_caches.move_to_end(filepath)
+        return cache[1]
+    volume = np.load(filepath, mmap_mode='r')
+    volume_caches[filepath] = (stamp, volume)
+    while len(volume_caches) > volume_cache_size:
+        volume_caches.popitem(last=False)
+    return volume
+
 
 
 class VolumetricData(Setting):
@@ -77,12 +138,13 @@ class VolumetricData(Setting):
             coll.batoms.label = label
 
     def build_object(self, setting, volume):
-        """Save volumetric data as a mesh
+        """Save volumetric data as a numpy file or a mesh
 
         Args:
             volume (array):
                 volumetric data, e.g. electron density
         """
+        from batoms.utils.butils import get_sidecar_filepath
         # remove old volume point
         # tstart = time()
         if volume is None:
@@ -90,11 +152,17 @@ class VolumetricData(Setting):
         name = "{}_volume_{}".format(self.label, setting.name)
         if name in bpy.data.objects:
             bpy.data.objects.remove(bpy.data.objects[name], do_unlink=True)
+        volume = np.asarray(volume)
         shape = volume.shape
+        setting.shape = shape
+        setting.npoint = volume.size
+        if setting.storage == 'FILE':
+            setting.filepath = get_sidecar_filepath('%s.npy' % name)
+            save_volume_file(setting.filepath, volume)
+            return
+        setting.filepath = ''
         volume = volume.reshape(-1, 1)
         npoint = len(volume)
-        setting.shape = shape
-        setting.npoint = npoint
         dn = 3 - npoint % 3
         verts = np.append(volume, np.zeros((dn, 1)), axis=0)
         verts = verts.reshape(-1, 3)
@@ -111,15 +179,17 @@ class VolumetricData(Setting):
         # print('Draw volume: {0:1.2f}'.format(time() - tstart))
     
     def get_volume(self, name):
-        """Retrieve volume data from a mesh
+        """Retrieve volume data from the numpy file or the mesh
 
         Returns:
-            array: Volumetric data
+            array: Volumetric data, read-only if it is from the file
         """
         # tstart = time()
         setting = self.find(name)
         if setting is None:
             return None
+        if setting.filepath != '':
+            return read_volume_file(setting.filepath)
         obj = bpy.data.objects.get('{}_volume_{}'.format(self.label, setting.name))
         if obj is None:
             return None
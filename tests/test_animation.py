@@ -18,7 +18,65 @@ def test_animation_crystal():
     tio2.boundary = 0.01
 
 
+def test_animation_stream():
+    import numpy as np
+    from batoms.bio import read_trajectory
+    bpy.ops.batoms.delete()
+    atoms = read("../tests/datas/deca_ala_md.xyz", index="::2")
+    deca = read_trajectory("../tests/datas/deca_ala_md.xyz", label="deca",
+                           step=2, chunk=3)
+    assert deca.nframe == len(atoms)
+    assert np.allclose(deca.get_frames()[-1], atoms[-1].positions)
+
+
+def test_animation_slice():
+    """only the frames in the slice are read from the shape keys"""
+    import numpy as np
+    from batoms.base.object import attribute_caches
+    bpy.ops.batoms.delete()
+    atoms = read("../tests/datas/deca_ala_md.xyz", index=":")
+    deca = Batoms("deca", from_ase=atoms)
+    frames = deca.get_frames()
+    assert len(frames) == len(atoms)
+    assert ("frames", ) not in attribute_caches.get("deca", {}).get("data", {})
+    assert np.allclose(deca.get_frames(2, 10, 3), frames[2:10:3])
+
+
+def test_animation_memmap():
+    import numpy as np
+    bpy.ops.batoms.delete()
+    atoms = read("../tests/datas/deca_ala_md.xyz", index=":")
+    deca = Batoms("deca", from_ase=atoms)
+    frames = deca.get_frames()
+    deca.frame_backend = "MEMMAP"
+    assert deca.nframe == len(atoms)
+    assert len(deca.obj.data.shape_keys.key_blocks) == 1
+    assert np.allclose(deca.get_frames(2, 10, 3), frames[2:10:3], atol=1e-5)
+    bpy.context.scene.frame_set(5)
+    assert np.allclose(deca.local_positions, frames[5], atol=1e-5)
+    deca.frame_backend = "SHAPE_KEY"
+    assert len(deca.obj.data.shape_keys.key_blocks) == len(atoms)
+
+
+def test_animation_memmap_delete():
+    import numpy as np
+    bpy.ops.batoms.delete()
+    atoms = read("../tests/datas/deca_ala_md.xyz", index=":")
+    deca = Batoms("deca", from_ase=atoms)
+    frames = deca.get_frames()
+    deca.frame_backend = "MEMMAP"
+    deca.delete([0, 1])
+    assert deca.get_frames().shape == (len(atoms), len(deca), 3)
+    assert np.allclose(deca.get_frames()[5], frames[5, 2:], atol=1e-5)
+    bpy.context.scene.frame_set(5)
+    assert np.allclose(deca.local_positions, frames[5, 2:], atol=1e-5)
+
+
 if __name__ == "__main__":
     test_animation_molecule()
     test_animation_crystal()
+    test_animation_stream()
+    test_animation_slice()
+    test_animation_memmap()
+    test_animation_memmap_delete()
     print("\n Animation: All pass! \n")
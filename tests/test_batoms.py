@@ -204,6 +204,9 @@ def test_batoms_add():
     batoms = h2o + co
     assert len(batoms) == 5
     assert len(batoms.species) == 3
+    # species are saved as codes, merged with the categories of h2o
+    assert batoms.arrays["species"].tolist() == ["O", "H", "H", "C", "O"]
+    assert batoms.arrays["elements"].tolist() == ["O", "H", "H", "C", "O"]
 
 
 def test_from_batoms():
@@ -240,6 +243,29 @@ def test_set_arrays():
     del h2o[[2]]
     assert len(h2o.arrays["positions"]) == 2
 
+def test_attribute_cache():
+    """Attributes are read from the mesh only once"""
+    from batoms.base.object import attribute_caches
+    bpy.ops.batoms.delete()
+    h2o = Batoms("h2o", from_ase=molecule("H2O"))
+    scale = h2o.get_attribute("scale")
+    assert ("attribute", "scale") in attribute_caches["h2o"]["data"]
+    # the returned array is a copy
+    scale0 = scale.copy()
+    scale[:] = 2
+    assert np.isclose(h2o.get_attribute("scale"), scale0).all()
+    h2o.set_attribute("scale", [0.5, 0.5, 0.2])
+    assert np.isclose(h2o.get_attribute("scale"), [0.5, 0.5, 0.2]).all()
+    # one element from the cache, also with a negative index
+    assert np.isclose(h2o[-1].scale, [0.2]).all()
+    assert np.isclose(h2o[0].scale, [0.5]).all()
+    h2o.positions = h2o.positions + 1
+    positions = h2o.positions
+    assert np.isclose(h2o.local_positions, positions).all()
+    h2o.cache_clear()
+    assert "h2o" not in attribute_caches
+
+
 def test_array_attribute():
     from ase.build import bulk
     import numpy as np
@@ -256,6 +282,26 @@ def test_array_attribute():
     au.get_attribute('vel')
     au.get_attribute('tensor')
 
+
+def test_string_attribute():
+    """String attribute is saved as INT code"""
+    bpy.ops.batoms.delete()
+    h2o = Batoms(
+        "h2o",
+        species=["O", "H", "H"],
+        positions=[[0, 0, 0.40], [0, -0.76, -0.2], [0, 0.76, -0.2]],
+    )
+    assert h2o.obj.data.attributes["species"].data_type == "INT"
+    assert (h2o.arrays["species"] == ["O", "H", "H"]).all()
+    h2o.set_attributes({"chainid": np.array(["A", "B", "A"])})
+    assert (h2o.attributes["chainid"] == ["A", "B", "A"]).all()
+    h2o.set_attribute("chainid", "C", index=1)
+    assert h2o.get_attribute("chainid", index=1)[0] == "C"
+    assert (h2o.attributes["chainid"] == ["A", "C", "A"]).all()
+    # the new atoms are decoded to ''
+    h2o.add_atoms({"species": ["O"], "positions": [[0, 0, 2]]})
+    assert h2o.attributes["chainid"].tolist() == ["A", "C", "A", ""]
+
 def test_att_conflict_case1():
     # Case 1: name ending in 0 
     from ase.build import bulk
@@ -430,6 +476,28 @@ def test_export_mesh_obj():
 
 
 
+def test_console_bind():
+    """Lazy proxies are bound only for new batoms"""
+    from batoms.console import bind_batoms, BatomsProxy
+
+    class Console:
+        locals = {}
+
+    bpy.ops.batoms.delete()
+    console = Console()
+    Batoms("h2o", from_ase=molecule("H2O"))
+    bind_batoms(console, 0)
+    proxy = console.locals["h2o"]
+    assert isinstance(proxy, BatomsProxy)
+    assert proxy._batoms is None
+    assert len(proxy) == 3
+    bind_batoms(console, 0)
+    assert console.locals["h2o"] is proxy
+    bpy.ops.batoms.delete(label="h2o")
+    bind_batoms(console, 0)
+    assert "h2o" not in console.locals
+
+
 if __name__ == "__main__":
     test_empty()
     test_batoms_molecule()
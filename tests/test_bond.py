@@ -94,6 +94,60 @@ def test_bond_performance():
     assert t < 5
 
 
+def test_bond_engine():
+    from batoms.bio.bio import read
+    bpy.ops.batoms.delete()
+    tio2 = read("../tests/datas/tio2.cif")
+    tio2.model_style = 1
+    nbond = len(tio2.bond)
+    tio2.bond.engine = "cells"
+    assert len(tio2.bond) == nbond
+
+
+def test_bond_incremental():
+    bpy.ops.batoms.delete()
+    c6h6 = Batoms("c6h6", from_ase=molecule("C6H6"))
+    c6h6.model_style = 1
+    nbond = len(c6h6.bond)
+    positions = c6h6.positions
+    positions[0] += [5, 0, 0]
+    c6h6.positions = positions
+    # setting the positions does not update the bonds
+    assert len(c6h6.bond) == nbond
+    c6h6.update_moved_bonds([0])
+    bondlists = c6h6.bond.arrays["atoms_index1"]
+    assert len(c6h6.bond) < nbond
+    c6h6.bond.update()
+    assert len(c6h6.bond) == len(bondlists)
+
+
+def test_bond_incremental_pbc():
+    """drag an atom across the periodic face of the cell"""
+    bpy.ops.batoms.delete()
+    si = Batoms("si", from_ase=bulk("Si", cubic=True) * [2, 2, 2])
+    si.model_style = 1
+    si[0].position = si[0].position + np.array([-0.3, -0.2, 0.1])
+    nbond = len(si.bond)
+    si.bond.update()
+    assert len(si.bond) == nbond
+
+
+def test_bond_skin():
+    bpy.ops.batoms.delete()
+    atoms = molecule("C2H6SO")
+    images = []
+    for i in range(5):
+        temp = atoms.copy()
+        temp.rattle(0.05, seed=i)
+        images.append(temp)
+    c2h6so = Batoms("c2h6so", from_ase=images)
+    c2h6so.model_style = 1
+    nbond = len(c2h6so.bond)
+    # the bonds are updated by the setter
+    c2h6so.bond.skin = 0.5
+    assert len(c2h6so.bond) == nbond
+
+
 def test_bond_add():
     bpy.ops.batoms.delete()
     au = bulk("Au")
@@ -41,7 +41,7 @@ def test_scatter_and_gather_attribute():
     # single value
     d0 = np.zeros((len(au)))
     d2 = np.zeros((len(au), 2))
-    d22 = np.zeros((len(au), 2, 2))
+    d22 = np.random.random((len(au), 2, 2))
     au.set_array("d0d", d0)
     au.set_array("d1d", d2)
     au.set_array("d2d", d22)
@@ -57,12 +57,129 @@ def test_scatter_and_gather_attribute():
     print("Gatther data for data (2,): {:1.2f}".format(t))
     assert t < 2
     tstart = time()
-    au.get_attribute('d2d')
+    data = au.get_attribute('d2d')
     t = time() - tstart
     print("Gatther data for data (2, 2): {:1.2f}".format(t))
     assert t < 4
+    assert np.allclose(data, d22)
+    # packed in one FLOAT_COLOR attribute
+    assert au.obj.data.attributes.get('d2d') is not None
     
 
+def test_set_attribute_with_indices():
+    from ase.build import bulk
+    import numpy as np
+    from batoms import Batoms
+    from batoms.base import object as bobject
+    bpy.ops.batoms.delete()
+    au = bulk('Au', cubic=True)
+    au *= [40, 40, 40]
+    au = Batoms('au', from_ase = au)
+    assert bobject.use_sparse_write(10, len(au))
+    samples = list(bobject.write_samples['sparse'])
+    try:
+        bobject.write_samples['sparse'][:] = [0, 0.0]
+        au[range(10)].scale = 2
+        # the 10 atoms are written by the sparse path
+        assert bobject.write_samples['sparse'][0] == 10
+    finally:
+        bobject.write_samples['sparse'][:] = samples
+    scale = au.get_attribute('scale')
+    assert np.isclose(scale[:10], 2).all()
+    assert not np.isclose(scale[10:], 2).any()
+
+
+def test_tune_write_cost():
+    """the choice of the sparse write follows the measured costs"""
+    from ase.build import bulk
+    import numpy as np
+    from batoms import Batoms
+    from batoms.base import object as bobject
+    bpy.ops.batoms.delete()
+    au = Batoms('au', from_ase = bulk('Au', cubic=True)*[10, 10, 10])
+    costs = dict(bobject.write_costs)
+    samples = {k: list(v) for k, v in bobject.write_samples.items()}
+    try:
+        bobject.write_costs.update({'sparse': 1e-7, 'full': 1e-7})
+        bobject.write_samples['sparse'][:] = [0, 0.0]
+        bobject.write_samples['full'][:] = [0, 0.0]
+        assert bobject.use_sparse_write(100, len(au))
+        au[range(100)].scale = 2
+        # small writes are summed before tuning
+        assert bobject.write_samples['sparse'][0] == 100
+        assert bobject.write_costs['sparse'] == 1e-7
+        # slow sparse writes, 1000 elements with the one above
+        for i in range(9):
+            bobject.tune_write_cost('sparse', 100, 1)
+        assert bobject.write_samples['sparse'][0] == 0
+        assert bobject.write_costs['sparse'] > 1e-3
+        assert not bobject.use_sparse_write(100, len(au))
+        au[range(100)].scale = 3
+        assert bobject.write_costs['full'] != 1e-7
+        assert np.isclose(au.get_attribute('scale')[:100], 3).all()
+    finally:
+        bobject.write_costs.update(costs)
+        for k, v in samples.items():
+            bobject.write_samples[k][:] = v
+
+
+def test_bond_molecule_boundary():
+    from batoms.bio.bio import read
+    from time import time
+    bpy.ops.batoms.delete()
+    mol = read("../tests/datas/anthraquinone.cif")
+    mol = mol*[3, 3, 3]
+    mol.boundary = 0.05
+    tstart = time()
+    mol.model_style = 1
+    t = time() - tstart
+    print("Bond with molecule and boundary: {:1.2f}".format(t))
+    assert t < 5
+
+
+def test_unique_rows():
+    """compare with np.unique(axis=0) on 1M bondlists"""
+    import numpy as np
+    from batoms.utils import unique_rows, isin_rows, encode_rows
+    from time import time
+    rng = np.random.default_rng(0)
+    n = 1000000
+    bondlists = np.concatenate((rng.integers(0, 100000, (n, 2)),
+                                rng.integers(-2, 3, (n, 6)),
+                                rng.integers(0, 3, (n, 3))), axis=1)
+    bondlists = np.concatenate((bondlists, bondlists[:n//2]))
+    tstart = time()
+    u0 = np.unique(bondlists, axis=0)
+    t0 = time() - tstart
+    tstart = time()
+    u1 = unique_rows(bondlists)
+    t1 = time() - tstart
+    print("Unique 1M rows, np.unique: {:1.2f}, unique_rows: {:1.2f}".format(
+        t0, t1))
+    assert np.array_equal(u0, u1)
+    # float rows are not packed, e.g. the offsets of polyhedra
+    offsets = rng.random((100, 3)).round(1)
+    assert encode_rows(offsets) is None
+    assert np.array_equal(unique_rows(offsets), np.unique(offsets, axis=0))
+    assert isin_rows(bondlists[n:], u1).all()
+    assert not isin_rows(u1[:10] + [0, 0, 5, 0, 0, 0, 0, 0, 0, 0, 0], u1).any()
+    
+
+def test_polyhedra_performance():
+    from batoms.bio.bio import read
+    from time import time
+    bpy.ops.batoms.delete()
+    tio2 = read("../tests/datas/tio2.cif")
+    tio2 = tio2*[8, 8, 8]
+    tio2.model_style = 1
+    tstart = time()
+    tio2.model_style = 2
+    t = time() - tstart
+    print("Polyhedra for {} octahedra: {:1.2f}".format(2*8**3, t))
+    assert len(tio2.polyhedra) == 12*8**3
+    assert t < 10
+
+
 if __name__ == "__main__":
     test_position()
     print("\n Performance: All pass! \n")
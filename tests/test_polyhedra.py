@@ -59,6 +59,85 @@ def test_polyhedra_crystal():
     tio2.model_style = 2
 
 
+def test_polyhedra_instanced():
+    from ase.io import read
+    bpy.ops.batoms.delete()
+    tio2 = read("../tests/datas/tio2.cif")
+    tio2 = Batoms("tio2", from_ase=tio2)
+    tio2 = tio2 * [2, 2, 2]
+    tio2.model_style = 2
+    npoly = len(tio2.polyhedra)
+    tio2.polyhedra.instanced = True
+    obj = tio2.polyhedra.obj_instance
+    assert obj is not None
+    assert len(obj.data.vertices) + len(tio2.polyhedra)//6 == npoly//6
+    tio2.polyhedra.instanced = False
+    assert tio2.polyhedra.obj_instance is None
+    assert len(tio2.polyhedra) == npoly
+
+
+def test_polyhedra_instanced_frames():
+    from ase.io import read
+    from batoms.polyhedra.polyhedra import instance_stores
+    bpy.ops.batoms.delete()
+    atoms = read("../tests/datas/tio2.cif") * [2, 2, 2]
+    images = []
+    for i in range(3):
+        temp = atoms.copy()
+        temp.positions *= 1 + 0.01*i
+        images.append(temp)
+    # one atom distorts its polyhedra in the last frame
+    images[2].positions[0] += [0.3, 0, 0]
+    tio2 = Batoms("tio2", from_ase=images)
+    tio2.model_style = 2
+    npoly = len(tio2.polyhedra)
+    tio2.polyhedra.instanced = True
+    obj = tio2.polyhedra.obj_instance
+    # the transforms of all frames are in one file
+    store = instance_stores[obj.name]
+    assert len(store) == 3
+    assert len(obj.data.attributes) < 10
+    bpy.context.scene.frame_set(2)
+    scale = np.zeros(len(obj.data.vertices)*3)
+    obj.data.attributes["instance_scale"].data.foreach_get("vector", scale)
+    assert np.allclose(scale.reshape(-1, 3), store[2][:, 6:9])
+    bpy.context.scene.frame_set(0)
+    # the distorted polyhedra are in the mesh
+    assert len(tio2.polyhedra) > 0
+    assert len(obj.data.vertices) + len(tio2.polyhedra)//6 == npoly//6
+
+
+def test_polyhedra_instanced_move():
+    from ase.io import read
+    bpy.ops.batoms.delete()
+    tio2 = read("../tests/datas/tio2.cif")
+    tio2 = Batoms("tio2", from_ase=tio2)
+    tio2 = tio2 * [2, 2, 2]
+    tio2.model_style = 2
+    tio2.polyhedra.instanced = True
+    obj = tio2.polyhedra.obj_instance
+    n = len(obj.data.vertices)
+    centers = np.zeros(n*3)
+    obj.data.vertices.foreach_get("co", centers)
+    # only the transforms of the moved instances are written
+    tio2.positions = tio2.positions + np.array([1, 0, 0])
+    tio2.polyhedra.update_instances(np.arange(len(tio2)))
+    obj = tio2.polyhedra.obj_instance
+    assert len(obj.data.vertices) == n
+    centers1 = np.zeros(n*3)
+    obj.data.vertices.foreach_get("co", centers1)
+    assert np.allclose(centers1.reshape(-1, 3) - centers.reshape(-1, 3),
+                       [1, 0, 0], atol=1e-4)
+    # a distorted polyhedron goes to the mesh
+    from batoms.polyhedra.polyhedra import instance_caches
+    template = instance_caches["tio2"]["instances"][0]
+    index = int(template["atoms_index"][0][0])
+    npoly = len(tio2.polyhedra)
+    tio2[index].position += np.array([0.3, 0, 0])
+    assert len(tio2.polyhedra.obj_instance.data.vertices) < n
+    assert len(tio2.polyhedra) > npoly
+
+
 def test_polyhedra_setting():
     bpy.ops.batoms.delete()
     ch4 = Batoms("ch4", from_ase=molecule("CH4"))
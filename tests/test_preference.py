@@ -3,6 +3,7 @@ import pytest
 import logging
 import importlib
 import pkgutil
+import numpy as np
 
 
 package = "batoms"
@@ -112,6 +113,77 @@ def test_logging_level_emit():
     assert all(["Add object" not in line for line in lines2])
 
 
+def test_workers():
+    """Search bonds and boundary of trajectory in parallel"""
+    from batoms import Batoms
+    from ase.io import read
+    bpy.ops.batoms.delete()
+    tio2 = read("../tests/datas/tio2_10.xyz", ":")
+    tio2 = Batoms("tio2", from_ase=tio2)
+    assert tio2.nframe > 1
+    tio2.boundary = 0.01
+    tio2.model_style = 1
+    bondlists = tio2.bond.bondlists
+    boundary = tio2.boundary.get_frames()
+    preferences.workers = 2
+    tio2.boundary = 0.01
+    tio2.bond.update()
+    preferences.workers = 1
+    assert np.array_equal(np.unique(tio2.bond.bondlists, axis=0),
+                          np.unique(bondlists, axis=0))
+    boundary2 = tio2.boundary.get_frames()
+    for key in boundary:
+        assert np.allclose(boundary2[key], boundary[key])
+
+
+def test_dependency_stamp():
+    """The dependencies are not checked again if the stamp is valid"""
+    from batoms.install import pip_dependencies
+    pip_dependencies.install()
+    assert pip_dependencies.read_stamp()
+
+
+def test_profile_startup():
+    import sys
+    from batoms.install import profile_startup
+    profile_startup.start()
+    assert profile_startup.timer in sys.meta_path
+    importlib.import_module("batoms.plugins.template")
+    profile_startup.stop()
+    assert profile_startup.timer is None
+
+
+def test_headless():
+    """Only data types and operators are registered in background mode"""
+    from batoms.utils.butils import is_headless
+    if not is_headless():
+        pytest.skip("Not in headless mode.")
+    assert not hasattr(bpy.types, "BATOMS_PT_species")
+    assert hasattr(bpy.types.Scene, "batoms")
+    bpy.ops.batoms.delete()
+    bpy.ops.batoms.molecule_add(label="h2o", formula="H2O")
+    assert "h2o" in bpy.data.collections
+
+
+def test_headless_env(monkeypatch):
+    """BATOMS_HEADLESS overrides the background mode of Blender"""
+    from batoms.utils.butils import is_headless
+    monkeypatch.setenv("BATOMS_HEADLESS", "1")
+    assert is_headless()
+    monkeypatch.setenv("BATOMS_HEADLESS", "0")
+    assert not is_headless()
+    monkeypatch.delenv("BATOMS_HEADLESS")
+    assert is_headless() == bpy.app.background
+
+
+def test_ui_registered():
+    """The panels are registered unless in headless mode"""
+    from batoms.utils.butils import is_headless
+    if is_headless():
+        pytest.skip("In headless mode.")
+    assert hasattr(bpy.types, "BATOMS_PT_species")
+
+
 if __name__ == "__main__":
     test_logging_level()
     test_logging_level_emit()
@@ -82,6 +82,28 @@ def test_render_au111():
     au111.get_image([1, 1, 1], output="au111-cycles.png", **extras)
 
 
+def test_render_lod():
+    bpy.ops.batoms.delete()
+    atoms = fcc111("Au", size=(4, 4, 4), vacuum=0)
+    au111 = Batoms(label="au111", from_ase=atoms)
+    au111.render.init()
+    au111.render.lod = True
+    instancers = au111.species["Au"].lod_instancers
+    assert len(instancers) == 4
+    assert len(instancers[0].data.polygons) > len(instancers[3].data.polygons)
+    nodes = au111.gnodes.node_group.nodes
+    assert nodes["InstanceOnPoint_au111_Au"].inputs["Pick Instance"].default_value
+    au111.render.lod_viewport = [5, 10, 20]
+    assert nodes["au111_LodThreshold_0"].inputs[1].default_value == -15
+    # rebuild the instancer
+    au111.species["Au"].color = [1, 1, 0, 1]
+    au111.species.update()
+    assert len(au111.species["Au"].lod_instancers) == 4
+    au111.render.lod = False
+    assert len(au111.species["Au"].lod_instancers) == 0
+    assert not nodes["InstanceOnPoint_au111_Au"].inputs["Pick Instance"].default_value
+
+
 if __name__ == "__main__":
     test_render()
     test_render_setter()
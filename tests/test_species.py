@@ -100,6 +100,26 @@ def test_geometry_node_object():
     assert tio2.bond.search_bond.gnodes.node_group.nodes['ObjectInfo_tio2_Ti'].inputs['Object'].default_value is not None
 
 
+def test_species_shape():
+    from ase.build import molecule
+    bpy.ops.batoms.delete()
+    h2o = Batoms("h2o", from_ase=molecule("H2O"))
+    nface = len(h2o.species["O"].obj.data.polygons)
+    h2o.species["O"].shape = "ICO_SPHERE"
+    assert len(h2o.species["O"].obj.data.polygons) == 80
+    h2o.species["O"].subdivisions = 3
+    assert len(h2o.species["O"].obj.data.polygons) == 320
+    assert len(h2o.species["H"].obj.data.polygons) == nface
+    h2o.shape = "POINT_CLOUD"
+    assert h2o.species["H"].shape == "POINT_CLOUD"
+    nodes = h2o.gnodes.node_group.nodes
+    assert nodes["SetMaterial_h2o_O"].outputs["Geometry"].is_linked
+    assert not nodes["InstanceOnPoint_h2o_O"].outputs["Instances"].is_linked
+    h2o.shape = "UV_SPHERE"
+    assert not nodes["SetMaterial_h2o_O"].outputs["Geometry"].is_linked
+    assert nodes["InstanceOnPoint_h2o_O"].outputs["Instances"].is_linked
+
+
 
 if __name__ == "__main__":
     test_batoms_species()
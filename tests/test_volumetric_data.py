@@ -31,3 +31,45 @@ def test_settings():
     assert h2o.volumetric_data.find("electrostatic") is not None
     h2o.volumetric_data.remove("homo")
     assert h2o.volumetric_data.find("homo") is None
+
+
+def test_storage():
+    """float64 in the numpy file, float32 in the mesh"""
+    from ase.io.cube import read_cube_data
+    volume, atoms = read_cube_data("../tests/datas/h2o-homo.cube")
+    bpy.ops.batoms.delete()
+    h2o = Batoms('h2o', from_ase = atoms, volume = {'homo': volume})
+    assert h2o.volumetric_data.bpy_setting['homo'].filepath != ''
+    assert np.array_equal(h2o.volumetric_data['homo'], volume)
+    h2o.volumetric_data.bpy_setting["homo"].storage = "MESH"
+    h2o.volumetric_data["homo"] = volume
+    assert h2o.volumetric_data.bpy_setting['homo'].filepath == ''
+    assert bpy.data.objects.get("h2o_volume_homo") is not None
+    assert np.allclose(h2o.volumetric_data["homo"], volume)
+
+
+def test_storage_save():
+    """the numpy file is put beside the saved .blend file"""
+    import os
+    import shutil
+    import tempfile
+    from ase.io.cube import read_cube_data
+    volume, atoms = read_cube_data("../tests/datas/h2o-homo.cube")
+    bpy.ops.batoms.delete()
+    h2o = Batoms('h2o', from_ase = atoms, volume = {'homo': volume})
+    tempdir = tempfile.mkdtemp()
+    try:
+        filepath = os.path.join(tempdir, "test_volume.blend")
+        bpy.ops.wm.save_as_mainfile(filepath=filepath)
+        setting = h2o.volumetric_data.bpy_setting['homo']
+        assert setting.filepath == "//test_volume_h2o_volume_homo.npy"
+        assert os.path.exists(bpy.path.abspath(setting.filepath))
+        bpy.ops.wm.open_mainfile(filepath=filepath)
+        h2o = Batoms('h2o')
+        assert np.array_equal(h2o.volumetric_data['homo'], volume)
+    finally:
+        # the later tests do not write beside this file
+        from batoms.volumetric_data import volume_caches
+        bpy.ops.wm.read_homefile(app_template="")
+        volume_caches.clear()
+        shutil.rmtree(tempdir)